@@ -0,0 +1,118 @@
+"""Пропускная способность клиента ЕАЭС на локальной замене API /spd/find.
+
+Локальный aiohttp-сервер отвечает как /spd/find: фильтрует синтетическую
+коллекцию, отдает страницу limit/skip и общее число записей, каждая
+страница задерживается на --latency-ms (как сетевая задержка до API).
+Сравниваются прежний способ (один requests.post, только первая страница)
+и EaeuClient с разным числом параллельных запросов страниц.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_eaeu --items 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import requests
+from aiohttp import web
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+from benchmarks.synthetic import make_registry_frame
+from src.eaeu_client import EaeuClient
+
+
+def make_collection(count: int):
+    frame = make_registry_frame(count)
+    return [
+        {'name': name, 'okpd2': {'code': code}, 'manufacturer': {'name': manufacturer}}
+        for name, code, manufacturer in zip(
+            frame['Наименование продукции'], frame['ОКПД2'], frame['Предприятие']
+        )
+    ]
+
+
+def make_app(collection, latency: float) -> web.Application:
+    async def find(request: web.Request) -> web.Response:
+        payload = await request.json()
+        items = collection
+        for field, condition in (payload.get('filter') or {}).items():
+            pattern = re.compile(condition['$regex'], re.IGNORECASE)
+            if field == 'okpd2.code':
+                items = [item for item in items if pattern.search(item['okpd2']['code'])]
+            else:
+                items = [item for item in items if pattern.search(item[field])]
+        skip, limit = payload.get('skip', 0), payload.get('limit', 1000)
+        await asyncio.sleep(latency)
+        return web.json_response({'items': items[skip:skip + limit], 'total': len(items)})
+
+    app = web.Application()
+    app.router.add_post('/spd/find', find)
+    return app
+
+
+def start_server(collection, latency: float, port: int) -> str:
+    """Запускает сервер в отдельном потоке со своим циклом событий"""
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(make_app(collection, latency))
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, '127.0.0.1', port).start())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return f'http://127.0.0.1:{port}/spd/find'
+
+
+def bench_requests(url: str, runs: int) -> dict:
+    """Прежний способ: новое соединение на запрос и только первая страница"""
+    start = time.perf_counter()
+    count = 0
+    for _ in range(runs):
+        response = requests.post(url, json={'collection': 'x', 'limit': 1000, 'skip': 0})
+        count = len(response.json()['items'])
+    elapsed = (time.perf_counter() - start) / runs
+    return {'client': 'requests', 'items': count, 'seconds': round(elapsed, 3),
+            'items_per_sec': round(count / elapsed, 1)}
+
+
+async def bench_client(url: str, fan_out: int, runs: int) -> dict:
+    client = EaeuClient(url, fan_out=fan_out)
+    try:
+        start = time.perf_counter()
+        for _ in range(runs):
+            items = await client.find({})
+        elapsed = (time.perf_counter() - start) / runs
+    finally:
+        await client.close()
+    return {'client': f'EaeuClient fan_out={fan_out}', 'items': len(items), 'seconds': round(elapsed, 3),
+            'items_per_sec': round(len(items) / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--fan-out', default='1,4,8')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    url = start_server(make_collection(args.items), args.latency_ms / 1000, args.port)
+    print(json.dumps(bench_requests(url, args.runs), ensure_ascii=False))
+    for fan_out in args.fan_out.split(','):
+        print(json.dumps(asyncio.run(bench_client(url, int(fan_out), args.runs)), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
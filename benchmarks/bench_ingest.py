@@ -0,0 +1,114 @@
+"""Сравнение потокового чтения xlsx с полной загрузкой книги через pandas/openpyxl.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_ingest --rows 100000
+
+Каждый способ выполняется в отдельном процессе, чтобы пиковый RSS
+измерялся независимо. Отдельно измеряется финальное кодирование снимка
+(словари и даты): finalize_arrow_peak_mb - наибольший объем памяти Arrow
+во время кодирования. RSS для этого не подходит: промежуточный файл
+читается через memory map, и его страницы (кэш ОС) тоже входят в RSS.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pyarrow as pa
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+from benchmarks.synthetic import write_registry_xlsx
+from src.gisp_store import GISP_COLUMNS, GISP_DATE_USECOLS, GISP_HEADER_ROWS, GISP_USECOLS, SnapshotWriter
+
+# Измерения финального кодирования снимка в текущем процессе
+FINALIZE = {}
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MeasuredWriter(SnapshotWriter):
+    """SnapshotWriter, который отдельно измеряет финальное кодирование снимка"""
+
+    def _finalize(self):
+        pool = pa.default_memory_pool()
+        allocated = pool.bytes_allocated()
+        start = time.perf_counter()
+        super()._finalize()
+        FINALIZE['seconds'] = time.perf_counter() - start
+        # Пик пула за время жизни процесса; чтение файла держит в пуле только текущий батч
+        FINALIZE['arrow_peak_mb'] = (pool.max_memory() - allocated) / (1024 * 1024)
+
+
+def run_stream(path: str, snapshot_path: str) -> int:
+    from src.xlsx_stream import XlsxRowReader
+
+    with XlsxRowReader(path) as reader, MeasuredWriter(snapshot_path) as writer:
+        for columns in reader.iter_batches(GISP_USECOLS, skiprows=GISP_HEADER_ROWS,
+                                           batch_size=10000, date_columns=GISP_DATE_USECOLS):
+            writer.write_columns(columns)
+        return writer.total_rows
+
+
+def run_pandas(path: str, snapshot_path: str) -> int:
+    import pandas as pd
+
+    df = pd.read_excel(path, usecols=GISP_USECOLS, skiprows=2, names=GISP_COLUMNS,
+                       engine='openpyxl', dtype=str)
+    df = df.dropna(how='all')
+    with MeasuredWriter(snapshot_path) as writer:
+        for i in range(0, len(df), 5000):
+            writer.write_frame(df.iloc[i:i + 5000])
+        return writer.total_rows
+
+
+def run_single(method: str, path: str):
+    snapshot_path = os.path.join(tempfile.mkdtemp(), 'snapshot.arrow')
+    start = time.perf_counter()
+    rows = {'stream': run_stream, 'pandas': run_pandas}[method](path, snapshot_path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'method': method,
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(rows / elapsed, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'finalize_seconds': round(FINALIZE['seconds'], 3),
+        'finalize_arrow_peak_mb': round(FINALIZE['arrow_peak_mb'], 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--xlsx', help='Готовый xlsx файл вместо сгенерированного')
+    parser.add_argument('--methods', default='stream,pandas')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_single(args.run, args.xlsx)
+        return
+
+    path = args.xlsx
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), f'gisp_{args.rows}.xlsx')
+        print(f'Generating {args.rows} rows into {path}...', file=sys.stderr)
+        write_registry_xlsx(path, args.rows)
+
+    for method in args.methods.split(','):
+        result = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_ingest', '--run', method, '--xlsx', path],
+            capture_output=True, text=True, check=True, cwd=ROOT_DIR
+        )
+        print(result.stdout.strip())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Пропускная способность поиска ГИСП: пул потоков бота и SearchPool
+с разным числом процессов.
+
+Запросы выполняются конкурентно (--concurrency одновременно, как при
+многих пользователях бота). Наборы запросов: по наименованию,
+комбинированные (ОКПД2 и наименование) и широкие (неселективные
+подстроки, полный просмотр - в SearchPool делится на части между
+процессами; проверки до --shard-rows кандидатов SearchPool выполняет в
+потоках, как бот без пула). Результаты каждого способа сверяются с
+gisp_search.match_positions.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_pool --rows 1000000 --workers 1,2,4,8
+
+Прирост от числа процессов ограничен числом ядер машины (выводится в
+результатах как cpu_count).
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+from benchmarks.bench_suite import INGEST_BATCH_SIZE, build_scraper
+from benchmarks.synthetic import combined_queries, name_queries, registry_xlsx_name, write_registry_xlsx
+from src.gisp_build import build_generation_indexes, ingest_registry
+from src.gisp_search import match_positions
+from src.search_pool import SearchPool
+
+# Неселективные подстроки: индекс по наименованию не сужает просмотр
+WIDE_QUERIES = ['о', 'ка', 'ер', 'ан']
+
+
+async def run_queries(search, queries, concurrency: int) -> dict:
+    """Выполняет запросы (okpd2, name) не более concurrency одновременно"""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(okpd2, name):
+        async with semaphore:
+            start = time.perf_counter()
+            positions, corrections = await search(okpd2, name)
+            samples.append(time.perf_counter() - start)
+            return positions, corrections
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[one(okpd2, name) for okpd2, name in queries])
+    elapsed = time.perf_counter() - start
+    samples_ms = np.array(samples) * 1000
+    return {
+        'qps': round(len(queries) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 2),
+        'p99_ms': round(float(np.percentile(samples_ms, 99)), 2),
+        'results': results,
+    }
+
+
+def check(results, expected, label: str):
+    for (positions, corrections), (expected_positions, expected_corrections) in zip(results, expected):
+        if not np.array_equal(positions, expected_positions) or corrections != expected_corrections:
+            raise AssertionError(f'{label}: results differ from match_positions')
+
+
+async def bench(scraper, query_sets: dict, workers_list, concurrency: int, shard_rows: int) -> dict:
+    generation = scraper.generation
+    expected = {
+        kind: [match_positions(generation, okpd2, name) for okpd2, name in queries]
+        for kind, queries in query_sets.items()
+    }
+    result = {}
+
+    async def threads(okpd2, name):
+        return await scraper.executor.run_io(match_positions, generation, okpd2, name)
+
+    result['threads'] = {}
+    for kind, queries in query_sets.items():
+        measured = await run_queries(threads, queries, concurrency)
+        check(measured.pop('results'), expected[kind], f'threads/{kind}')
+        result['threads'][kind] = measured
+
+    for workers in workers_list:
+        pool = SearchPool(workers, scraper.executor, shard_rows)
+        pool.start()
+
+        async def pooled(okpd2, name):
+            return await pool.match(generation, okpd2, name)
+
+        label = f'pool_{workers}'
+        result[label] = {}
+        try:
+            # Первый запрос открывает снимок в процессах пула
+            await run_queries(pooled, [(None, WIDE_QUERIES[0])] * workers, workers)
+            for kind, queries in query_sets.items():
+                measured = await run_queries(pooled, queries, concurrency)
+                check(measured.pop('results'), expected[kind], f'{label}/{kind}')
+                result[label][kind] = measured
+        finally:
+            pool.shutdown(wait=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300000)
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--shard-rows', type=int, default=100000)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'gisp_bench'),
+                        help='Каталог для сгенерированных xlsx файлов')
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    xlsx_path = os.path.join(args.data_dir, registry_xlsx_name(args.rows))
+    if not os.path.exists(xlsx_path):
+        print(f'Generating {args.rows} rows into {xlsx_path}...', file=sys.stderr)
+        write_registry_xlsx(f'{xlsx_path}.tmp', args.rows)
+        os.replace(f'{xlsx_path}.tmp', xlsx_path)
+
+    workdir = tempfile.mkdtemp()
+    scraper = build_scraper(workdir)
+    try:
+        generation_id = scraper.generations.create()
+        snapshot_path = scraper.generations.snapshot_path(generation_id)
+        index_dir = scraper.generations.index_dir(generation_id)
+        ingest_registry(xlsx_path, snapshot_path, INGEST_BATCH_SIZE)
+        scraper._activate_generation(generation_id, build_generation_indexes(snapshot_path, index_dir))
+
+        wide = max(args.queries // 10, len(WIDE_QUERIES))
+        query_sets = {
+            'name': [(None, name) for name in name_queries(args.queries)],
+            'combined': combined_queries(args.queries),
+            'wide': [(None, WIDE_QUERIES[i % len(WIDE_QUERIES)]) for i in range(wide)],
+        }
+        workers_list = [int(workers) for workers in args.workers.split(',')]
+        result = {
+            'rows': scraper.generation.snapshot.num_rows,
+            'cpu_count': os.cpu_count(),
+            'concurrency': args.concurrency,
+            'shard_rows': args.shard_rows,
+            **asyncio.run(bench(scraper, query_sets, workers_list,
+                                args.concurrency, args.shard_rows)),
+        }
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    finally:
+        scraper.executor.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Сравнение прежней выгрузки в Excel (to_excel + повторная запись ячеек
+через iloc в BytesIO) с потоковой записью ReportGenerator в режиме
+constant_memory.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_report --rows 100000
+
+Каждый способ выполняется в отдельном процессе, чтобы пиковый RSS
+измерялся независимо.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+from benchmarks.synthetic import make_registry_frame
+from src.gisp_store import RESULT_FIELDS
+from src.report_generator import REPORT_COLUMNS, SHEET_NAME, ReportGenerator
+
+BATCH_SIZE = 5000
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    frame = make_registry_frame(rows).rename(columns={v: k for k, v in RESULT_FIELDS.items()})
+    frame['source'] = 'ГИСП'
+    return frame
+
+
+def make_batches(frame: pd.DataFrame):
+    """Записи результата поиска батчами, как их отдает курсор"""
+    for start in range(0, len(frame), BATCH_SIZE):
+        yield frame.iloc[start:start + BATCH_SIZE].to_dict('records')
+
+
+def run_legacy(frame: pd.DataFrame, path: str) -> int:
+    """Прежний ReportGenerator: вся книга в BytesIO, каждая ячейка пишется дважды"""
+    results = [item for batch in make_batches(frame) for item in batch]
+    df = pd.DataFrame(results).rename(columns=REPORT_COLUMNS)[list(REPORT_COLUMNS.values())]
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False, sheet_name=SHEET_NAME)
+        worksheet = writer.sheets[SHEET_NAME]
+        header_format = writer.book.add_format({'bold': True, 'border': 1, 'bg_color': '#D9E1F2'})
+        data_format = writer.book.add_format({'text_wrap': True, 'valign': 'top', 'border': 1})
+        for col_num, value in enumerate(df.columns.values):
+            worksheet.write(0, col_num, value, header_format)
+            max_length = max(df[value].astype(str).apply(len).max(), len(str(value))) + 2
+            worksheet.set_column(col_num, col_num, max_length)
+        for row in range(len(df)):
+            for col in range(len(df.columns)):
+                worksheet.write(row + 1, col, df.iloc[row, col], data_format)
+        worksheet.freeze_panes(1, 0)
+        worksheet.autofilter(0, 0, len(df), len(df.columns) - 1)
+    with open(path, 'wb') as f:
+        f.write(output.getvalue())
+    return len(df)
+
+
+def run_stream(frame: pd.DataFrame, path: str) -> int:
+    return ReportGenerator().generate_excel_report(make_batches(frame), path)
+
+
+def run_single(method: str, rows: int):
+    path = os.path.join(tempfile.mkdtemp(), 'report.xlsx')
+    frame = make_frame(rows)
+    # Память под синтетические данные не относится к выгрузке
+    baseline_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    written = {'stream': run_stream, 'legacy': run_legacy}[method](frame, path)
+    elapsed = time.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        'method': method,
+        'rows': written,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(written / elapsed, 1),
+        'peak_rss_mb': round(peak_rss_mb, 1),
+        'export_rss_mb': round(peak_rss_mb - baseline_rss_mb, 1),
+        'file_mb': round(os.path.getsize(path) / (1024 * 1024), 1),
+    }))
+    os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--methods', default='stream,legacy')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_single(args.run, args.rows)
+        return
+
+    for method in args.methods.split(','):
+        result = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_report', '--run', method, '--rows', str(args.rows)],
+            capture_output=True, text=True, check=True, cwd=ROOT_DIR
+        )
+        print(result.stdout.strip())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Отзывчивость цикла событий бота во время полного обновления реестра ГИСП.
+
+Пока идет обновление (разбор xlsx и построение индексов), каждые 20 мс
+выполняется обработчик, эквивалентный /help по работе в цикле событий, и
+измеряется его задержка. Режим executor - обновление через пулы
+BlockingExecutor, inline - прежний способ, вся работа в цикле событий.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_responsiveness --rows 100000
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+from benchmarks.synthetic import write_registry_xlsx
+from src.downloader import DownloadResult
+from src.executor import BlockingExecutor
+from src.generations import GenerationManager
+from src.gisp_build import build_generation_indexes, ingest_registry
+from src.result_cache import ResultCache
+from src.scraper import ProductScraper, positions_size
+
+HELP_LATENCY_LIMIT_MS = 50
+PROBE_INTERVAL = 0.02
+
+
+class LocalDownloader:
+    """Отдает заранее подготовленный xlsx вместо скачивания реестра"""
+
+    def __init__(self, source_path: str):
+        self.source_path = source_path
+
+    def download(self, url, path, headers=None, force=False, on_progress=None) -> DownloadResult:
+        shutil.copyfile(self.source_path, path)
+        with open(path, 'rb') as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        return DownloadResult(path=path, not_modified=False, size=os.path.getsize(path), sha256=sha256)
+
+    def mark_processed(self, url, result):
+        pass
+
+
+class StatusMessage:
+    async def edit_text(self, text):
+        pass
+
+
+def build_scraper(xlsx_path: str, workdir: str) -> ProductScraper:
+    scraper = ProductScraper.__new__(ProductScraper)
+    scraper.GISP_EXCEL_URL = 'local'
+    scraper.TEMP_GISP_FILE = os.path.join(workdir, 'temp_gisp.xlsx')
+    scraper.generations = GenerationManager(os.path.join(workdir, 'gisp'))
+    scraper.generation = None
+    scraper.generation_lock = threading.Lock()
+    scraper.executor = BlockingExecutor()
+    scraper.gisp_cache = ResultCache(size_of=positions_size)
+    scraper.downloader = LocalDownloader(xlsx_path)
+    scraper.chunk_size = 10000
+    scraper.last_download = None
+    scraper.last_update = None
+    scraper.last_update_summary = None
+    return scraper
+
+
+async def help_handler():
+    """Работа /help в цикле событий: проверка доступа и формирование ответа"""
+    await asyncio.sleep(0)
+
+
+async def probe(stop: asyncio.Event, samples: list):
+    """Запускает обработчик каждые PROBE_INTERVAL и записывает время до его завершения"""
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        await help_handler()
+        samples.append(max(loop.time() - scheduled, 0.0))
+        if stop.is_set():
+            break
+
+
+async def update_inline(scraper: ProductScraper):
+    """Прежний способ: разбор и индексы выполняются прямо в корутине"""
+    download = scraper.downloader.download(scraper.GISP_EXCEL_URL, scraper.TEMP_GISP_FILE)
+    generation_id = scraper.generations.create()
+    ingest_registry(scraper.TEMP_GISP_FILE, scraper.generations.snapshot_path(generation_id), scraper.chunk_size)
+    summary = build_generation_indexes(*scraper._index_build_args(generation_id))
+    scraper._activate_generation(generation_id, summary, download)
+    return summary['total_rows']
+
+
+async def run_mode(mode: str, xlsx_path: str) -> dict:
+    scraper = build_scraper(xlsx_path, tempfile.mkdtemp())
+    if mode == 'executor':
+        # Процессы пула запускаются заранее, как при работе бота
+        await scraper.executor.run_cpu(time.time)
+    stop = asyncio.Event()
+    samples = []
+    probe_task = asyncio.create_task(probe(stop, samples))
+    # Даем пробе запланировать первый вызов до начала обновления
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    if mode == 'executor':
+        rows = await scraper.download_gisp_file_with_status(StatusMessage())
+    else:
+        rows = await update_inline(scraper)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    scraper.executor.shutdown(wait=True)
+
+    latency_ms = np.array(samples) * 1000
+    return {
+        'mode': mode,
+        'rows': rows,
+        'update_seconds': round(elapsed, 2),
+        'help_samples': len(samples),
+        'help_p50_ms': round(float(np.percentile(latency_ms, 50)), 2),
+        'help_p99_ms': round(float(np.percentile(latency_ms, 99)), 2),
+        'help_max_ms': round(float(latency_ms.max()), 2),
+        'within_limit': bool(latency_ms.max() < HELP_LATENCY_LIMIT_MS),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--xlsx', help='Готовый xlsx файл вместо сгенерированного')
+    parser.add_argument('--modes', default='executor,inline')
+    args = parser.parse_args()
+
+    path = args.xlsx
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), f'gisp_{args.rows}.xlsx')
+        print(f'Generating {args.rows} rows into {path}...', file=sys.stderr)
+        write_registry_xlsx(path, args.rows)
+
+    for mode in args.modes.split(','):
+        print(json.dumps(asyncio.run(run_mode(mode, path)), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
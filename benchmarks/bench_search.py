@@ -0,0 +1,128 @@
+"""Задержка поиска по наименованию: полный просмотр pandas, инвертированный индекс,
+повторные запросы через кэш номеров строк ГИСП и нечеткий поиск (словоформы
+и опечатки) по индексу основ.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_search --rows 300000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+from benchmarks.synthetic import fuzzy_queries, make_registry_frame, name_queries
+from src.executor import BlockingExecutor
+from src.generations import GenerationManager
+from src.gisp_search import name_positions
+from src.gisp_store import GispSnapshot, SnapshotWriter
+from src.result_cache import ResultCache
+from src.scraper import ProductScraper, positions_size
+
+
+def percentiles(samples):
+    samples_ms = np.array(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(samples_ms, 99)), 3),
+    }
+
+
+def build_scraper(rows: int, workdir: str) -> ProductScraper:
+    """Создает ProductScraper поверх синтетического снимка без скачивания реестра"""
+    scraper = ProductScraper.__new__(ProductScraper)
+    scraper.generations = GenerationManager(workdir)
+    scraper.generation = None
+    scraper.generation_lock = threading.Lock()
+    scraper.executor = BlockingExecutor()
+    scraper.gisp_cache = ResultCache(max_entries=1024, max_bytes=32 * 1024 * 1024, size_of=positions_size)
+    scraper.search_pool = None
+    frame = make_registry_frame(rows)
+    generation_id = scraper.generations.create()
+    with SnapshotWriter(scraper.generations.snapshot_path(generation_id)) as writer:
+        for i in range(0, rows, 50000):
+            writer.write_frame(frame.iloc[i:i + 50000])
+    start = time.perf_counter()
+    scraper._publish_generation(generation_id)
+    print(f'Indexes built in {time.perf_counter() - start:.2f}s', file=sys.stderr)
+    return scraper
+
+
+def bench_scan(snapshot: GispSnapshot, queries):
+    """Исходный способ: str.lower().str.contains по всем строкам DataFrame"""
+    names = pd.Series(snapshot.column('Наименование продукции').to_pylist(), dtype=object)
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        mask = names.str.lower().str.contains(query.lower(), na=False, regex=False)
+        np.flatnonzero(mask.to_numpy())
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_index(scraper: ProductScraper, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        name_positions(scraper.generation, query.lower())
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def bench_cached(scraper: ProductScraper, queries):
+    """Второй проход тех же запросов: номера строк берутся из кэша"""
+    for query in queries:
+        await scraper._gisp_match(scraper.generation, None, query)
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        await scraper._gisp_match(scraper.generation, None, query)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_fuzzy(scraper: ProductScraper, queries):
+    """Нечеткий поиск: возвращает задержки и долю запросов, для которых что-то найдено"""
+    fuzzy_index = scraper.generation.search_index['fuzzy']
+    samples = []
+    found = 0
+    for query in queries:
+        start = time.perf_counter()
+        positions, _ = fuzzy_index.lookup(query.lower())
+        samples.append(time.perf_counter() - start)
+        found += len(positions) > 0
+    return samples, found / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=300000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    scraper = build_scraper(args.rows, workdir)
+    queries = name_queries(args.queries)
+    fuzzy_samples, fuzzy_found = bench_fuzzy(scraper, fuzzy_queries(args.queries))
+    print(json.dumps({
+        'rows': args.rows,
+        'queries': len(queries),
+        'scan': percentiles(bench_scan(scraper.snapshot, queries)),
+        'index': percentiles(bench_index(scraper, queries)),
+        'cached': percentiles(asyncio.run(bench_cached(scraper, queries))),
+        'cache': scraper.gisp_cache.stats(),
+        'fuzzy': dict(percentiles(fuzzy_samples), found=round(fuzzy_found, 3)),
+    }, ensure_ascii=False))
+    scraper.executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Время от запуска до первого ответа поиска ГИСП при разных состояниях данных.
+
+Сценарии (каждый - в отдельном процессе, с настоящим ProductScraper):
+    no_data - на диске нет реестра: он скачивается (из локального xlsx) в фоне;
+    cold    - поколение с индексами на диске, файлы вытеснены из кэша страниц ОС;
+    warm    - поколение с индексами на диске, файлы в кэше страниц;
+    stale   - индексы поколения устарели и пересобираются при открытии.
+
+Для каждого сценария измеряется время конструктора, первого ответа поиска
+ГИСП (результат или сообщение, что база еще загружается) и первого ответа
+с результатами. До переноса скачивания в фон конструктор при отсутствии
+данных ждал загрузки целиком: бот не отвечал до first_result_ms.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_startup --rows 300000
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+from benchmarks.bench_responsiveness import LocalDownloader
+from benchmarks.synthetic import name_queries, registry_xlsx_name, write_registry_xlsx
+
+POLL_INTERVAL = 0.01
+# Файлы индекса, удалением которых моделируются устаревшие индексы
+STALE_INDEX_PREFIX = 'fuzzy_'
+
+
+def evict_page_cache(path: str):
+    """Вытесняет файлы каталога из кэша страниц ОС"""
+    for root, _, files in os.walk(path):
+        for file in files:
+            fd = os.open(os.path.join(root, file), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+
+async def first_answers(scraper, query: str, timeout: float) -> dict:
+    """Опрашивает поиск ГИСП, пока не появятся результаты"""
+    started = time.perf_counter()
+    first_response = None
+    first_error = None
+    while time.perf_counter() - started < timeout:
+        try:
+            rows = await scraper._gisp_rows(None, query)
+        except Exception as e:
+            rows = None
+            first_error = first_error or str(e)
+        if first_response is None:
+            first_response = time.perf_counter() - started
+        if rows is not None:
+            return {
+                'first_response_ms': round(first_response * 1000, 1),
+                'first_result_ms': round((time.perf_counter() - started) * 1000, 1),
+                'found': len(rows),
+                'first_error': first_error,
+            }
+        await asyncio.sleep(POLL_INTERVAL)
+    raise TimeoutError(f'GISP search did not return results in {timeout} s')
+
+
+def run_scenario(xlsx_path: str, query: str, timeout: float) -> dict:
+    """Запуск бота без Telegram: конструктор, фоновый старт и поиск (cwd - каталог данных)"""
+    from src.metrics import metrics
+    from src.scraper import ProductScraper
+
+    started = time.perf_counter()
+    scraper = ProductScraper()
+    constructor_seconds = time.perf_counter() - started
+    scraper.downloader = LocalDownloader(xlsx_path)
+
+    async def startup():
+        # Как ProductSearchBot.start_updates: открытие баз, затем скачивание
+        # недостающего реестра (без JobQueue и синхронизации ЕАЭС через API)
+        await scraper.executor.run_io(scraper.warm_start)
+        if scraper.gisp_data_time() is None:
+            await scraper.update_registry()
+
+    async def measure_startup():
+        startup_task = asyncio.create_task(startup())
+        answers = await first_answers(scraper, query, timeout)
+        await startup_task
+        return answers
+
+    result = asyncio.run(measure_startup())
+    # Время считается от начала конструктора, как при запуске бота
+    for key in ('first_response_ms', 'first_result_ms'):
+        result[key] = round(result[key] + constructor_seconds * 1000, 1)
+    result['constructor_ms'] = round(constructor_seconds * 1000, 1)
+    stages = metrics.snapshot()['histograms'].get('startup_seconds', {})
+    result['stages_ms'] = {
+        dict(labels)['stage']: round(summary['sum'] * 1000, 1) for labels, summary in stages.items()
+    }
+    scraper.executor.shutdown()
+    return result
+
+
+def measure(scenario: str, workdir: str, xlsx_path: str, query: str, timeout: float) -> dict:
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT_DIR, 'benchmarks', 'bench_startup.py'), '--run',
+         '--xlsx', xlsx_path, '--query', query, '--timeout', str(timeout)],
+        capture_output=True, text=True, check=True, cwd=workdir
+    )
+    return {'scenario': scenario, **json.loads(result.stdout.strip().splitlines()[-1])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300000)
+    parser.add_argument('--timeout', type=float, default=1800)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'gisp_bench'),
+                        help='Каталог для сгенерированных xlsx файлов')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--xlsx', help=argparse.SUPPRESS)
+    parser.add_argument('--query', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_scenario(args.xlsx, args.query, args.timeout), ensure_ascii=False))
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    xlsx_path = os.path.join(args.data_dir, registry_xlsx_name(args.rows))
+    if not os.path.exists(xlsx_path):
+        print(f'Generating {args.rows} rows into {xlsx_path}...', file=sys.stderr)
+        write_registry_xlsx(f'{xlsx_path}.tmp', args.rows)
+        os.replace(f'{xlsx_path}.tmp', xlsx_path)
+    query = name_queries(1)[0]
+
+    workdir = tempfile.mkdtemp()
+    try:
+        # no_data оставляет после себя поколение, с которым запускаются остальные сценарии
+        print(json.dumps(measure('no_data', workdir, xlsx_path, query, args.timeout), ensure_ascii=False))
+        data_dir = os.path.join(workdir, 'data')
+        evict_page_cache(data_dir)
+        print(json.dumps(measure('cold', workdir, xlsx_path, query, args.timeout), ensure_ascii=False))
+        print(json.dumps(measure('warm', workdir, xlsx_path, query, args.timeout), ensure_ascii=False))
+        for root, _, files in os.walk(data_dir):
+            for file in files:
+                if file.startswith(STALE_INDEX_PREFIX):
+                    os.remove(os.path.join(root, file))
+        print(json.dumps(measure('stale', workdir, xlsx_path, query, args.timeout), ensure_ascii=False))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
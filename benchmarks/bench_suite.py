@@ -0,0 +1,239 @@
+"""Набор бенчмарков на синтетическом реестре ГИСП: загрузка xlsx, построение
+индексов и задержка поиска по ОКПД2, наименованию и комбинированного.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_suite --sizes 10000,100000,1000000
+    python -m benchmarks.bench_suite --sizes 100000 --compare benchmarks/results/<commit>.json
+
+Для каждого размера генерируется xlsx файл в формате выгрузки ГИСП
+(сохраняется в --data-dir и используется повторно). Каждый размер
+измеряется в отдельном процессе, чтобы пиковый RSS не зависел от
+предыдущих. Результаты пишутся в JSON с хэшем коммита, чтобы сравнивать
+их между коммитами.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+from benchmarks.synthetic import combined_queries, name_queries, okpd2_queries, registry_xlsx_name, write_registry_xlsx
+from src.executor import BlockingExecutor
+from src.generations import GenerationManager
+from src.gisp_build import build_generation_indexes, ingest_registry
+from src.gisp_store import GISP_COLUMNS, column_nbytes
+from src.result_cache import ResultCache, normalize_query
+from src.scraper import ProductScraper, positions_size
+
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+INGEST_BATCH_SIZE = 10000
+
+
+def peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def dir_size_mb(path: str) -> float:
+    return round(sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file()) / (1024 * 1024), 1)
+
+
+def git_commit() -> str:
+    """Короткий хэш коммита, с пометкой -dirty при незафиксированных изменениях"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True, cwd=ROOT_DIR).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                                text=True, check=True, cwd=ROOT_DIR).stdout.strip()
+        return f'{commit}-dirty' if status else commit
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def build_scraper(workdir: str) -> ProductScraper:
+    """Создает ProductScraper без скачивания реестра и фоновых задач"""
+    scraper = ProductScraper.__new__(ProductScraper)
+    scraper.generations = GenerationManager(workdir)
+    scraper.generation = None
+    scraper.generation_lock = threading.Lock()
+    scraper.executor = BlockingExecutor()
+    scraper.gisp_cache = ResultCache(size_of=positions_size)
+    scraper.last_update_summary = None
+    return scraper
+
+
+def measure_queries(scraper: ProductScraper, queries) -> dict:
+    """Задержка поиска номеров строк (без кэша) по запросам (okpd2, name)"""
+    samples = []
+    found = []
+    for okpd2, name in queries:
+        okpd2_key, name_key = normalize_query(okpd2, name)
+        start = time.perf_counter()
+        positions, _ = scraper._match_positions(scraper.generation, okpd2_key, name_key)
+        samples.append(time.perf_counter() - start)
+        found.append(len(positions))
+    samples_ms = np.array(samples) * 1000
+    return {
+        'queries': len(queries),
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(samples_ms, 99)), 3),
+        'mean_found': round(float(np.mean(found)), 1),
+    }
+
+
+def memory_report(snapshot) -> dict:
+    """Байт на строку снимка по колонкам: объектные строки pandas (как в
+    прежнем df_cache), строки Arrow без кодирования и текущий снимок.
+
+    Колонки переводятся в pandas по одной, чтобы не поднимать пиковый RSS.
+    """
+    rows = max(snapshot.num_rows, 1)
+    report = {'pandas_object': {}, 'arrow_string': {}, 'snapshot': {}}
+    for column in GISP_COLUMNS:
+        strings = snapshot.string_column(column)
+        series = strings.to_pandas(deduplicate_objects=False)
+        report['pandas_object'][column] = int(series.memory_usage(index=False, deep=True))
+        del series
+        report['arrow_string'][column] = column_nbytes(strings)
+        report['snapshot'][column] = column_nbytes(snapshot.column(column))
+    return {
+        'bytes_per_row': {kind: round(sum(sizes.values()) / rows, 1) for kind, sizes in report.items()},
+        'snapshot_bytes_per_row_by_column': {
+            column: round(size / rows, 1) for column, size in report['snapshot'].items()
+        },
+    }
+
+
+def run_single(rows: int, xlsx_path: str, queries: int) -> dict:
+    workdir = tempfile.mkdtemp()
+    scraper = build_scraper(workdir)
+    generation_id = scraper.generations.create()
+    snapshot_path = scraper.generations.snapshot_path(generation_id)
+    index_dir = scraper.generations.index_dir(generation_id)
+
+    start = time.perf_counter()
+    ingested = ingest_registry(xlsx_path, snapshot_path, INGEST_BATCH_SIZE)
+    ingest_seconds = time.perf_counter() - start
+    ingest_rss_mb = peak_rss_mb()
+
+    start = time.perf_counter()
+    summary = build_generation_indexes(snapshot_path, index_dir)
+    index_seconds = time.perf_counter() - start
+    index_rss_mb = peak_rss_mb()
+
+    scraper._activate_generation(generation_id, summary)
+    search_index = scraper.generation.search_index
+    result = {
+        'rows': ingested,
+        'ingest_seconds': round(ingest_seconds, 3),
+        'ingest_rows_per_sec': round(ingested / ingest_seconds, 1),
+        'ingest_peak_rss_mb': ingest_rss_mb,
+        'snapshot_mb': round(os.path.getsize(snapshot_path) / (1024 * 1024), 1),
+        'index_seconds': round(index_seconds, 3),
+        'index_peak_rss_mb': index_rss_mb,
+        # Индексы открываются через memory map: их объем - это файлы на диске
+        'index_mb': dir_size_mb(index_dir),
+        'index_mb_by_kind': {
+            kind: round(index.nbytes / (1024 * 1024), 1)
+            for kind, index in search_index.items() if hasattr(index, 'nbytes')
+        },
+        'okpd2': measure_queries(scraper, [(code, None) for code in okpd2_queries(queries)]),
+        'name': measure_queries(scraper, [(None, name) for name in name_queries(queries)]),
+        'combined': measure_queries(scraper, combined_queries(queries)),
+        'search_peak_rss_mb': peak_rss_mb(),
+    }
+    # Отчет о памяти - последним: перевод колонок в pandas поднимает пиковый RSS
+    result['memory'] = memory_report(scraper.generation.snapshot)
+    scraper.executor.shutdown()
+    return result
+
+
+def flatten(result: dict, prefix: str = '') -> dict:
+    values = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)):
+            values[f'{prefix}{key}'] = value
+    return values
+
+
+def compare(baseline: dict, current: dict):
+    """Печатает изменение метрик относительно baseline по каждому размеру"""
+    print(f"{baseline['commit']} -> {current['commit']}")
+    baseline_by_rows = {result['rows']: flatten(result) for result in baseline['results']}
+    for result in current['results']:
+        old = baseline_by_rows.get(result['rows'])
+        if old is None:
+            continue
+        print(f"rows={result['rows']}")
+        for metric, value in flatten(result).items():
+            if metric == 'rows' or metric not in old:
+                continue
+            change = (value - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            print(f"  {metric}: {old[metric]} -> {value} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'gisp_bench'),
+                        help='Каталог для сгенерированных xlsx файлов')
+    parser.add_argument('--output', help='JSON файл результатов (по умолчанию benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='JSON файл предыдущего запуска для сравнения')
+    parser.add_argument('--run', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--xlsx', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_single(args.run, args.xlsx, args.queries), ensure_ascii=False))
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    for rows in [int(size) for size in args.sizes.split(',')]:
+        xlsx_path = os.path.join(args.data_dir, registry_xlsx_name(rows))
+        if not os.path.exists(xlsx_path):
+            print(f'Generating {rows} rows into {xlsx_path}...', file=sys.stderr)
+            write_registry_xlsx(f'{xlsx_path}.tmp', rows)
+            os.replace(f'{xlsx_path}.tmp', xlsx_path)
+        print(f'Measuring {rows} rows...', file=sys.stderr)
+        result = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_suite', '--run', str(rows), '--xlsx', xlsx_path,
+             '--queries', str(args.queries)],
+            capture_output=True, text=True, check=True, cwd=ROOT_DIR
+        )
+        results.append(json.loads(result.stdout.strip().splitlines()[-1]))
+        print(json.dumps(results[-1], ensure_ascii=False))
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'Results written to {output}', file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
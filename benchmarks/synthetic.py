@@ -0,0 +1,207 @@
+"""Генерация синтетических данных реестра ГИСП для бенчмарков"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from src.gisp_store import GISP_COLUMNS, GISP_DATE_USECOLS, GISP_HEADER_ROWS, GISP_USECOLS
+
+# Классы ОКПД2 обрабатывающих производств (первые две цифры кода) и слова,
+# с которых начинаются наименования продукции класса. Порядок классов задает
+# их долю в реестре: классы распределены по Ципфу
+OKPD2_CLASSES = [
+    ('27', ['кабель', 'светильник', 'двигатель', 'трансформатор', 'провод', 'генератор', 'аккумулятор']),
+    ('26', ['компьютер', 'ноутбук', 'датчик', 'монитор', 'сервер', 'счетчик', 'коммутатор', 'принтер',
+            'маршрутизатор']),
+    ('28', ['клапан', 'насос', 'вентилятор', 'подшипник', 'фильтр', 'компрессор', 'редуктор', 'радиатор',
+            'станок']),
+    ('31', ['стол', 'стул', 'шкаф', 'кровать']),
+    ('25', ['котел', 'болт', 'контейнер', 'резервуар']),
+    ('22', ['пленка', 'шланг', 'шина']),
+    ('24', ['труба', 'прокат', 'профиль']),
+    ('32', ['шприц', 'протез', 'тренажер']),
+    ('29', ['автомобиль', 'прицеп', 'кузов']),
+    ('23', ['кирпич', 'цемент', 'плитка']),
+    ('20', ['краска', 'лак', 'клей']),
+    ('30', ['вагон', 'катер', 'велосипед']),
+    ('16', ['доска', 'фанера', 'поддон']),
+    ('14', ['куртка', 'комбинезон', 'перчатка']),
+    ('21', ['вакцина', 'таблетка']),
+    ('13', ['ткань', 'пряжа', 'брезент']),
+    ('17', ['картон', 'бумага']),
+    ('10', ['консервы', 'сыр', 'хлеб']),
+]
+NOUNS = [noun for _, nouns in OKPD2_CLASSES for noun in nouns]
+# Окончания полных кодов (подкатегория, три последние цифры)
+OKPD2_ENDINGS = ['000', '110', '120', '130', '140', '150', '190']
+
+
+def okpd2_hierarchy(seed: int = 1):
+    """Создает дерево кодов ОКПД2 вида 27.32.13.190 по классам OKPD2_CLASSES.
+
+    Класс делится на подклассы, группы, подгруппы и виды (по одной цифре на
+    уровень), вид - на подкатегории; всего несколько тысяч полных кодов.
+    Продукция одного вида называется одним словом из слов класса.
+    Возвращает массивы кодов, слов и долей кодов в реестре: доли классов
+    убывают по Ципфу, внутри класса коды тоже распределены по Ципфу.
+    """
+    rng = np.random.default_rng(seed)
+    digits = np.arange(1, 10)
+    codes, nouns, weights = [], [], []
+    for rank, (okpd2_class, class_nouns) in enumerate(OKPD2_CLASSES, start=1):
+        class_codes, class_nouns_of_codes = [], []
+        for subclass in sorted(rng.choice(digits, rng.integers(3, 8), replace=False)):
+            for group in sorted(rng.choice(digits, rng.integers(1, 6), replace=False)):
+                for subgroup in sorted(rng.choice(digits, rng.integers(1, 4), replace=False)):
+                    for kind in sorted(rng.choice(digits, rng.integers(1, 6), replace=False)):
+                        noun = class_nouns[rng.integers(len(class_nouns))]
+                        for ending in sorted(rng.choice(OKPD2_ENDINGS, rng.integers(1, 5), replace=False)):
+                            class_codes.append(f'{okpd2_class}.{subclass}{group}.{subgroup}{kind}.{ending}')
+                            class_nouns_of_codes.append(noun)
+        code_weights = 1.0 / rng.permutation(np.arange(1, len(class_codes) + 1))
+        codes.extend(class_codes)
+        nouns.extend(class_nouns_of_codes)
+        weights.extend(code_weights / code_weights.sum() / rank ** 1.1)
+    weights = np.array(weights)
+    return np.array(codes), np.array(nouns), weights / weights.sum()
+
+
+OKPD2_CODES, OKPD2_NOUNS, OKPD2_WEIGHTS = okpd2_hierarchy()
+ADJECTIVES = [
+    'персональный', 'промышленный', 'офисный', 'силовой', 'медицинский', 'стальной',
+    'электрический', 'цифровой', 'автоматический', 'взрывозащищенный', 'портативный',
+    'уличный', 'многофункциональный', 'герметичный', 'высоковольтный', 'бытовой'
+]
+
+
+def make_registry_frame(rows: int, seed: int = 42, start: int = 0) -> pd.DataFrame:
+    """Создает DataFrame с колонками GISP_COLUMNS и реалистичными повторами значений.
+
+    start - номер первой строки, чтобы реестровые номера частей большого
+    реестра не повторялись.
+    """
+    rng = np.random.default_rng(seed)
+    manufacturers = max((start + rows) // 20, 1)
+    manufacturer_ids = rng.zipf(1.3, rows) % manufacturers
+    products = rng.choice(len(OKPD2_CODES), rows, p=OKPD2_WEIGHTS)
+    nouns = OKPD2_NOUNS[products]
+    adjectives = np.array(ADJECTIVES)[rng.integers(0, len(ADJECTIVES), rows)]
+    models = rng.integers(1, 100000, rows)
+    registered = pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 1800, rows), unit='D')
+    return pd.DataFrame({
+        'Предприятие': pd.Series(manufacturer_ids).map(lambda i: f'ООО "Завод {i}"'),
+        'ИНН': (7700000000 + manufacturer_ids).astype(str),
+        'Реестровый номер': [
+            f'{10000000 + i}\\{year}' for i, year in zip(range(start, start + rows), registered.year)
+        ],
+        'Дата внесения в реестр': registered.strftime('%Y-%m-%d'),
+        'Срок действия': (registered + pd.Timedelta(days=1095)).strftime('%Y-%m-%d'),
+        'Наименование продукции': [
+            f'{noun.capitalize()} {adjective} модель {model}'
+            for noun, adjective, model in zip(nouns, adjectives, models)
+        ],
+        'ОКПД2': OKPD2_CODES[products],
+        'ТН ВЭД': (8400000000 + rng.integers(0, 10 ** 8, rows)).astype(str),
+        'Изготовлена по': [f'ТУ {i}' for i in rng.integers(0, 1000, rows)],
+    })
+
+
+def registry_xlsx_name(rows: int) -> str:
+    """Имя закэшированного xlsx файла; меняется вместе с генератором данных"""
+    return f'gisp_{rows}_okpd2_tree.xlsx'
+
+
+def write_registry_xlsx(path: str, rows: int, seed: int = 42, chunk_rows: int = 50000):
+    """Пишет xlsx файл в формате выгрузки реестра ГИСП.
+
+    15 колонок, две служебные строки и заголовок; данные - в колонках
+    GISP_USECOLS, даты - числовыми датами Excel. Строки генерируются
+    частями по chunk_rows, книга пишется в режиме constant_memory, так
+    что память не растет с размером файла.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    worksheet = workbook.add_worksheet()
+    date_format = workbook.add_format({'num_format': 'dd.mm.yyyy'})
+    worksheet.write(0, 0, 'Реестр промышленной продукции')
+    worksheet.write(1, 0, f'Сформирован {date.today():%d.%m.%Y}')
+    header = [f'Колонка {column}' for column in range(15)]
+    for column, name in zip(GISP_USECOLS, GISP_COLUMNS):
+        header[column] = name
+    worksheet.write_row(2, 0, header)
+    for chunk, offset in enumerate(range(0, rows, chunk_rows)):
+        frame = make_registry_frame(min(chunk_rows, rows - offset), seed=seed + chunk, start=offset)
+        for row, values in enumerate(frame.itertuples(index=False), start=offset + GISP_HEADER_ROWS):
+            for column, value in zip(GISP_USECOLS, values):
+                if column in GISP_DATE_USECOLS:
+                    worksheet.write_datetime(row, column, date.fromisoformat(value), date_format)
+                else:
+                    worksheet.write_string(row, column, value)
+    workbook.close()
+
+
+def name_queries(count: int, seed: int = 7):
+    """Набор запросов по наименованию: целые слова, части слов и фразы"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for i in range(count):
+        noun = NOUNS[rng.integers(len(NOUNS))]
+        kind = i % 4
+        if kind == 0:
+            queries.append(noun)
+        elif kind == 1:
+            queries.append(noun[1:-2])
+        elif kind == 2:
+            queries.append(f'{noun} {ADJECTIVES[rng.integers(len(ADJECTIVES))]}')
+        else:
+            queries.append(f'модель {rng.integers(1, 100000)}')
+    return queries
+
+
+def okpd2_queries(count: int, seed: int = 5):
+    """Запросы по ОКПД2: префиксы кодов разной длины, от класса до полного кода.
+
+    Коды выбираются с долями OKPD2_WEIGHTS, как в реестре.
+    """
+    rng = np.random.default_rng(seed)
+    lengths = [2, 5, 8, 12]
+    codes = OKPD2_CODES[rng.choice(len(OKPD2_CODES), count, p=OKPD2_WEIGHTS)]
+    return [code[:lengths[i % len(lengths)]] for i, code in enumerate(codes)]
+
+
+def combined_queries(count: int, seed: int = 9):
+    """Комбинированные запросы: (префикс ОКПД2, наименование)"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for i, product in enumerate(rng.choice(len(OKPD2_CODES), count, p=OKPD2_WEIGHTS)):
+        code, noun = OKPD2_CODES[product], OKPD2_NOUNS[product]
+        if i % 2:
+            # Наименование из другой группы: пустой результат тоже нужно измерять
+            noun = NOUNS[rng.integers(len(NOUNS))]
+        queries.append((code[:5], noun))
+    return queries
+
+
+def fuzzy_queries(count: int, seed: int = 11):
+    """Запросы для нечеткого поиска: другие словоформы, ё вместо е и опечатки"""
+    rng = np.random.default_rng(seed)
+    endings = ['ы', 'а', 'ов', 'ами', 'е']
+    queries = []
+    for i in range(count):
+        word = NOUNS[rng.integers(len(NOUNS))]
+        kind = i % 4
+        if kind == 0:
+            queries.append(word + endings[rng.integers(len(endings))])
+        elif kind == 1:
+            # Пропущенная буква
+            position = int(rng.integers(1, len(word)))
+            queries.append(word[:position] + word[position + 1:])
+        elif kind == 2:
+            # Соседние буквы переставлены
+            position = int(rng.integers(1, len(word) - 1))
+            queries.append(word[:position] + word[position + 1] + word[position] + word[position + 2:])
+        else:
+            adjective = ADJECTIVES[rng.integers(len(ADJECTIVES))]
+            queries.append(f'{word}ы {adjective[:-2]}ые'.replace('е', 'ё', 1))
+    return queries
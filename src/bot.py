@@ -1,19 +1,39 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
-import pandas as pd
+from telegram.error import BadRequest
 import logging
-import asyncio
 import os
 import sys
 import json
+import shutil
+import tempfile
 import time
+from datetime import timedelta
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import BOT_TOKEN, ADMIN_USERNAME
-from src.scraper import ProductScraper
+try:
+    from config import METRICS_PORT
+except ImportError:
+    # Необязательная настройка: без нее метрики доступны только через /stats
+    METRICS_PORT = None
+try:
+    from config import SEARCH_WORKERS
+except ImportError:
+    # Необязательная настройка: без нее поиск ГИСП идет в пуле потоков бота
+    SEARCH_WORKERS = 0
+from src.scraper import ProductScraper, describe_unavailable_sources
 from src.report_generator import ReportGenerator
+from src.result_cursor import CursorStore, ResultCursor
+from src.message_scheduler import MessageScheduler
+from src.metrics import METRIC_HELP, metrics, start_metrics_server
+from src.search_pool import SearchPool
+from src.update_coordinator import UpdateCoordinator
 from src.user_manager import UserManager
 
+# Время запуска процесса: от него считается время до первого ответа
+STARTED_AT = time.perf_counter()
+
 # Настраиваем логирование
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -54,6 +74,7 @@ HELP_MESSAGE = """
    - Введите код ОКПД2 (например: 26.20.11)
 2. 📝 Поиск по наименованию
    - Введите название продукции (например: компьютер)
+   - Если точных совпадений нет, бот ищет другие формы слов и исправляет опечатки
 3. 🔄 Комбинированный поиск
    - Введите код ОКПД2 и название через запятую
    - Пример: 26.20.11, компьютер
@@ -65,23 +86,98 @@ HELP_MESSAGE = """
 /admin add username - Добавить пользователя
 /admin remove username - Удалить пользователя
 /admin list - Список пользователей
+/admin cache - Статистика кэшей ЕАЭС и ГИСП
+/admin eaeu - Состояние зеркала ЕАЭС (sync - синхронизировать)
+/admin messages - Статистика отправки сообщений
+/admin updates - Состояние обновлений ГИСП и ЕАЭС
+/stats - Задержки этапов, счетчики и память
 /update_gisp - Обновление файла ГИСП
+/gisp_generation - Активное поколение базы ГИСП
+/gisp_generation rollback [id] - Откат на предыдущее или указанное поколение
 """
 
+# Форматы выгрузки результатов: Excel для небольших выборок, сжатый CSV для полных выгрузок
+EXPORT_FORMATS = {
+    'xlsx': 'Excel',
+    'csv_gz': 'CSV.gz',
+    'csv_zst': 'CSV.zst',
+}
+# Ограничение листа Excel без строки заголовка
+XLSX_MAX_ROWS = 1048575
+
 SEARCH_SOURCES = {
     'all': 'Везде',
     'gisp': 'ГИСП',
     'eaeu': 'ЕАЭС'
 }
 
+# Telegram не принимает сообщения длиннее 4096 символов
+MAX_MESSAGE_LENGTH = 4096
+
+
+def _format_labels(labels) -> str:
+    return ", ".join(f"{key}={value}" for key, value in labels)
+
+
+def _format_value(name: str, value: float) -> str:
+    if name.endswith('_bytes'):
+        return f"{value / (1024 * 1024):.1f} MB"
+    if name.endswith('_ratio'):
+        return f"{value:.0%}"
+    return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.1f}"
+
+
+def format_stats(snapshot: dict) -> str:
+    """Текст /stats по снимку реестра метрик"""
+    lines = ["📈 Статистика бота", "", "⏱ Задержки, мс (p50 / p95 / p99, число замеров):"]
+    for name, series in sorted(snapshot['histograms'].items()):
+        lines.append(f"{METRIC_HELP.get(name, name)}:")
+        for labels, summary in sorted(series.items()):
+            percentiles = " / ".join(f"{value * 1000:.0f}" for value in summary['percentiles'].values())
+            lines.append(f"  {_format_labels(labels) or '-'}: {percentiles} (n={summary['count']})")
+    lines += ["", "🔢 Счетчики:"]
+    for name, series in sorted(snapshot['counters'].items()):
+        for labels, value in sorted(series.items()):
+            suffix = f" ({_format_labels(labels)})" if labels else ""
+            lines.append(f"  {METRIC_HELP.get(name, name)}{suffix}: {_format_value(name, value)}")
+    lines += ["", "📏 Текущие значения:"]
+    for name, series in sorted(snapshot['gauges'].items()):
+        for labels, value in sorted(series.items()):
+            suffix = f" ({_format_labels(labels)})" if labels else ""
+            lines.append(f"  {METRIC_HELP.get(name, name)}{suffix}: {_format_value(name, value)}")
+    text = "\n".join(lines)
+    if len(text) > MAX_MESSAGE_LENGTH:
+        text = text[:MAX_MESSAGE_LENGTH - 1] + "…"
+    return text
+
+
 class ProductSearchBot:
     def __init__(self):
         logger.debug("Initializing ProductSearchBot...")
         try:
             self.scraper = ProductScraper()
+            if SEARCH_WORKERS and (os.cpu_count() or 1) > 1:
+                self.scraper.search_pool = SearchPool(int(SEARCH_WORKERS), self.scraper.executor)
+            elif SEARCH_WORKERS:
+                # На одном ядре процессы не ускоряют проверку, а передача кандидатов замедляет ее
+                logger.warning("SEARCH_WORKERS is ignored on a single CPU, searching in threads")
             self.report_generator = ReportGenerator()
             self.user_manager = UserManager()
             self.active_searches = set()
+            self.active_exports = set()
+            # Результаты поиска хранятся как номера строк и показываются постранично
+            self.cursors = CursorStore(ttl=1800, max_cursors=1000, page_size=10)
+            # Все отправки и изменения сообщений проходят через планировщик с лимитами Telegram
+            self.messages = MessageScheduler(global_rate=30, chat_rate=1, group_rate=20 / 60)
+            self.metrics_runner = None
+            # Обновления ГИСП и зеркала ЕАЭС: по расписанию JobQueue и по командам, по одному за раз
+            self.updates = UpdateCoordinator('data/update_state.json')
+            self.updates.add('gisp', self.scraper.update_registry, timedelta(days=self.scraper.gisp_update_days),
+                             data_time=self.scraper.gisp_data_time)
+            self.updates.add('eaeu', self.scraper.sync_eaeu_mirror, timedelta(hours=self.scraper.eaeu_sync_hours),
+                             data_time=self.scraper.eaeu_data_time)
+            self.first_response_seconds = None
+            self._register_metrics()
             self.file_update_status = None
             # Проверяем и создаем директорию для данных
             os.makedirs('data', exist_ok=True)
@@ -98,6 +194,25 @@ class ProductSearchBot:
             logger.error(f"Error during initialization: {e}", exc_info=True)
             raise
 
+    def _register_metrics(self):
+        """Значения, которые вычисляются при чтении метрик"""
+        scraper = self.scraper
+
+        def index_bytes():
+            generation = scraper.generation
+            if generation is None:
+                return None
+            return sum(getattr(index, 'nbytes', 0) for index in generation.search_index.values())
+
+        metrics.gauge_func('gisp_rows', lambda: scraper.generation.snapshot.num_rows if scraper.generation else None)
+        metrics.gauge_func('gisp_index_bytes', index_bytes)
+        metrics.gauge_func('gisp_snapshot_bytes', lambda: scraper.snapshot.nbytes if scraper.snapshot else None)
+        metrics.gauge_func('eaeu_mirror_rows', lambda: scraper.eaeu_mirror.manifest.get('rows'))
+        for label, cache in (('eaeu', scraper.eaeu_cache), ('gisp', scraper.gisp_cache)):
+            metrics.gauge_func('cache_bytes', lambda cache=cache: cache.bytes, cache=label)
+            metrics.gauge_func('cache_hit_ratio', lambda cache=cache: cache.stats()['hit_rate'], cache=label)
+        metrics.gauge_func('cursors', lambda: len(self.cursors))
+
     async def check_access(self, update: Update) -> bool:
         user = update.effective_user
         has_access = self.user_manager.is_allowed(username=user.username)
@@ -181,14 +296,20 @@ class ProductSearchBot:
         self.file_update_status = status_message
         try:
             logger.debug("Starting GISP file download process...")
-            await status_message.edit_text("⏳ Загрузка файла ГИСП...")
-            total_rows = await self.scraper.download_gisp_file_with_status(status_message)
-            # Добавляем задержку перед проверкой существования файла
-            time.sleep(2)
-            if not os.path.exists(self.scraper.GISP_FILE_PATH):
-                raise Exception("CSV файл не был создан")
-            if os.path.getsize(self.scraper.GISP_FILE_PATH) == 0:
-                raise Exception("CSV файл создан, но пуст")
+            if self.updates.is_running('gisp'):
+                await status_message.edit_text("⏳ Обновление ГИСП уже выполняется, ожидаем его завершения...")
+            else:
+                await status_message.edit_text("⏳ Загрузка файла ГИСП...")
+            # Скачивание и обработка идут вне цикла событий, остальные
+            # пользователи в это время получают ответы без задержки
+            total_rows = await self.updates.run(
+                'gisp', lambda: self.scraper.update_registry(status_message)
+            )
+            snapshot = self.scraper.snapshot
+            if snapshot is None or not os.path.exists(snapshot.path):
+                raise Exception("Снимок ГИСП не был создан")
+            if os.path.getsize(snapshot.path) == 0:
+                raise Exception("Снимок ГИСП создан, но пуст")
             if total_rows <= 0:
                 raise Exception("Не было обработано ни одной строки")
             # Проверяем и удаляем временный файл
@@ -200,10 +321,30 @@ class ProductSearchBot:
                 except Exception as e:
                     logger.warning(f"Failed to remove temporary file: {e}")
             logger.debug(f"GISP file download completed, processed {total_rows} rows")
+            last_download = self.scraper.last_download
+            if last_download is not None and last_download.not_modified:
+                await status_message.edit_text(
+                    f"✅ Реестр ГИСП не изменился, обновление не требуется\n"
+                    f"📊 Записей в базе: {total_rows:,}"
+                )
+                return
+            summary = self.scraper.last_update_summary or {}
+            if summary.get('mode') == 'delta':
+                changes = (
+                    f"➕ Добавлено: {summary['added']:,}\n"
+                    f"➖ Удалено: {summary['removed']:,}\n"
+                    f"✏️ Изменено: {summary['changed']:,}\n"
+                    f"⏱️ Применение изменений: {summary['seconds']:.1f} с\n"
+                )
+            else:
+                changes = f"🔄 Индексы перестроены полностью за {summary.get('seconds', 0):.1f} с\n"
             await status_message.edit_text(
                 f"✅ Файл ГИСП успешно обновлен!\n"
                 f"📊 Обработано строк: {total_rows:,}\n"
-                f"📁 Размер файла: {os.path.getsize(self.scraper.GISP_FILE_PATH) / (1024*1024):.1f} MB"
+                f"{changes}"
+                f"📁 Размер файла: {os.path.getsize(snapshot.path) / (1024*1024):.1f} MB\n"
+                f"🗂 Поколение: {self.scraper.generation.id}\n"
+                f"🔐 SHA-256: {last_download.sha256[:16]}…"
             )
         except Exception as e:
             error_msg = str(e)
@@ -216,6 +357,47 @@ class ProductSearchBot:
         finally:
             self.file_update_status = None
 
+    async def gisp_generation(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Показывает активное поколение базы ГИСП и откатывает на сохраненное"""
+        user = update.effective_user
+        if not self.user_manager.is_admin(user.username):
+            await update.message.reply_text("У вас нет прав администратора.")
+            return
+        try:
+            command_parts = update.message.text.split()
+            if len(command_parts) >= 2 and command_parts[1].lower() == "rollback":
+                target_id = command_parts[2] if len(command_parts) == 3 else None
+                generation = await self.scraper.executor.run_io(self.scraper.rollback_generation, target_id)
+                await update.message.reply_text(f"↩️ Поиск переключен на поколение {generation.id}")
+                return
+            current_id = self.scraper.generations.current_id()
+            message = "🗂 Поколения базы ГИСП:\n"
+            for manifest in reversed(self.scraper.generations.published()):
+                marker = "▶️" if manifest['id'] == current_id else "▫️"
+                update_info = manifest.get('update', {})
+                message += (
+                    f"{marker} {manifest['id']} - {manifest.get('rows', 0):,} строк, "
+                    f"{update_info.get('mode', 'full')}\n"
+                )
+            if current_id is None:
+                message += "Активного поколения нет, выполните /update_gisp"
+            await update.message.reply_text(message)
+        except Exception as e:
+            logger.error(f"GISP generation command error: {e}", exc_info=True)
+            await update.message.reply_text(f"❌ Ошибка: {str(e)}")
+
+    async def stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Показывает задержки этапов (p50/p95/p99), счетчики и текущие значения метрик"""
+        user = update.effective_user
+        if not self.user_manager.is_admin(user.username):
+            await update.message.reply_text("У вас нет прав администратора.")
+            return
+        try:
+            await update.message.reply_text(format_stats(metrics.snapshot()))
+        except Exception as e:
+            logger.error(f"Stats command error: {e}", exc_info=True)
+            await update.message.reply_text(f"❌ Ошибка: {str(e)}")
+
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not await self.check_access(update):
             return
@@ -236,47 +418,167 @@ class ProductSearchBot:
             await update.message.reply_text("🔄 Поиск уже выполняется. Дождитесь результатов или остановите текущий поиск.")
             return
         self.active_searches.add(user_id)
+        status_message = None
         try:
             status_message = await update.message.reply_text("⏳ Начинаем поиск...")
             if search_type == 'okpd2':
-                results = await self.scraper.search_all(okpd2=query, status_message=status_message)
+                found = await self.scraper.search_rows(okpd2=query, status_message=status_message)
             elif search_type == 'name':
-                results = await self.scraper.search_all(name=query, status_message=status_message)
+                found = await self.scraper.search_rows(name=query, status_message=status_message)
             elif search_type == 'combined':
                 try:
                     okpd2, name = [x.strip() for x in query.split(',', 1)]
-                    results = await self.scraper.search_all(okpd2=okpd2, name=name, status_message=status_message)
+                    found = await self.scraper.search_rows(okpd2=okpd2, name=name, status_message=status_message)
                 except ValueError:
                     await status_message.edit_text("❌ Неверный формат. Введите код ОКПД2 и наименование через запятую")
-                    self.active_searches.remove(user_id)
                     return
-            if not results:
-                await status_message.edit_text("❌ Ничего не найдено")
-                self.active_searches.remove(user_id)
+            cursor = self.cursors.create(user_id, found, found.source_status)
+            if self.first_response_seconds is None:
+                self.first_response_seconds = time.perf_counter() - STARTED_AT
+                metrics.set('first_response_seconds', self.first_response_seconds)
+        except Exception as e:
+            logger.error(f"Search error: {e}", exc_info=True)
+            if status_message:
+                await status_message.edit_text(f"❌ Ошибка при поиске: {str(e)}")
+            return
+        finally:
+            # Поиск завершен: дальше пользователь листает страницы курсора
+            self.active_searches.discard(user_id)
+        try:
+            if cursor.total == 0:
+                unavailable = describe_unavailable_sources(found)
+                await status_message.edit_text(
+                    "❌ Ничего не найдено" + (f"\n{unavailable}" if unavailable else "")
+                )
                 return
-            # Отправляем результаты частями
-            chunk_size = 10
-            for i in range(0, len(results), chunk_size):
-                chunk = results[i:i + chunk_size]
-                message = f"📄 Результаты поиска (часть {i//chunk_size + 1}/{-(-len(results)//chunk_size)}):\n"
-                for item in chunk:
-                    message += (
-                        f"🏢 {item['manufacturer']}\n"
-                        f"📦 {item['name']}\n"
-                        f"📝 ОКПД2: {item['okpd2_code']}\n"
-                        f"🔢 ИНН: {item['inn']}\n"
-                        f"📋 Реестровый номер: {item['registry_number']}\n"
-                        f"📅 Дата регистрации: {item['registry_date']}\n"
-                        f"⏳ Действует до: {item['valid_until']}\n"
-                        f"🌐 Источник: {item['source']}\n"
-                        f"{'=' * 30}\n"
+            text, reply_markup = await self.render_page(cursor, 0)
+            await update.message.reply_text(text, reply_markup=reply_markup)
+        except Exception as e:
+            logger.error(f"Error sending results: {e}", exc_info=True)
+            await update.message.reply_text(f"❌ Ошибка при выводе результатов: {str(e)}")
+
+    async def render_page(self, cursor: ResultCursor, number: int) -> tuple:
+        """Текст страницы результатов и кнопки ◀ ▶ для перехода между страницами"""
+        # Записи страницы собираются из снимка только сейчас
+        with metrics.timer('page_render_seconds'):
+            items = await self.scraper.executor.run_io(cursor.page, number)
+        message = f"📄 Результаты поиска (страница {number + 1}/{cursor.pages}, всего {cursor.total}):\n"
+        for item in items:
+            message += (
+                f"🏢 {item['manufacturer']}\n"
+                f"📦 {item['name']}\n"
+                f"📝 ОКПД2: {item['okpd2_code']}\n"
+                f"🔢 ИНН: {item['inn']}\n"
+                f"📋 Реестровый номер: {item['registry_number']}\n"
+                f"📅 Дата регистрации: {item['registry_date']}\n"
+                f"⏳ Действует до: {item['valid_until']}\n"
+                f"🌐 Источник: {item['source']}\n"
+                f"{'=' * 30}\n"
+            )
+        keyboard = [[
+            InlineKeyboardButton(f"📥 {label}", callback_data=f"export:{cursor.id}:{export_format}")
+            for export_format, label in EXPORT_FORMATS.items()
+        ]]
+        if cursor.pages > 1:
+            buttons = []
+            if number > 0:
+                buttons.append(InlineKeyboardButton("◀", callback_data=f"page:{cursor.id}:{number - 1}"))
+            buttons.append(InlineKeyboardButton(f"{number + 1}/{cursor.pages}", callback_data="page:noop"))
+            if number < cursor.pages - 1:
+                buttons.append(InlineKeyboardButton("▶", callback_data=f"page:{cursor.id}:{number + 1}"))
+            keyboard.insert(0, buttons)
+        return message, InlineKeyboardMarkup(keyboard)
+
+    async def page_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик кнопок ◀ ▶ страниц результатов"""
+        query = update.callback_query
+        user = update.effective_user
+        if not self.user_manager.is_allowed(username=user.username):
+            await query.answer("У вас нет доступа к боту.", show_alert=True)
+            return
+        try:
+            _, cursor_id, number = query.data.split(':')
+            number = int(number)
+        except ValueError:
+            # Кнопка с номером страницы ничего не делает
+            await query.answer()
+            return
+        cursor = self.cursors.get(cursor_id)
+        if cursor is None or cursor.user_id != user.id:
+            await query.answer("Результаты устарели, выполните поиск заново", show_alert=True)
+            await query.edit_message_reply_markup(reply_markup=None)
+            return
+        await query.answer()
+        try:
+            number = min(max(number, 0), cursor.pages - 1)
+            text, reply_markup = await self.render_page(cursor, number)
+            await query.edit_message_text(text, reply_markup=reply_markup)
+        except BadRequest as e:
+            # Повторное нажатие на ту же кнопку не меняет сообщение
+            if 'not modified' not in str(e).lower():
+                raise
+        except Exception as e:
+            logger.error(f"Error in page handler: {e}", exc_info=True)
+            await query.message.reply_text("❌ Не удалось показать страницу результатов")
+
+    async def export_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик кнопок выгрузки результатов поиска в Excel и сжатый CSV"""
+        query = update.callback_query
+        user = update.effective_user
+        if not self.user_manager.is_allowed(username=user.username):
+            await query.answer("У вас нет доступа к боту.", show_alert=True)
+            return
+        _, cursor_id, export_format = (query.data.split(':') + ['xlsx'])[:3]
+        if export_format not in EXPORT_FORMATS:
+            await query.answer()
+            return
+        cursor = self.cursors.get(cursor_id)
+        if cursor is None or cursor.user_id != user.id:
+            await query.answer("Результаты устарели, выполните поиск заново", show_alert=True)
+            return
+        if export_format == 'xlsx' and cursor.total > XLSX_MAX_ROWS:
+            await query.answer("Слишком много строк для Excel, выберите CSV", show_alert=True)
+            return
+        if user.id in self.active_exports:
+            await query.answer("⏳ Выгрузка уже выполняется")
+            return
+        await query.answer()
+        self.active_exports.add(user.id)
+        export_dir = tempfile.mkdtemp(prefix='export_')
+        base_path = os.path.join(export_dir, f"results_{time.strftime('%Y%m%d_%H%M%S')}")
+        try:
+            status_message = await query.message.reply_text(
+                f"⏳ Формирование {EXPORT_FORMATS[export_format]} ({cursor.total} строк)..."
+            )
+            # Файлы пишутся в пуле потоков, строки берутся из курсора батчами
+            with metrics.timer('report_seconds', format=export_format):
+                if export_format == 'xlsx':
+                    rows = await self.scraper.executor.run_io(
+                        self.report_generator.generate_excel_report, cursor.iter_batches(), f"{base_path}.xlsx"
                     )
-                await update.message.reply_text(message)
+                    paths = [f"{base_path}.xlsx"]
+                else:
+                    compression = 'zstd' if export_format == 'csv_zst' else 'gzip'
+                    paths = await self.scraper.executor.run_io(
+                        self.report_generator.generate_csv_export, cursor.iter_tables(), base_path, compression
+                    )
+                    rows = cursor.total
+            metrics.inc('report_rows_total', rows, format=export_format)
+            for number, path in enumerate(paths, 1):
+                caption = f"📊 Результаты поиска: {rows} строк"
+                if len(paths) > 1:
+                    caption += f" (часть {number}/{len(paths)})"
+                with open(path, 'rb') as document:
+                    await query.message.reply_document(
+                        document=document, filename=os.path.basename(path), caption=caption
+                    )
+            await status_message.delete()
         except Exception as e:
-            logger.error(f"Search error: {e}", exc_info=True)
-            await status_message.edit_text(f"❌ Ошибка при поиске: {str(e)}")
+            logger.error(f"Export error: {e}", exc_info=True)
+            await query.message.reply_text(f"❌ Ошибка при выгрузке: {str(e)}")
         finally:
-            self.active_searches.remove(user_id)
+            self.active_exports.discard(user.id)
+            shutil.rmtree(export_dir, ignore_errors=True)
 
     async def admin_commands(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle admin commands"""
@@ -293,7 +595,13 @@ class ProductSearchBot:
                     "Доступные команды:\n"
                     "/admin add username - Добавить пользователя\n"
                     "/admin remove username - Удалить пользователя\n"
-                    "/admin list - Список пользователей"
+                    "/admin list - Список пользователей\n"
+                    "/admin cache - Статистика кэшей ЕАЭС и ГИСП\n"
+                    "/admin cache clear - Очистить кэши\n"
+                    "/admin eaeu - Состояние зеркала ЕАЭС\n"
+                    "/admin eaeu sync - Синхронизировать зеркало ЕАЭС\n"
+                    "/admin messages - Статистика отправки сообщений\n"
+                    "/admin updates - Состояние обновлений ГИСП и ЕАЭС"
                 )
                 return
             action = command_parts[1].lower()
@@ -309,6 +617,82 @@ class ProductSearchBot:
                 for user in regular_users:
                     message += f"- {user}\n"
                 await update.message.reply_text(message)
+            elif action == "cache":
+                caches = {
+                    'запросов ЕАЭС': self.scraper.eaeu_cache,
+                    'номеров строк ГИСП': self.scraper.gisp_cache,
+                }
+                if len(command_parts) == 3 and command_parts[2].lower() == "clear":
+                    for cache in caches.values():
+                        cache.clear()
+                    await update.message.reply_text("🧹 Кэши ЕАЭС и ГИСП очищены")
+                    return
+                messages = []
+                for label, cache in caches.items():
+                    stats = cache.stats()
+                    messages.append(
+                        f"🗄 Кэш {label}:\n"
+                        f"Записей: {stats['entries']} из {cache.max_entries}\n"
+                        f"Объем: {stats['bytes'] / (1024*1024):.1f} из {cache.max_bytes / (1024*1024):.0f} MB\n"
+                        f"Попадания: {stats['hits']}\n"
+                        f"Промахи: {stats['misses']}\n"
+                        f"Объединенные запросы: {stats['coalesced']}\n"
+                        f"Доля попаданий: {stats['hit_rate']:.0%}\n"
+                        f"Вытеснено: {stats['evictions']}, устарело: {stats['expirations']}"
+                    )
+                await update.message.reply_text("\n\n".join(messages))
+            elif action == "messages":
+                stats = self.messages.stats()
+                await update.message.reply_text(
+                    f"📨 Отправка сообщений:\n"
+                    f"Отправлено запросов: {stats['sent']}\n"
+                    f"Пропущено устаревших изменений: {stats['edits_dropped']}\n"
+                    f"Повторов после 429: {stats['retries']}\n"
+                    f"В очереди: {stats['queued']}\n"
+                    f"Суммарное ожидание: {stats['wait_seconds']} с\n"
+                    f"Чатов с лимитом: {stats['chats']}"
+                )
+            elif action == "updates":
+                messages = []
+                for name, label in (('gisp', 'ГИСП'), ('eaeu', 'Зеркало ЕАЭС')):
+                    state = self.updates.state.get(name, {})
+                    running = " (выполняется)" if self.updates.is_running(name) else ""
+                    messages.append(
+                        f"🔄 {label}{running}:\n"
+                        f"Последнее успешное: {state.get('last_success') or '-'}\n"
+                        f"Следующее: {state.get('next_run') or '-'}\n"
+                        f"Неудач подряд: {state.get('failures', 0)}"
+                        + (f"\nПоследняя ошибка: {state['last_error'][:200]}" if state.get('last_error') else "")
+                    )
+                await update.message.reply_text("\n\n".join(messages))
+            elif action == "eaeu":
+                mirror = self.scraper.eaeu_mirror
+                if len(command_parts) == 3 and command_parts[2].lower() == "sync":
+                    status_message = await update.message.reply_text("⏳ Синхронизация зеркала ЕАЭС...")
+                    try:
+                        # Если синхронизация уже идет по расписанию, ждем ее результат
+                        summary = await self.updates.run('eaeu')
+                    except Exception as e:
+                        await status_message.edit_text(f"❌ Синхронизация не выполнена: {str(e)[:200]}")
+                        return
+                    await status_message.edit_text(
+                        f"✅ Зеркало ЕАЭС синхронизировано\n"
+                        f"Новых записей: {summary['new_items']}\n"
+                        f"Всего записей: {summary['total_rows']}"
+                    )
+                    return
+                manifest = mirror.manifest
+                if mirror.generation is None:
+                    await update.message.reply_text("🪞 Зеркало ЕАЭС еще не загружено, поиск идет через API")
+                    return
+                await update.message.reply_text(
+                    f"🪞 Зеркало ЕАЭС:\n"
+                    f"Поколение: {mirror.generation.id}\n"
+                    f"Записей: {manifest.get('rows', 0)}\n"
+                    f"Синхронизировано: {manifest.get('synced_at', '-')}\n"
+                    f"Последняя publishdate: {manifest.get('last_publishdate', '-')}\n"
+                    f"Поиск: {'локально' if mirror.is_fresh() else 'через API (зеркало устарело)'}"
+                )
             elif action in ["add", "remove"] and len(command_parts) == 3:
                 target_username = command_parts[2]
                 if action == "add":
@@ -356,15 +740,58 @@ class ProductSearchBot:
             logger.error(f"Error in search handler: {e}", exc_info=True)
             await query.message.reply_text("❌ Произошла ошибка при обработке запроса")
 
+    async def post_init(self, application: Application):
+        """Запускает открытие баз и обновления по расписанию (бот в это время
+        уже отвечает) и HTTP сервер метрик, если задан METRICS_PORT"""
+        application.create_task(self.start_updates(application))
+        if METRICS_PORT:
+            self.metrics_runner = await start_metrics_server(metrics, int(METRICS_PORT))
+
+    async def start_updates(self, application: Application):
+        """Открывает сохраненные базы и планирует обновления.
+
+        Обновления планируются после открытия баз: время следующего запуска
+        зависит от данных на диске (реестр без базы скачивается сразу,
+        зеркало ЕАЭС догружает только новые записи).
+        """
+        await self.scraper.executor.run_io(self.scraper.warm_start)
+        if self.scraper.search_pool is not None:
+            await self.scraper.executor.run_io(self.scraper.search_pool.start)
+        if application.job_queue is None:
+            logger.error("JobQueue is unavailable, install python-telegram-bot[job-queue]: "
+                         "scheduled updates are disabled")
+            return
+        self.updates.start(application.job_queue)
+
+    async def shutdown(self, application: Application):
+        """Закрывает соединения и пулы ProductScraper при остановке бота"""
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        await self.scraper.eaeu_client.close()
+        self.scraper.executor.shutdown()
+        if self.scraper.search_pool is not None:
+            self.scraper.search_pool.shutdown()
+
     def run(self):
         try:
             logger.info("Starting bot application...")
-            application = Application.builder().token(BOT_TOKEN).build()
+            application = (
+                Application.builder()
+                .token(BOT_TOKEN)
+                .rate_limiter(self.messages)
+                .post_init(self.post_init)
+                .post_shutdown(self.shutdown)
+                .build()
+            )
             application.add_handler(CommandHandler("start", self.welcome))
             application.add_handler(CommandHandler("help", self.help))
             application.add_handler(CommandHandler("stop", self.stop_search))
             application.add_handler(CommandHandler("admin", self.admin_commands))
             application.add_handler(CommandHandler("update_gisp", self.update_gisp))
+            application.add_handler(CommandHandler("gisp_generation", self.gisp_generation))
+            application.add_handler(CommandHandler("stats", self.stats))
+            application.add_handler(CallbackQueryHandler(self.page_handler, pattern=r'^page:'))
+            application.add_handler(CallbackQueryHandler(self.export_handler, pattern=r'^export:'))
             application.add_handler(CallbackQueryHandler(self.search_handler))
             application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
             logger.info("Starting polling...")
@@ -0,0 +1,64 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Размыкатель для источника данных, который раз за разом не отвечает.
+
+    После failure_threshold ошибок подряд источник пропускается сразу
+    (состояние open). Через reset_timeout секунд пропускается один
+    пробный запрос (half_open): при успехе источник снова используется,
+    при ошибке пропускается еще reset_timeout секунд.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self):
+        """Освобождает пробный запрос, который не дал ответа (поиск отменен)"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"Source {self.name} recovered, circuit closed")
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            # Повторное размыкание после неудачного пробного запроса
+            self.opened_at = time.monotonic()
+            logger.warning(
+                f"Source {self.name} failed {self.failures} times, skipping it for {self.reset_timeout:.0f}s"
+            )
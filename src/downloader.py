@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_BLOCK_SIZE = 1024 * 1024
+
+
+@dataclass
+class DownloadResult:
+    path: str
+    not_modified: bool
+    size: int = 0
+    sha256: str = ''
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class FileDownloader:
+    """Потоковое скачивание файла на диск с условными запросами и докачкой.
+
+    Состояние (ETag, Last-Modified, контрольная сумма последнего
+    обработанного файла) хранится в JSON рядом с данными, поэтому
+    неизменившийся файл не скачивается повторно и после перезапуска.
+    Файл считается обработанным только после вызова mark_processed.
+    """
+
+    def __init__(self, state_path: str, block_size: int = DOWNLOAD_BLOCK_SIZE,
+                 timeout=(10, 60), max_attempts: int = 5):
+        self.state_path = state_path
+        self.block_size = block_size
+        # (таймаут соединения, таймаут между блоками данных), а не на весь файл
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.session = requests.Session()
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def _validator(response: requests.Response) -> Dict:
+        return {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+
+    @staticmethod
+    def _file_sha256(path: str) -> 'hashlib._Hash':
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(DOWNLOAD_BLOCK_SIZE), b''):
+                digest.update(block)
+        return digest
+
+    def download(self, url: str, path: str, headers: Optional[Dict] = None, force: bool = False,
+                 on_progress: Optional[Callable[[int, Optional[int]], None]] = None) -> DownloadResult:
+        """Скачивает url в path.
+
+        Возвращает DownloadResult с not_modified=True, если сервер ответил
+        304 или содержимое совпало по контрольной сумме с прошлым файлом.
+        force отключает условные запросы (например, если локальных данных нет).
+        """
+        state = self._load_state()
+        if state.get('url') != url:
+            state = {'url': url}
+        if force:
+            state.pop('complete', None)
+        part_path = f"{path}.part"
+        headers = dict(headers or {})
+        # Сжатие на уровне HTTP мешает докачке по Range
+        headers['Accept-Encoding'] = 'identity'
+
+        attempt = 0
+        while attempt < self.max_attempts:
+            attempt += 1
+            request_headers = dict(headers)
+            partial = state.get('partial')
+            resume_from = os.path.getsize(part_path) if partial and os.path.exists(part_path) else 0
+            if resume_from:
+                request_headers['Range'] = f'bytes={resume_from}-'
+                if_range = partial.get('etag') or partial.get('last_modified')
+                if if_range:
+                    request_headers['If-Range'] = if_range
+            elif os.path.exists(part_path):
+                os.remove(part_path)
+            complete = state.get('complete', {})
+            if complete.get('etag'):
+                request_headers['If-None-Match'] = complete['etag']
+            if complete.get('last_modified'):
+                request_headers['If-Modified-Since'] = complete['last_modified']
+
+            try:
+                with self.session.get(url, headers=request_headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 304:
+                        logger.info("Remote file not modified, skipping download")
+                        return DownloadResult(path=path, not_modified=True, **complete)
+                    if response.status_code == 416 and resume_from:
+                        # Недокачанный файл не короче файла на сервере (скачан целиком
+                        # или файл на сервере уменьшился): докачка невозможна
+                        logger.warning(f"Range from byte {resume_from} not satisfiable, restarting download")
+                        os.remove(part_path)
+                        state.pop('partial', None)
+                        self._save_state(state)
+                        # Повтор с нуля не считается попыткой: он выполняется один раз
+                        attempt -= 1
+                        continue
+                    response.raise_for_status()
+
+                    if response.status_code == 206 and resume_from:
+                        logger.info(f"Resuming download from byte {resume_from}")
+                        digest = self._file_sha256(part_path)
+                        mode = 'ab'
+                        downloaded = resume_from
+                    else:
+                        digest = hashlib.sha256()
+                        mode = 'wb'
+                        downloaded = 0
+                    length = response.headers.get('Content-Length')
+                    total = downloaded + int(length) if length else None
+
+                    state['partial'] = self._validator(response)
+                    self._save_state(state)
+
+                    with open(part_path, mode) as f:
+                        for block in response.iter_content(chunk_size=self.block_size):
+                            f.write(block)
+                            digest.update(block)
+                            downloaded += len(block)
+                            if on_progress:
+                                on_progress(downloaded, total)
+
+                    if total is not None and downloaded < total:
+                        raise requests.exceptions.ChunkedEncodingError(
+                            f"Connection closed after {downloaded} of {total} bytes"
+                        )
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout) as e:
+                if attempt == self.max_attempts:
+                    raise
+                delay = min(2 ** attempt, 30)
+                logger.warning(f"Download interrupted ({e}), retry {attempt}/{self.max_attempts} in {delay}s")
+                time.sleep(delay)
+                continue
+
+            sha256 = digest.hexdigest()
+            os.replace(part_path, path)
+            validator = state.pop('partial')
+            self._save_state(state)
+            not_modified = sha256 == complete.get('sha256')
+            logger.info(f"Downloaded {downloaded} bytes, sha256={sha256}, unchanged={not_modified}")
+            return DownloadResult(path=path, not_modified=not_modified, size=downloaded,
+                                  sha256=sha256, **validator)
+
+        raise RuntimeError("Download failed")
+
+    def mark_processed(self, url: str, result: DownloadResult):
+        """Запоминает валидаторы успешно обработанного файла для условных запросов"""
+        self._save_state({
+            'url': url,
+            'complete': {
+                'etag': result.etag,
+                'last_modified': result.last_modified,
+                'size': result.size,
+                'sha256': result.sha256,
+            },
+        })
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import random
+import sys
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+EAEU_COLLECTION = "db1.v_goodscollection_prod_public"
+# Коды ответа, после которых повтор запроса имеет смысл
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class EaeuClient:
+    """Асинхронный клиент API /spd/find реестра ЕАЭС.
+
+    Соединения переиспользуются через общую aiohttp-сессию (keep-alive),
+    у каждого запроса свой таймаут, сбои сети и ответы 429/5xx
+    повторяются ограниченное число раз с экспоненциальной задержкой.
+    Если результат не помещается в одну страницу, остальные страницы
+    запрашиваются параллельно, не более fan_out одновременно.
+    max_items=None снимает ограничение на число записей (для синхронизации).
+    """
+
+    def __init__(self, url: str, page_size: int = 1000, fan_out: int = 4,
+                 max_items: Optional[int] = 50000, max_attempts: int = 3,
+                 connect_timeout: float = 10, request_timeout: float = 30,
+                 connection_limit: int = 8):
+        self.url = url
+        self.page_size = page_size
+        self.fan_out = max(fan_out, 1)
+        self.max_items = max_items
+        self.max_attempts = max_attempts
+        self.timeout = aiohttp.ClientTimeout(total=request_timeout, connect=connect_timeout)
+        self.connection_limit = connection_limit
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Сессия привязана к циклу событий, поэтому создается при первом запросе
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _post(self, payload: Dict) -> Dict:
+        session = self._get_session()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                async with session.post(self.url, json=payload) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.max_attempts:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history,
+                            status=response.status, message=response.reason or ''
+                        )
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+            except (aiohttp.ClientConnectionError, aiohttp.ClientResponseError, asyncio.TimeoutError) as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status in RETRY_STATUSES
+                if not retryable or attempt == self.max_attempts:
+                    raise
+                delay = min(0.5 * 2 ** (attempt - 1), 5) * random.uniform(0.8, 1.2)
+                logger.warning(
+                    f"EAEU request failed ({type(e).__name__}: {e}), retry {attempt}/{self.max_attempts} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+        raise RuntimeError("EAEU request failed")
+
+    def _payload(self, query_filter: Optional[Dict], skip: int) -> Dict:
+        payload = {
+            "collection": EAEU_COLLECTION,
+            "limit": self.page_size,
+            "skip": skip,
+            "sort": {"publishdate": -1}
+        }
+        if query_filter:
+            payload["filter"] = query_filter
+        return payload
+
+    @staticmethod
+    def _total(data: Dict) -> Optional[int]:
+        for key in ('total', 'count', 'totalCount'):
+            value = data.get(key)
+            if isinstance(value, int):
+                return value
+        return None
+
+    async def pages(self, query_filter: Optional[Dict] = None) -> AsyncIterator[List[Dict]]:
+        """Страницы записей по фильтру по мере получения (всего не больше max_items).
+
+        В памяти держится не больше fan_out страниц: следующие страницы
+        запрашиваются, когда вызывающий обработал предыдущие.
+        """
+        first_page = await self._post(self._payload(query_filter, 0))
+        items = list(first_page.get('items', []))
+        limit = self.max_items if self.max_items is not None else sys.maxsize
+        total = self._total(first_page)
+        if total is not None:
+            limit = min(total, limit)
+        yield items[:limit]
+        if len(items) < self.page_size:
+            return
+        semaphore = asyncio.Semaphore(self.fan_out)
+
+        async def fetch(skip: int) -> List[Dict]:
+            async with semaphore:
+                return (await self._post(self._payload(query_filter, skip))).get('items', [])
+
+        skip = self.page_size
+        while skip < limit:
+            skips = list(range(skip, min(skip + self.fan_out * self.page_size, limit), self.page_size))
+            pages = await asyncio.gather(*(fetch(page_skip) for page_skip in skips))
+            for page_skip, page in zip(skips, pages):
+                yield page[:limit - page_skip]
+            skip = skips[-1] + self.page_size
+            # Неполная страница - последняя, если число записей неизвестно
+            if any(len(page) < self.page_size for page in pages):
+                break
+
+    async def find(self, query_filter: Optional[Dict] = None) -> List[Dict]:
+        """Возвращает все записи по фильтру (но не больше max_items)"""
+        items = []
+        page_count = 0
+        async for page in self.pages(query_filter):
+            items.extend(page)
+            page_count += 1
+        if page_count > 1:
+            logger.info(f"EAEU query returned {len(items)} items in {page_count} pages")
+        return items
@@ -0,0 +1,267 @@
+"""Локальное зеркало коллекции товаров реестра ЕАЭС.
+
+Записи коллекции хранятся в снимке Arrow с теми же колонками, что и
+снимок ГИСП (отсутствующие в ЕАЭС поля пустые), плюс publishdate и
+eaeu_id. Поэтому для зеркала используются те же поколения, индексы и
+поиск, что и для ГИСП. Каждая синхронизация запрашивает только записи
+с publishdate новее последней синхронизации и публикует новое поколение.
+"""
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.generations import Generation, GenerationManager
+from src.gisp_build import build_generation_indexes, build_indexes, indexes_match, load_indexes
+from src.gisp_store import GISP_COLUMNS, GispSnapshot, SnapshotWriter
+
+logger = logging.getLogger(__name__)
+
+MIRROR_COLUMNS = GISP_COLUMNS + ['publishdate', 'eaeu_id']
+# Колонки снимка, которые заполняются из записи ЕАЭС
+EAEU_FIELDS = {
+    'Наименование продукции': ('name',),
+    'ОКПД2': ('okpd2', 'code'),
+    'Предприятие': ('manufacturer', 'name'),
+    'publishdate': ('publishdate',),
+}
+
+
+def _scalar(value) -> str:
+    """Строковое значение поля; {'$date': ...} и {'$oid': ...} раскрываются"""
+    if isinstance(value, dict) and len(value) == 1:
+        key, inner = next(iter(value.items()))
+        if key.startswith('$'):
+            value = inner
+    if value is None:
+        return ''
+    return str(value)
+
+
+def _field(item: Dict, path: tuple) -> str:
+    value = item
+    for key in path:
+        if not isinstance(value, dict):
+            return ''
+        value = value.get(key)
+    return _scalar(value)
+
+
+def items_to_columns(items: List[Dict]) -> List[List[str]]:
+    """Раскладывает записи API ЕАЭС по колонкам MIRROR_COLUMNS"""
+    columns = []
+    for column in MIRROR_COLUMNS:
+        if column == 'eaeu_id':
+            columns.append([_scalar(item.get('_id', item.get('id'))) for item in items])
+        elif column in EAEU_FIELDS:
+            columns.append([_field(item, EAEU_FIELDS[column]) for item in items])
+        else:
+            columns.append([''] * len(items))
+    return columns
+
+
+def latest_publishdate(items: List[Dict]):
+    """Значение publishdate самой новой записи в том виде, в каком его вернул API"""
+    dated = [item['publishdate'] for item in items if item.get('publishdate') is not None]
+    if not dated:
+        return None
+    return max(dated, key=_scalar)
+
+
+class MirrorItemsWriter:
+    """Пишет записи API ЕАЭС по страницам в промежуточный файл Arrow.
+
+    Колонки - MIRROR_COLUMNS строками, без кодирования: файл читается
+    один раз в merge_mirror. В памяти держится только текущая страница.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.schema = pa.schema([(column, pa.string()) for column in MIRROR_COLUMNS])
+        self.rows = 0
+        self.last_publishdate = None
+        self._sink = None
+        self._writer = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._sink = pa.OSFile(self.path, 'wb')
+        self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write_items(self, items: List[Dict]):
+        if not items:
+            return
+        columns = items_to_columns(items)
+        self._writer.write_batch(pa.RecordBatch.from_arrays(
+            [pa.array(values, type=pa.string()) for values in columns], schema=self.schema
+        ))
+        self.rows += len(items)
+        latest = latest_publishdate(items)
+        if latest is not None and (self.last_publishdate is None or _scalar(latest) > _scalar(self.last_publishdate)):
+            self.last_publishdate = latest
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def merge_mirror(items_path: str, snapshot_path: str, index_dir: str,
+                 old_snapshot_path: Optional[str] = None, old_index_dir: Optional[str] = None) -> Dict:
+    """Собирает снимок нового поколения зеркала и его индексы.
+
+    Новые записи (файл MirrorItemsWriter) идут первыми, за ними записи
+    прежнего снимка. Запись, пришедшая повторно (тот же eaeu_id),
+    заменяет прежнюю. Оба снимка читаются через memory map и пишутся
+    по батчам, а индексы переносятся с прежнего поколения через дельту
+    (как у ГИСП), так что неизменные строки заново не индексируются.
+    Функция принимает только пути, поэтому ее можно выполнять в пуле
+    процессов.
+    """
+    start_time = time.time()
+    old_snapshot = None
+    if old_snapshot_path and os.path.exists(old_snapshot_path):
+        old_snapshot = GispSnapshot.open(old_snapshot_path)
+    with pa.memory_map(items_path, 'r') as source:
+        items = pa.ipc.open_file(source).read_all()
+        # Среди новых записей оставляем первое вхождение каждого eaeu_id;
+        # записи без id не сравниваются
+        ids = items['eaeu_id'].combine_chunks()
+        has_id = pc.not_equal(ids, '').fill_null(False).to_numpy(zero_copy_only=False)
+        key_ids = pc.dictionary_encode(ids).indices.to_numpy(zero_copy_only=False)
+        keep = ~has_id
+        _, first = np.unique(np.where(has_id, key_ids, -1), return_index=True)
+        keep[first[has_id[first]]] = True
+        new_ids = pc.unique(ids.filter(pa.array(has_id)))
+        replaced = items.num_rows - int(keep.sum())
+
+        with SnapshotWriter(snapshot_path, columns=MIRROR_COLUMNS) as writer:
+            offset = 0
+            for batch in items.to_batches():
+                mask = pa.array(keep[offset:offset + batch.num_rows])
+                writer.write_table(pa.Table.from_batches([batch.filter(mask)]))
+                offset += batch.num_rows
+            if old_snapshot is not None:
+                for batch in old_snapshot.table.to_batches():
+                    # Прежние записи, пришедшие заново, заменены новыми
+                    repeated = pc.is_in(batch.column('eaeu_id').cast(pa.string()), value_set=new_ids)
+                    kept = batch.filter(pc.invert(repeated.fill_null(False)))
+                    replaced += batch.num_rows - kept.num_rows
+                    writer.write_table(pa.Table.from_batches([kept]))
+        new_items = items.num_rows
+        del items, ids
+    if old_snapshot is not None:
+        old_snapshot.close()
+
+    summary = build_generation_indexes(
+        snapshot_path, index_dir, old_snapshot_path if old_snapshot is not None else None, old_index_dir,
+        key_column='eaeu_id', columns=MIRROR_COLUMNS
+    )
+    summary.update(
+        new_items=new_items,
+        replaced=replaced,
+        seconds=round(time.time() - start_time, 3),
+    )
+    return summary
+
+
+class EaeuMirror:
+    """Поколения локального зеркала ЕАЭС и сведения о синхронизации.
+
+    Зеркало считается актуальным, если последняя успешная синхронизация
+    была не раньше max_age назад; иначе поиск идет в API ЕАЭС.
+    """
+
+    SNAPSHOT_FILE = 'eaeu_goods.arrow'
+    # Записи, полученные при синхронизации, до сборки нового поколения
+    ITEMS_FILE = 'sync_items.arrow'
+
+    def __init__(self, root: str, keep: int = 2, max_age: timedelta = timedelta(days=2)):
+        self.generations = GenerationManager(root, keep=keep, snapshot_file=self.SNAPSHOT_FILE)
+        self.items_path = os.path.join(root, self.ITEMS_FILE)
+        self.max_age = max_age
+        # Активное поколение зеркала
+        self.generation = None
+
+    def open(self) -> Optional[Generation]:
+        """Открывает активное поколение зеркала с диска, если оно есть"""
+        generation_id = self.generations.current_id()
+        if generation_id is None:
+            return None
+        self.generation = self._load(generation_id)
+        return self.generation
+
+    def _load(self, generation_id: str) -> Generation:
+        snapshot = GispSnapshot.open(self.generations.snapshot_path(generation_id))
+        index_dir = self.generations.index_dir(generation_id)
+        if indexes_match(snapshot, index_dir):
+            search_index = load_indexes(snapshot, index_dir)
+        else:
+            search_index = build_indexes(snapshot, index_dir)
+        return Generation(generation_id, snapshot, search_index, self.generations.manifest(generation_id))
+
+    @property
+    def manifest(self) -> Dict:
+        return self.generation.manifest if self.generation is not None else {}
+
+    def is_fresh(self) -> bool:
+        synced_at = self.manifest.get('synced_at')
+        if self.generation is None or not synced_at:
+            return False
+        return datetime.now() - datetime.fromisoformat(synced_at) <= self.max_age
+
+    def sync_filter(self) -> Dict:
+        """Фильтр API: только записи новее последней синхронизации"""
+        last_publishdate = self.manifest.get('last_publishdate')
+        if last_publishdate is None:
+            return {}
+        return {"publishdate": {"$gt": last_publishdate}}
+
+    def merge_args(self, generation_id: str) -> tuple:
+        """Пути для merge_mirror: полученные записи, новое поколение и активное, если оно есть"""
+        args = (self.items_path, self.generations.snapshot_path(generation_id),
+                self.generations.index_dir(generation_id))
+        if self.generation is None:
+            return args
+        return args + (self.generations.snapshot_path(self.generation.id),
+                       self.generations.index_dir(self.generation.id))
+
+    def activate(self, generation_id: str, summary: Dict, last_publishdate) -> Generation:
+        """Публикует собранное поколение и переключает на него поиск"""
+        generation = self._load(generation_id)
+        if generation.snapshot.num_rows == 0:
+            raise Exception("Снимок зеркала ЕАЭС не содержит ни одной строки")
+        manifest = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'synced_at': datetime.now().isoformat(timespec='seconds'),
+            'rows': generation.snapshot.num_rows,
+            'last_publishdate': last_publishdate if last_publishdate is not None
+            else self.manifest.get('last_publishdate'),
+            'update': summary,
+        }
+        self.generations.publish(generation_id, manifest)
+        self.generation = Generation(generation_id, generation.snapshot, generation.search_index,
+                                     self.generations.manifest(generation_id))
+        logger.info(f"EAEU mirror generation {generation_id} is active: {summary}")
+        return self.generation
+
+    def mark_synced(self):
+        """Отмечает синхронизацию, не принесшую новых записей"""
+        if self.generation is None:
+            return
+        synced_at = datetime.now().isoformat(timespec='seconds')
+        self.generations.update_manifest(self.generation.id, synced_at=synced_at)
+        self.generation.manifest['synced_at'] = synced_at
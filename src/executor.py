@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class BlockingExecutor:
+    """Выполнение блокирующей работы вне цикла событий бота.
+
+    Сетевые запросы и работа с файлами идут в пул потоков, разбор Excel и
+    построение индексов - в пул процессов, чтобы не занимать GIL процесса
+    бота. Функции для пула процессов должны быть объявлены на уровне
+    модуля, а их аргументы - сериализуемыми. Пулы создаются при первом
+    обращении.
+    """
+
+    def __init__(self, io_workers: int = 8, cpu_workers: int = None):
+        self.io_workers = io_workers
+        # Разбор реестра расходует много памяти, поэтому процессов немного
+        self.cpu_workers = cpu_workers or max(1, min(2, os.cpu_count() or 1))
+        self._context = multiprocessing.get_context('spawn')
+        self._io_pool = None
+        self._cpu_pool = None
+        self._manager = None
+        self._lock = threading.Lock()
+
+    @property
+    def io_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._io_pool is None:
+                self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix='io')
+            return self._io_pool
+
+    @property
+    def cpu_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._cpu_pool is None:
+                logger.info(f"Starting CPU process pool with {self.cpu_workers} workers")
+                self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=self._context)
+            return self._cpu_pool
+
+    def submit_io(self, func, *args, **kwargs) -> Future:
+        return self.io_pool.submit(func, *args, **kwargs)
+
+    def submit_cpu(self, func, *args, **kwargs) -> Future:
+        return self.cpu_pool.submit(func, *args, **kwargs)
+
+    async def run_io(self, func, *args, **kwargs):
+        """Выполняет func в пуле потоков и ждет результат, не блокируя цикл событий"""
+        return await asyncio.wrap_future(self.submit_io(func, *args, **kwargs))
+
+    async def run_cpu(self, func, *args, **kwargs):
+        """Выполняет func в пуле процессов и ждет результат, не блокируя цикл событий"""
+        return await asyncio.wrap_future(self.submit_cpu(func, *args, **kwargs))
+
+    def shared_dict(self):
+        """Словарь, который процесс пула может обновлять, например для прогресса"""
+        with self._lock:
+            if self._manager is None:
+                self._manager = self._context.Manager()
+            return self._manager.dict()
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            if self._io_pool is not None:
+                self._io_pool.shutdown(wait=wait)
+                self._io_pool = None
+            if self._cpu_pool is not None:
+                self._cpu_pool.shutdown(wait=wait)
+                self._cpu_pool = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
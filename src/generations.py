@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Generation:
+    """Опубликованный снимок ГИСП вместе с построенными по нему индексами.
+
+    Поиск берет ссылку на поколение один раз и работает с ней до конца,
+    поэтому замена активного поколения не затрагивает начатые запросы.
+    Старое поколение явно не закрывается: memory map освобождается,
+    когда на него не остается ссылок.
+    """
+
+    def __init__(self, generation_id: str, snapshot, search_index: Dict, manifest: Dict):
+        self.id = generation_id
+        self.snapshot = snapshot
+        self.search_index = search_index
+        self.manifest = manifest
+
+
+class GenerationManager:
+    """Версионированные поколения снимка на диске (ГИСП, зеркало ЕАЭС).
+
+    Каждое поколение собирается в отдельном каталоге generations/<id>/
+    (снимок, индексы, manifest.json). Активное поколение задается файлом
+    CURRENT, который заменяется атомарно через os.replace. Хранятся
+    последние keep поколений, чтобы к ним можно было быстро откатиться.
+    """
+
+    GENERATIONS_DIR = 'generations'
+    CURRENT_FILE = 'CURRENT'
+    MANIFEST_FILE = 'manifest.json'
+    SNAPSHOT_FILE = 'gisp_products.arrow'
+    INDEX_DIR = 'gisp_index'
+
+    def __init__(self, root: str, keep: int = 3, snapshot_file: str = SNAPSHOT_FILE):
+        self.root = root
+        self.keep = max(keep, 1)
+        self.snapshot_file = snapshot_file
+        os.makedirs(os.path.join(root, self.GENERATIONS_DIR), exist_ok=True)
+
+    def path(self, generation_id: str) -> str:
+        return os.path.join(self.root, self.GENERATIONS_DIR, generation_id)
+
+    def snapshot_path(self, generation_id: str) -> str:
+        return os.path.join(self.path(generation_id), self.snapshot_file)
+
+    def index_dir(self, generation_id: str) -> str:
+        return os.path.join(self.path(generation_id), self.INDEX_DIR)
+
+    def prefetch(self, generation_id: str, block_size: int = 4 * 1024 * 1024) -> int:
+        """Читает файлы поколения, чтобы они попали в кэш страниц ОС.
+
+        Снимок и индексы открыты через memory map: без прогрева первые
+        запросы после запуска ждут чтения страниц с диска. Возвращает
+        число прочитанных байт.
+        """
+        paths = [self.snapshot_path(generation_id)]
+        index_dir = self.index_dir(generation_id)
+        if os.path.isdir(index_dir):
+            paths.extend(entry.path for entry in os.scandir(index_dir) if entry.is_file())
+        buffer = bytearray(block_size)
+        total = 0
+        for path in paths:
+            try:
+                with open(path, 'rb', buffering=0) as f:
+                    while True:
+                        read = f.readinto(buffer)
+                        if not read:
+                            break
+                        total += read
+            except OSError as e:
+                logger.warning(f"Failed to prefetch {path}: {e}")
+        return total
+
+    def create(self) -> str:
+        """Создает каталог для сборки нового поколения и возвращает его id"""
+        # id упорядочены по времени создания; номер не переиспользуется
+        # после удаления старых поколений
+        while True:
+            generation_id = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            try:
+                os.makedirs(self.path(generation_id))
+                break
+            except FileExistsError:
+                continue
+        logger.info(f"Building GISP generation {generation_id}")
+        return generation_id
+
+    def current_id(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, self.CURRENT_FILE), 'r', encoding='utf-8') as f:
+                generation_id = f.read().strip()
+        except OSError:
+            return None
+        if not generation_id or self.manifest(generation_id) is None:
+            return None
+        return generation_id
+
+    def manifest(self, generation_id: str) -> Optional[Dict]:
+        """Манифест поколения; None, если поколение не было опубликовано"""
+        try:
+            with open(os.path.join(self.path(generation_id), self.MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def published(self) -> List[Dict]:
+        """Манифесты опубликованных поколений, от старых к новым"""
+        manifests = []
+        for generation_id in sorted(os.listdir(os.path.join(self.root, self.GENERATIONS_DIR))):
+            manifest = self.manifest(generation_id)
+            if manifest is not None:
+                manifests.append(manifest)
+        return manifests
+
+    def _write_json(self, path: str, data: Dict):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _set_current(self, generation_id: str):
+        current_path = os.path.join(self.root, self.CURRENT_FILE)
+        tmp_path = f"{current_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(generation_id)
+        os.replace(tmp_path, current_path)
+
+    def publish(self, generation_id: str, manifest: Dict):
+        """Записывает манифест собранного поколения и делает его активным"""
+        manifest = dict(manifest, id=generation_id)
+        self._write_json(os.path.join(self.path(generation_id), self.MANIFEST_FILE), manifest)
+        self._set_current(generation_id)
+        logger.info(f"GISP generation {generation_id} published")
+        self.prune()
+
+    def update_manifest(self, generation_id: str, **fields):
+        """Дополняет манифест опубликованного поколения"""
+        manifest = self.manifest(generation_id)
+        if manifest is None:
+            raise ValueError(f"Поколение {generation_id} не найдено")
+        manifest.update(fields)
+        self._write_json(os.path.join(self.path(generation_id), self.MANIFEST_FILE), manifest)
+
+    def activate(self, generation_id: str):
+        """Делает активным ранее опубликованное поколение"""
+        if self.manifest(generation_id) is None:
+            raise ValueError(f"Поколение {generation_id} не найдено")
+        self._set_current(generation_id)
+        logger.info(f"GISP generation {generation_id} activated")
+
+    def previous_id(self) -> Optional[str]:
+        """Опубликованное поколение, предшествующее активному"""
+        current_id = self.current_id()
+        previous = None
+        for manifest in self.published():
+            if manifest['id'] == current_id:
+                return previous
+            previous = manifest['id']
+        return None
+
+    def prune(self):
+        """Удаляет лишние старые поколения и брошенные незавершенные сборки.
+
+        Активное поколение и незавершенные сборки новее него не удаляются.
+        """
+        current_id = self.current_id()
+        keep_ids = {manifest['id'] for manifest in self.published()[-self.keep:]}
+        if current_id:
+            keep_ids.add(current_id)
+        for generation_id in sorted(os.listdir(os.path.join(self.root, self.GENERATIONS_DIR))):
+            if generation_id in keep_ids:
+                continue
+            unfinished = self.manifest(generation_id) is None
+            if unfinished and (current_id is None or generation_id > current_id):
+                continue
+            logger.info(f"Removing GISP generation {generation_id}")
+            shutil.rmtree(self.path(generation_id), ignore_errors=True)
@@ -0,0 +1,154 @@
+"""Сборка снимка и индексов ГИСП.
+
+Функции объявлены на уровне модуля и принимают только пути, поэтому их
+можно выполнять в пуле процессов (см. src.executor).
+"""
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+
+from src.gisp_delta import KEY_COLUMN, compute_delta
+from src.gisp_index import FuzzyNameIndex, NameIndex, OkpdIndex
+from src.gisp_store import GISP_DATE_USECOLS, GISP_HEADER_ROWS, GISP_USECOLS, GispSnapshot, SnapshotWriter
+from src.xlsx_stream import XlsxRowReader
+
+logger = logging.getLogger(__name__)
+
+INDEX_META_FILE = 'index_meta.json'
+
+
+def write_index_meta(snapshot: GispSnapshot, index_dir: str):
+    with open(os.path.join(index_dir, INDEX_META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(snapshot.identity(), f)
+
+
+def indexes_match(snapshot: GispSnapshot, index_dir: str) -> bool:
+    """Проверяет, что сохраненные индексы построены именно по этому снимку.
+
+    Номера строк в индексах - позиции строк в снимке, поэтому индексы
+    от другого снимка использовать нельзя. Каталог без индекса нечеткого
+    поиска (построенный прежней версией) тоже считается несогласованным.
+    """
+    try:
+        with open(os.path.join(index_dir, INDEX_META_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f) == snapshot.identity() and FuzzyNameIndex.exists(index_dir)
+    except (OSError, ValueError):
+        return False
+
+
+def load_indexes(snapshot: GispSnapshot, index_dir: str) -> Dict:
+    name_index = NameIndex.load(index_dir, snapshot.num_rows)
+    return {
+        'okpd2': OkpdIndex.load(index_dir),
+        'name': name_index,
+        'fuzzy': FuzzyNameIndex.load(index_dir, name_index),
+    }
+
+
+def build_indexes(snapshot: GispSnapshot, index_dir: str) -> Dict:
+    """Строит индексы по снимку целиком"""
+    # Индекс кодов ОКПД2 на отсортированных массивах
+    okpd2_index = OkpdIndex.build(snapshot.column('ОКПД2'), index_dir)
+    # Инвертированный индекс слов наименований
+    names = snapshot.column('Наименование продукции')
+    name_index = NameIndex.build(
+        (name for chunk in names.chunks for name in chunk.to_pylist()),
+        index_dir
+    )
+    # Основы слов и словарь опечаток для нечеткого поиска - по словарю индекса слов
+    fuzzy_index = FuzzyNameIndex.build(name_index, index_dir)
+    write_index_meta(snapshot, index_dir)
+    return {'okpd2': okpd2_index, 'name': name_index, 'fuzzy': fuzzy_index}
+
+
+def ingest_registry(xlsx_path: str, snapshot_path: str, batch_size: int, progress=None) -> int:
+    """Потоково переносит строки Excel файла ГИСП в снимок.
+
+    В progress (словарь, в том числе разделяемый между процессами) после
+    каждого батча записываются 'rows' и 'expected' - число записанных
+    строк и ожидаемое число строк по размерности листа.
+    """
+    with XlsxRowReader(xlsx_path) as reader:
+        header = reader.read_row(GISP_HEADER_ROWS)
+        logger.info(f"Excel header: {[header.get(column) for column in GISP_USECOLS]}")
+        expected_rows = reader.count_data_rows(GISP_HEADER_ROWS)
+        logger.info(f"Expected data rows: {expected_rows}")
+
+        with SnapshotWriter(snapshot_path) as writer:
+            for columns in reader.iter_batches(
+                GISP_USECOLS,
+                skiprows=GISP_HEADER_ROWS,
+                batch_size=batch_size,
+                date_columns=GISP_DATE_USECOLS
+            ):
+                writer.write_columns(columns)
+                if progress is not None:
+                    progress.update(rows=writer.total_rows, expected=expected_rows)
+        return writer.total_rows
+
+
+def build_generation_indexes(snapshot_path: str, index_dir: str,
+                             old_snapshot_path: Optional[str] = None,
+                             old_index_dir: Optional[str] = None,
+                             key_column: str = KEY_COLUMN, columns: Optional[List[str]] = None) -> Dict:
+    """Строит индексы нового поколения и возвращает сводку изменений.
+
+    Если у предыдущего поколения есть согласованные индексы, они не
+    строятся заново: сравнение по ключу key_column (реестровому номеру)
+    и содержимому колонок columns дает добавленные, удаленные и
+    измененные строки, и в копию индексов вносятся только они. Индексы
+    предыдущего поколения при этом не меняются.
+    """
+    start_time = time.time()
+    snapshot = GispSnapshot.open(snapshot_path)
+    summary = {'total_rows': snapshot.num_rows, 'mode': 'full'}
+
+    old_snapshot = None
+    if old_snapshot_path and old_index_dir and os.path.exists(old_snapshot_path):
+        old_snapshot = GispSnapshot.open(old_snapshot_path)
+        if not indexes_match(old_snapshot, old_index_dir):
+            old_snapshot.close()
+            old_snapshot = None
+
+    apply_delta = old_snapshot is not None
+    if apply_delta:
+        delta = compute_delta(old_snapshot.table, snapshot.table, key_column, columns)
+        appended = delta.appended
+        summary.update(delta.summary())
+        # При большом объеме изменений полная перестройка не медленнее
+        apply_delta = len(appended) <= snapshot.num_rows // 2
+
+    if apply_delta:
+        summary['mode'] = 'delta'
+        changed_rows = snapshot.take(appended)
+        old_indexes = load_indexes(old_snapshot, old_index_dir)
+        new_indexes = {
+            'okpd2': old_indexes['okpd2'].apply_delta(
+                delta.remap, appended,
+                changed_rows['ОКПД2'].cast(pa.string()).to_pylist(),
+                index_dir
+            ),
+            'name': old_indexes['name'].apply_delta(
+                delta.remap, appended,
+                changed_rows['Наименование продукции'].to_pylist(),
+                snapshot.num_rows, index_dir
+            ),
+        }
+        # Словарь основ зависит от всего словаря слов, поэтому строится заново
+        new_indexes['fuzzy'] = FuzzyNameIndex.build(new_indexes['name'], index_dir)
+        write_index_meta(snapshot, index_dir)
+        for index in list(old_indexes.values()) + list(new_indexes.values()):
+            index.close()
+    else:
+        for index in build_indexes(snapshot, index_dir).values():
+            index.close()
+
+    if old_snapshot is not None:
+        old_snapshot.close()
+    snapshot.close()
+    summary['seconds'] = round(time.time() - start_time, 3)
+    return summary
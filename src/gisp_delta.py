@@ -0,0 +1,114 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.gisp_store import GISP_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMN = 'Реестровый номер'
+
+# Разделитель полей при сравнении строк целиком; в данных реестра не встречается
+_FIELD_SEPARATOR = '\x1f'
+_NULL_MARKER = '\x00'
+
+
+@dataclass
+class GispDelta:
+    """Разница между двумя снимками реестра по реестровому номеру.
+
+    added и changed_new - позиции в новом снимке, removed и changed_old -
+    позиции в старом. remap[старая позиция] - позиция той же неизменной
+    строки в новом снимке или -1, если строка удалена или изменена.
+    """
+    added: np.ndarray
+    removed: np.ndarray
+    changed_old: np.ndarray
+    changed_new: np.ndarray
+    remap: np.ndarray
+    seconds: float = 0.0
+
+    @property
+    def appended(self) -> np.ndarray:
+        """Позиции нового снимка, которые нужно заново внести в индексы"""
+        return np.union1d(self.added, self.changed_new)
+
+    def summary(self) -> dict:
+        return {
+            'added': int(len(self.added)),
+            'removed': int(len(self.removed)),
+            'changed': int(len(self.changed_new)),
+            'delta_seconds': round(self.seconds, 3),
+        }
+
+
+def _occurrences(keys: pa.Array) -> np.ndarray:
+    """Порядковый номер строки среди строк с тем же ключом (для повторяющихся номеров)"""
+    key_ids = pc.dictionary_encode(keys).indices.to_numpy(zero_copy_only=False)
+    order = np.argsort(key_ids, kind='stable')
+    sorted_ids = key_ids[order]
+    run_starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    run_lengths = np.diff(np.r_[run_starts, len(sorted_ids)])
+    occurrence = np.arange(len(sorted_ids)) - np.repeat(run_starts, run_lengths)
+    result = np.empty(len(key_ids), dtype=np.int64)
+    result[order] = occurrence
+    return result
+
+
+def _keyed_rows(table: pa.Table, key_column: str, columns: List[str]) -> pa.Table:
+    """Таблица (ключ, номер повтора, содержимое строки, позиция) для соединения"""
+    values = []
+    for column in columns:
+        values.append(pc.fill_null(table[column].cast(pa.string()).combine_chunks(), _NULL_MARKER))
+    content = pc.binary_join_element_wise(*values, _FIELD_SEPARATOR)
+    keys = pc.fill_null(table[key_column].cast(pa.string()).combine_chunks(), '')
+    return pa.table({
+        'key': keys,
+        'occurrence': _occurrences(keys),
+        'content': content,
+        'position': np.arange(table.num_rows, dtype=np.int64),
+    })
+
+
+def compute_delta(old_table: pa.Table, new_table: pa.Table, key_column: str = KEY_COLUMN,
+                  columns: Optional[List[str]] = None) -> GispDelta:
+    """Сравнивает два снимка по ключу (по умолчанию реестровому номеру) и
+    содержимому строк в колонках columns (по умолчанию GISP_COLUMNS)"""
+    start_time = time.perf_counter()
+    columns = columns or GISP_COLUMNS
+    joined = _keyed_rows(old_table, key_column, columns).join(
+        _keyed_rows(new_table, key_column, columns),
+        keys=['key', 'occurrence'],
+        join_type='full outer',
+        left_suffix='_old',
+        right_suffix='_new'
+    )
+    old_positions = joined['position_old']
+    new_positions = joined['position_new']
+    in_old = old_positions.is_valid().to_numpy(zero_copy_only=False)
+    in_new = new_positions.is_valid().to_numpy(zero_copy_only=False)
+    same = pc.fill_null(pc.equal(joined['content_old'], joined['content_new']), False).to_numpy(zero_copy_only=False)
+    old_positions = old_positions.fill_null(-1).to_numpy(zero_copy_only=False)
+    new_positions = new_positions.fill_null(-1).to_numpy(zero_copy_only=False)
+
+    both = in_old & in_new
+    unchanged = both & same
+    changed = both & ~same
+    remap = np.full(old_table.num_rows, -1, dtype=np.int64)
+    remap[old_positions[unchanged]] = new_positions[unchanged]
+
+    delta = GispDelta(
+        added=np.sort(new_positions[in_new & ~in_old]),
+        removed=np.sort(old_positions[in_old & ~in_new]),
+        changed_old=np.sort(old_positions[changed]),
+        changed_new=np.sort(new_positions[changed]),
+        remap=remap,
+    )
+    delta.seconds = time.perf_counter() - start_time
+    logger.info(f"Registry delta computed: {delta.summary()}")
+    return delta
@@ -0,0 +1,581 @@
+import logging
+import mmap
+import os
+import re
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.russian_stem import fold, stem
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# Токен запроса считается неселективным, если под него попадает больше этой доли строк
+MAX_TOKEN_SELECTIVITY = 0.25
+
+# Нечеткий поиск: слова длиннее не попадают в словарь основ
+MAX_FUZZY_WORD_LENGTH = 40
+# Сколько ближайших основ с одинаковым расстоянием подставляется вместо слова с опечаткой
+MAX_SUGGESTIONS = 3
+
+
+def normalize_name(name: str) -> str:
+    return name.lower()
+
+
+def normalize_code(code: str) -> str:
+    return code.strip().lower()
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text)
+
+
+def _replace_file(path: str, write):
+    """Пишет файл во временный путь и атомарно подменяет им старый.
+
+    Старый файл может быть открыт через memory map в другом месте,
+    поэтому перезаписывать его на месте нельзя.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def save_array(path: str, values: np.ndarray):
+    _replace_file(path, lambda f: np.save(f, values))
+
+
+class NameIndex:
+    """Инвертированный индекс слов в наименованиях продукции.
+
+    Словарь хранится одним файлом слов, разделенных '\\n', постинги - в
+    формате CSR (смещения и номера строк) в .npy файлах. Все файлы
+    открываются через memory map.
+    """
+
+    VOCAB_FILE = 'name_vocab.txt'
+    VOCAB_OFFSETS_FILE = 'name_vocab_offsets.npy'
+    OFFSETS_FILE = 'name_offsets.npy'
+    POSTINGS_FILE = 'name_postings.npy'
+
+    def __init__(self, vocab, vocab_offsets: np.ndarray, offsets: np.ndarray,
+                 postings: np.ndarray, num_rows: int):
+        self.vocab = vocab
+        self.vocab_offsets = vocab_offsets
+        self.offsets = offsets
+        self.postings = postings
+        self.num_rows = num_rows
+
+    @staticmethod
+    def _collect_pairs(rows: Iterable, token_ids: dict):
+        """Разбивает наименования на слова и возвращает пары (номер слова, номер строки).
+
+        rows - пары (номер строки, наименование); новые слова добавляются в token_ids.
+        """
+        pair_tokens = array('i')
+        pair_rows = array('i')
+        for row_id, name in rows:
+            if not name:
+                continue
+            for token in set(tokenize(normalize_name(name))):
+                token_id = token_ids.get(token)
+                if token_id is None:
+                    token_id = token_ids[token] = len(token_ids)
+                pair_tokens.append(token_id)
+                pair_rows.append(row_id)
+        return np.frombuffer(pair_tokens, dtype=np.int32), np.frombuffer(pair_rows, dtype=np.int32)
+
+    @classmethod
+    def build(cls, names: Iterable[Optional[str]], path: str) -> 'NameIndex':
+        """Строит индекс по наименованиям (в порядке номеров строк) и сохраняет его в path"""
+        token_ids = {}
+        num_rows = 0
+
+        def numbered():
+            nonlocal num_rows
+            for row_id, name in enumerate(names):
+                num_rows = row_id + 1
+                yield row_id, name
+
+        tokens, rows = cls._collect_pairs(numbered(), token_ids)
+        return cls._write(path, list(token_ids), tokens, rows, num_rows)
+
+    def apply_delta(self, remap: np.ndarray, appended: np.ndarray, appended_names: List[Optional[str]],
+                    num_rows: int, path: str) -> 'NameIndex':
+        """Переносит индекс на новый снимок, разбирая на слова только добавленные строки.
+
+        remap переводит номера неизменных строк старого снимка в новые
+        (-1 для удаленных и измененных), appended - номера строк нового
+        снимка, которых нет в индексе, appended_names - их наименования.
+        """
+        token_of_posting = np.repeat(
+            np.arange(len(self.offsets) - 1, dtype=np.int32), np.diff(self.offsets)
+        )
+        rows = remap[self.postings]
+        keep = rows >= 0
+        token_ids = {token: token_id for token_id, token in enumerate(self.tokens())}
+        new_tokens, new_rows = self._collect_pairs(zip(appended.tolist(), appended_names), token_ids)
+        tokens = np.concatenate([token_of_posting[keep], new_tokens])
+        # Слова, которые остались только в удаленных строках, убираются из
+        # словаря: иначе он растет с каждым поколением, а нечеткий поиск
+        # исправляет запрос на слово, по которому ничего не найдется
+        vocab_tokens = list(token_ids)
+        used = np.bincount(tokens, minlength=len(vocab_tokens)) > 0
+        compact = np.cumsum(used, dtype=np.int32) - 1
+        return self._write(
+            path,
+            [token for token, token_used in zip(vocab_tokens, used.tolist()) if token_used],
+            compact[tokens],
+            np.concatenate([rows[keep].astype(np.int32), new_rows]),
+            num_rows
+        )
+
+    @classmethod
+    def _write(cls, path: str, vocab_tokens: List[str], tokens: np.ndarray,
+               rows: np.ndarray, num_rows: int) -> 'NameIndex':
+        """Сохраняет пары (слово, строка) в формате CSR и открывает результат"""
+        # Сортировка по слову, внутри слова - по возрастанию номера строки
+        order = np.lexsort((rows, tokens))
+        postings = rows[order].astype(np.int32)
+        counts = np.bincount(tokens, minlength=len(vocab_tokens))
+        offsets = np.zeros(len(vocab_tokens) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        os.makedirs(path, exist_ok=True)
+        vocab_bytes = [token.encode('utf-8') for token in vocab_tokens]
+        _replace_file(
+            os.path.join(path, cls.VOCAB_FILE),
+            lambda f: f.write(b'\n'.join(vocab_bytes) + b'\n')
+        )
+        vocab_offsets = np.zeros(len(vocab_bytes) + 1, dtype=np.int64)
+        np.cumsum([len(token) + 1 for token in vocab_bytes], out=vocab_offsets[1:])
+        save_array(os.path.join(path, cls.VOCAB_OFFSETS_FILE), vocab_offsets)
+        save_array(os.path.join(path, cls.OFFSETS_FILE), offsets)
+        save_array(os.path.join(path, cls.POSTINGS_FILE), postings)
+        logger.info(
+            f"Name index written: {num_rows} rows, {len(vocab_tokens)} tokens, {len(postings)} postings"
+        )
+        return cls.load(path, num_rows)
+
+    @classmethod
+    def load(cls, path: str, num_rows: int) -> 'NameIndex':
+        with open(os.path.join(path, cls.VOCAB_FILE), 'rb') as f:
+            vocab = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(
+            vocab,
+            np.load(os.path.join(path, cls.VOCAB_OFFSETS_FILE), mmap_mode='r'),
+            np.load(os.path.join(path, cls.OFFSETS_FILE), mmap_mode='r'),
+            np.load(os.path.join(path, cls.POSTINGS_FILE), mmap_mode='r'),
+            num_rows
+        )
+
+    def tokens(self) -> List[str]:
+        """Слова словаря в порядке номеров"""
+        return self.vocab[:].decode('utf-8').split('\n')[:-1]
+
+    def _matching_tokens(self, fragment: str) -> np.ndarray:
+        """Номера слов словаря, содержащих fragment как подстроку"""
+        needle = fragment.encode('utf-8')
+        positions = []
+        position = self.vocab.find(needle)
+        while position != -1:
+            positions.append(position)
+            # Переходим к следующему слову, чтобы не учитывать одно слово дважды
+            token_id = int(np.searchsorted(self.vocab_offsets, position, side='right')) - 1
+            position = self.vocab.find(needle, int(self.vocab_offsets[token_id + 1]))
+        if not positions:
+            return np.empty(0, dtype=np.int64)
+        return np.searchsorted(self.vocab_offsets, positions, side='right') - 1
+
+    def _token_rows(self, token_ids: np.ndarray) -> np.ndarray:
+        if len(token_ids) == 1:
+            token_id = token_ids[0]
+            return np.asarray(self.postings[self.offsets[token_id]:self.offsets[token_id + 1]])
+        return np.unique(np.concatenate([
+            self.postings[self.offsets[token_id]:self.offsets[token_id + 1]] for token_id in token_ids
+        ]))
+
+    def candidates(self, query: str) -> Optional[np.ndarray]:
+        """Возвращает отсортированные номера строк-кандидатов для подстроки query.
+
+        Каждое слово запроса должно входить в какое-то слово наименования,
+        поэтому кандидаты - пересечение объединений постингов подходящих слов.
+        Точную проверку подстроки выполняет вызывающий код. None означает,
+        что запрос неселективен и нужен полный просмотр.
+        """
+        max_rows = self.num_rows * MAX_TOKEN_SELECTIVITY
+        result = None
+        # Длинные слова обычно селективнее, начинаем с них
+        for fragment in sorted(set(tokenize(normalize_name(query))), key=len, reverse=True):
+            token_ids = self._matching_tokens(fragment)
+            total = int((self.offsets[token_ids + 1] - self.offsets[token_ids]).sum())
+            if total == 0:
+                return np.empty(0, dtype=np.int32)
+            if total > max_rows:
+                continue
+            rows = self._token_rows(token_ids)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.vocab) + self.vocab_offsets.nbytes + self.offsets.nbytes + self.postings.nbytes
+
+    def close(self):
+        if self.vocab is not None:
+            self.vocab.close()
+            self.vocab = None
+
+
+def max_edit_distance(length: int) -> int:
+    """Допустимое число опечаток для основы длины length"""
+    if length < 4:
+        return 0
+    if length < 8:
+        return 1
+    return 2
+
+
+def _deletes(word: str, distance: int) -> set:
+    """Слово и все его варианты с удаленными 1..distance символами"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+def _delete_hash(variant: str) -> int:
+    return zlib.crc32(variant.encode('utf-8'))
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Расстояние Дамерау-Левенштейна (с перестановкой соседних букв).
+
+    Если расстояние больше limit, возвращается limit + 1.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def _fuzzy_word(token: str) -> bool:
+    """Подходит ли слово для нечеткого поиска: только буквы, без цифр и кодов"""
+    return token.isalpha() and len(token) <= MAX_FUZZY_WORD_LENGTH
+
+
+class FuzzyNameIndex:
+    """Индекс нечеткого поиска по наименованиям: словоформы и опечатки.
+
+    Строится по словарю и постингам NameIndex. Слова приводятся к основам
+    (src.russian_stem), постинги основ хранятся в формате CSR, так что
+    "компьютеры" находит наименования со словом "компьютер". Для опечаток
+    хранится словарь удалений SymSpell: хэши основы и всех ее вариантов
+    без 1..max_edit_distance букв, отсортированные для бинарного поиска.
+    Кандидаты на исправление - основы с общим вариантом удаления, точное
+    расстояние считается только для них, без перебора словаря.
+    """
+
+    STEMS_FILE = 'fuzzy_stems.npy'
+    WORDS_FILE = 'fuzzy_words.npy'
+    OFFSETS_FILE = 'fuzzy_offsets.npy'
+    POSTINGS_FILE = 'fuzzy_postings.npy'
+    DELETE_HASHES_FILE = 'fuzzy_delete_hashes.npy'
+    DELETE_STEMS_FILE = 'fuzzy_delete_stems.npy'
+
+    FILES = (STEMS_FILE, WORDS_FILE, OFFSETS_FILE, POSTINGS_FILE, DELETE_HASHES_FILE, DELETE_STEMS_FILE)
+
+    def __init__(self, stems: np.ndarray, words: np.ndarray, offsets: np.ndarray, postings: np.ndarray,
+                 delete_hashes: np.ndarray, delete_stems: np.ndarray, name_index: NameIndex):
+        self.stems = stems
+        self.words = words
+        self.offsets = offsets
+        self.postings = postings
+        self.delete_hashes = delete_hashes
+        self.delete_stems = delete_stems
+        self.name_index = name_index
+
+    @classmethod
+    def build(cls, name_index: NameIndex, path: str) -> 'FuzzyNameIndex':
+        """Строит индекс по сохраненному NameIndex и сохраняет его в path"""
+        vocab_tokens = name_index.tokens()
+        token_counts = np.diff(name_index.offsets)
+        # Слова без строк не попадают в основы: исправление на них ничего не найдет
+        token_ids = np.array(
+            [token_id for token_id, token in enumerate(vocab_tokens)
+             if _fuzzy_word(token) and token_counts[token_id] > 0],
+            dtype=np.int64
+        )
+        stems, token_stems = np.unique(
+            np.array([stem(vocab_tokens[token_id]).encode('utf-8') for token_id in token_ids], dtype=bytes),
+            return_inverse=True
+        )
+
+        # Постинги основы - объединение постингов ее словоформ
+        stem_of_token = np.full(len(vocab_tokens), -1, dtype=np.int64)
+        stem_of_token[token_ids] = token_stems
+        stem_of_posting = np.repeat(stem_of_token, token_counts)
+        keep = stem_of_posting >= 0
+        num_rows = max(name_index.num_rows, 1)
+        pairs = np.unique(stem_of_posting[keep] * num_rows + np.asarray(name_index.postings)[keep])
+        postings = (pairs % num_rows).astype(np.int32)
+        offsets = np.zeros(len(stems) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // num_rows, minlength=len(stems)), out=offsets[1:])
+
+        # Для подсказки у основы хранится самая частая словоформа
+        order = np.lexsort((-token_counts[token_ids], token_stems))
+        first = order[np.flatnonzero(np.diff(token_stems[order], prepend=-1))]
+        words = np.array([vocab_tokens[token_id].encode('utf-8') for token_id in token_ids[first]], dtype=bytes)
+
+        hashes = array('I')
+        hash_stems = array('i')
+        for stem_id, stem_bytes in enumerate(stems.tolist()):
+            word = stem_bytes.decode('utf-8')
+            for variant in _deletes(word, max_edit_distance(len(word))):
+                hashes.append(_delete_hash(variant))
+                hash_stems.append(stem_id)
+        # Пары (хэш, основа) упаковываются в uint64, сортировка идет по хэшу
+        delete_pairs = np.unique(
+            (np.frombuffer(hashes, dtype=np.uint32).astype(np.uint64) << np.uint64(32))
+            | np.frombuffer(hash_stems, dtype=np.int32).astype(np.uint64)
+        )
+
+        os.makedirs(path, exist_ok=True)
+        save_array(os.path.join(path, cls.STEMS_FILE), stems)
+        save_array(os.path.join(path, cls.WORDS_FILE), words)
+        save_array(os.path.join(path, cls.OFFSETS_FILE), offsets)
+        save_array(os.path.join(path, cls.POSTINGS_FILE), postings)
+        save_array(os.path.join(path, cls.DELETE_HASHES_FILE), (delete_pairs >> np.uint64(32)).astype(np.uint32))
+        save_array(os.path.join(path, cls.DELETE_STEMS_FILE), (delete_pairs & np.uint64(0xFFFFFFFF)).astype(np.int32))
+        logger.info(
+            f"Fuzzy name index written: {len(stems)} stems, {len(postings)} postings, "
+            f"{len(delete_pairs)} deletes"
+        )
+        return cls.load(path, name_index)
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return all(os.path.exists(os.path.join(path, name)) for name in cls.FILES)
+
+    @classmethod
+    def load(cls, path: str, name_index: NameIndex) -> 'FuzzyNameIndex':
+        return cls(
+            np.load(os.path.join(path, cls.STEMS_FILE), mmap_mode='r'),
+            np.load(os.path.join(path, cls.WORDS_FILE), mmap_mode='r'),
+            np.load(os.path.join(path, cls.OFFSETS_FILE), mmap_mode='r'),
+            np.load(os.path.join(path, cls.POSTINGS_FILE), mmap_mode='r'),
+            np.load(os.path.join(path, cls.DELETE_HASHES_FILE), mmap_mode='r'),
+            np.load(os.path.join(path, cls.DELETE_STEMS_FILE), mmap_mode='r'),
+            name_index
+        )
+
+    def _stem_id(self, word: str) -> Optional[int]:
+        key = word.encode('utf-8')
+        position = int(np.searchsorted(self.stems, key))
+        if position < len(self.stems) and self.stems[position] == key:
+            return position
+        return None
+
+    def _stem_rows(self, stem_ids: List[int]) -> np.ndarray:
+        if len(stem_ids) == 1:
+            stem_id = stem_ids[0]
+            return np.asarray(self.postings[self.offsets[stem_id]:self.offsets[stem_id + 1]])
+        return np.unique(np.concatenate([
+            self.postings[self.offsets[stem_id]:self.offsets[stem_id + 1]] for stem_id in stem_ids
+        ]))
+
+    def suggest(self, word: str) -> List[int]:
+        """Номера ближайших к основе word основ словаря (не больше MAX_SUGGESTIONS).
+
+        Берутся основы с наименьшим расстоянием в пределах
+        max_edit_distance, при равенстве - самые частые.
+        """
+        limit = max_edit_distance(len(word))
+        if limit == 0 or len(self.delete_hashes) == 0:
+            return []
+        hashes = np.array(sorted({_delete_hash(variant) for variant in _deletes(word, limit)}), dtype=np.uint32)
+        starts = np.searchsorted(self.delete_hashes, hashes, side='left')
+        stops = np.searchsorted(self.delete_hashes, hashes, side='right')
+        candidates = set()
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            candidates.update(self.delete_stems[start:stop].tolist())
+
+        best = limit + 1
+        found = []
+        for stem_id in candidates:
+            distance = edit_distance(word, self.stems[stem_id].decode('utf-8'), best)
+            if distance < best:
+                best, found = distance, [stem_id]
+            elif distance == best:
+                found.append(stem_id)
+        found.sort(key=lambda stem_id: int(self.offsets[stem_id + 1] - self.offsets[stem_id]), reverse=True)
+        return found[:MAX_SUGGESTIONS]
+
+    def lookup(self, query: str, within: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Dict[str, str]]:
+        """Номера строк, в наименовании которых есть все слова запроса
+        с точностью до словоформы, ё/е и опечаток.
+
+        Слова с цифрами ищутся как подстроки слов, как в NameIndex. Вторым
+        значением возвращаются исправления: слово запроса -> слово
+        словаря, которым оно заменено из-за опечатки.
+        """
+        result = None if within is None else np.asarray(within)
+        corrections = {}
+        for token in sorted(set(tokenize(fold(normalize_name(query)))), key=len, reverse=True):
+            if _fuzzy_word(token):
+                if len(token) < 2:
+                    # Предлоги и союзы из одной буквы не ограничивают результат
+                    continue
+                word = stem(token)
+                stem_id = self._stem_id(word)
+                stem_ids = [stem_id] if stem_id is not None else self.suggest(word)
+                if stem_id is None and stem_ids:
+                    corrections[token] = self.words[stem_ids[0]].decode('utf-8')
+                rows = self._stem_rows(stem_ids) if stem_ids else np.empty(0, dtype=np.int32)
+            else:
+                token_ids = self.name_index._matching_tokens(token)
+                rows = self.name_index._token_rows(token_ids) if len(token_ids) else np.empty(0, dtype=np.int32)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if len(result) == 0:
+                return np.empty(0, dtype=np.int32), corrections
+        if result is None:
+            return np.empty(0, dtype=np.int32), corrections
+        return result, corrections
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in (
+            self.stems, self.words, self.offsets, self.postings, self.delete_hashes, self.delete_stems
+        ))
+
+    def close(self):
+        pass
+
+
+class OkpdIndex:
+    """Индекс кодов ОКПД2 на отсортированных массивах.
+
+    keys - уникальные коды в порядке сортировки, rows - номера строк,
+    сгруппированные по кодам в том же порядке, offsets - границы групп.
+    Поиск по префиксу любой длины - два бинарных поиска по keys и один
+    непрерывный срез rows.
+    """
+
+    KEYS_FILE = 'okpd2_keys.npy'
+    OFFSETS_FILE = 'okpd2_offsets.npy'
+    ROWS_FILE = 'okpd2_rows.npy'
+
+    def __init__(self, keys: np.ndarray, offsets: np.ndarray, rows: np.ndarray):
+        self.keys = keys
+        self.offsets = offsets
+        self.rows = rows
+
+    @classmethod
+    def build(cls, codes: pa.ChunkedArray, path: str) -> 'OkpdIndex':
+        """Строит индекс по колонке кодов (в порядке номеров строк) и сохраняет его в path"""
+        if pa.types.is_dictionary(codes.type):
+            codes = pa.table({'code': codes}).unify_dictionaries()['code']
+            encoded = codes.combine_chunks()
+        else:
+            encoded = pc.dictionary_encode(codes.combine_chunks())
+        values = [
+            normalize_code(value).encode('utf-8') if value is not None else b''
+            for value in encoded.dictionary.to_pylist()
+        ]
+        indices = encoded.indices.to_numpy(zero_copy_only=False)
+        valid = np.flatnonzero(encoded.is_valid().to_numpy(zero_copy_only=False))
+
+        # Разные значения словаря после нормализации могут совпасть, поэтому
+        # ключи строятся по уникальным нормализованным кодам
+        keys, value_keys = np.unique(np.array(values, dtype=bytes), return_inverse=True)
+        row_keys = value_keys[indices[valid].astype(np.int64)]
+        return cls._write(path, keys, row_keys, valid)
+
+    def apply_delta(self, remap: np.ndarray, appended: np.ndarray,
+                    appended_codes: List[Optional[str]], path: str) -> 'OkpdIndex':
+        """Переносит индекс на новый снимок, добавляя коды только для новых строк"""
+        key_of_row = np.repeat(np.arange(len(self.keys)), np.diff(self.offsets))
+        rows = remap[self.rows]
+        keep = rows >= 0
+        has_code = np.array([code is not None for code in appended_codes], dtype=bool)
+        new_codes = np.array(
+            [normalize_code(code).encode('utf-8') for code in appended_codes if code is not None],
+            dtype=bytes
+        )
+        keys = np.unique(np.concatenate([np.asarray(self.keys), new_codes]).astype(bytes))
+        row_keys = np.concatenate([
+            np.searchsorted(keys, np.asarray(self.keys))[key_of_row[keep]],
+            np.searchsorted(keys, new_codes)
+        ])
+        return self._write(
+            path, keys, row_keys, np.concatenate([rows[keep], appended[has_code]])
+        )
+
+    @classmethod
+    def _write(cls, path: str, keys: np.ndarray, row_keys: np.ndarray, rows: np.ndarray) -> 'OkpdIndex':
+        """Сохраняет индекс по парам (номер ключа, номер строки) и открывает результат"""
+        # Ключи без строк не нужны
+        counts = np.bincount(row_keys, minlength=len(keys))
+        used = counts > 0
+        keys = keys[used]
+        row_keys = (np.cumsum(used) - 1)[row_keys]
+        counts = counts[used]
+        order = np.lexsort((rows, row_keys))
+        rows = rows[order].astype(np.int32)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        os.makedirs(path, exist_ok=True)
+        save_array(os.path.join(path, cls.KEYS_FILE), keys)
+        save_array(os.path.join(path, cls.OFFSETS_FILE), offsets)
+        save_array(os.path.join(path, cls.ROWS_FILE), rows)
+        logger.info(f"OKPD2 index written: {len(keys)} codes, {len(rows)} rows")
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path: str) -> 'OkpdIndex':
+        return cls(
+            np.load(os.path.join(path, cls.KEYS_FILE), mmap_mode='r'),
+            np.load(os.path.join(path, cls.OFFSETS_FILE), mmap_mode='r'),
+            np.load(os.path.join(path, cls.ROWS_FILE), mmap_mode='r')
+        )
+
+    def lookup(self, prefix: str) -> np.ndarray:
+        """Возвращает отсортированные номера строк, код ОКПД2 которых начинается с prefix"""
+        prefix = normalize_code(prefix).encode('utf-8')
+        if not prefix or len(self.keys) == 0:
+            return np.empty(0, dtype=np.int32)
+        start = int(np.searchsorted(self.keys, prefix, side='left'))
+        # Любой код с этим префиксом меньше prefix + 0xff
+        stop = int(np.searchsorted(self.keys, prefix + b'\xff', side='left'))
+        return np.sort(self.rows[self.offsets[start]:self.offsets[stop]])
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.offsets.nbytes + self.rows.nbytes
+
+    def close(self):
+        pass
@@ -0,0 +1,109 @@
+"""Поиск номеров строк в поколении снимка по коду ОКПД2 и наименованию.
+
+Функции зависят только от поколения (снимок и индексы, открытые через
+memory map), поэтому выполняются и в пуле потоков бота, и в процессах
+SearchPool, которые открывают те же файлы.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.generations import Generation
+
+NAME_COLUMN = 'Наименование продукции'
+
+
+def okpd2_positions(generation: Generation, okpd2_lower: str) -> np.ndarray:
+    """Номера строк, код ОКПД2 которых начинается с okpd2_lower"""
+    okpd2_index = generation.search_index.get('okpd2')
+    if okpd2_index is not None:
+        return okpd2_index.lookup(okpd2_lower)
+    codes = pc.utf8_lower(generation.snapshot.string_column('ОКПД2'))
+    matches = pc.starts_with(codes, okpd2_lower.strip()).fill_null(False)
+    return np.flatnonzero(matches.to_numpy(zero_copy_only=False))
+
+
+def name_candidates(generation: Generation, name_lower: str,
+                    within: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """Строки, которые могут содержать name_lower, по инвертированному индексу.
+
+    None - индекса нет и проверять нужно все строки.
+    """
+    name_index = generation.search_index.get('name')
+    candidates = name_index.candidates(name_lower) if name_index is not None else None
+    if within is not None:
+        candidates = within if candidates is None else np.intersect1d(candidates, within)
+    return candidates
+
+
+def query_candidates(generation: Generation, okpd2: Optional[str], name: str) -> Optional[np.ndarray]:
+    """Кандидаты по наименованию среди строк с кодом ОКПД2 (если он задан)"""
+    within = okpd2_positions(generation, okpd2.lower()) if okpd2 else None
+    return name_candidates(generation, name.lower(), within)
+
+
+def verify_names(generation: Generation, name_lower: str, candidates: Optional[np.ndarray]) -> np.ndarray:
+    """Строки из candidates (или все, если None), наименование которых содержит name_lower"""
+    names = generation.snapshot.column(NAME_COLUMN)
+    if candidates is None:
+        matches = pc.match_substring(pc.utf8_lower(names), name_lower).fill_null(False)
+        return np.flatnonzero(matches.to_numpy(zero_copy_only=False))
+    if len(candidates) == 0:
+        return np.empty(0, dtype=np.int64)
+    candidate_names = pc.utf8_lower(names.take(pa.array(candidates)))
+    matches = pc.match_substring(candidate_names, name_lower).fill_null(False)
+    return np.asarray(candidates)[matches.to_numpy(zero_copy_only=False)]
+
+
+def name_positions(generation: Generation, name_lower: str,
+                   within: Optional[np.ndarray] = None) -> np.ndarray:
+    """Номера строк, наименование которых содержит name_lower.
+
+    Кандидаты берутся из инвертированного индекса, точная проверка
+    подстроки выполняется только для них.
+    """
+    return verify_names(generation, name_lower, name_candidates(generation, name_lower, within))
+
+
+def find_positions(generation: Generation, okpd2: Optional[str] = None,
+                   name: Optional[str] = None) -> Optional[np.ndarray]:
+    """Возвращает отсортированные номера строк снимка, подходящих под запрос"""
+    if okpd2 and name:
+        # Дополнительная фильтрация по наименованию только среди строк с кодом ОКПД2
+        return name_positions(generation, name.lower(), within=okpd2_positions(generation, okpd2.lower()))
+    if okpd2:
+        return okpd2_positions(generation, okpd2.lower())
+    if name:
+        return name_positions(generation, name.lower())
+    return None
+
+
+def fuzzy_positions(generation: Generation, okpd2: Optional[str],
+                    name: str) -> Tuple[np.ndarray, Optional[Dict[str, str]]]:
+    """Нечеткий поиск по наименованию (словоформы, ё/е, опечатки).
+
+    Возвращает номера строк и исправления запроса; если нечеткого индекса
+    нет - пустой результат и None.
+    """
+    fuzzy_index = generation.search_index.get('fuzzy')
+    if fuzzy_index is None:
+        return np.empty(0, dtype=np.int64), None
+    within = okpd2_positions(generation, okpd2.lower()) if okpd2 else None
+    return fuzzy_index.lookup(name.lower(), within=within)
+
+
+def match_positions(generation: Generation, okpd2: Optional[str] = None,
+                    name: Optional[str] = None) -> Tuple[np.ndarray, Optional[Dict[str, str]]]:
+    """Номера строк по запросу и исправления запроса.
+
+    Если точный поиск по наименованию ничего не нашел, повторяет его
+    нечетко; тогда вторым значением возвращаются исправления, иначе None.
+    """
+    positions = find_positions(generation, okpd2, name)
+    corrections = None
+    if name and positions is not None and len(positions) == 0:
+        positions, corrections = fuzzy_positions(generation, okpd2, name)
+    # Номера строк снимка помещаются в int32
+    return np.asarray(positions if positions is not None else [], dtype=np.int32), corrections
@@ -0,0 +1,318 @@
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+logger = logging.getLogger(__name__)
+
+# Колонки реестра ГИСП в том порядке, в котором они хранятся в снимке
+GISP_COLUMNS = [
+    'Предприятие', 'ИНН', 'Реестровый номер',
+    'Дата внесения в реестр', 'Срок действия',
+    'Наименование продукции', 'ОКПД2', 'ТН ВЭД', 'Изготовлена по'
+]
+
+# Номера колонок исходного Excel файла, соответствующие GISP_COLUMNS
+GISP_USECOLS = [0, 1, 6, 8, 9, 11, 12, 13, 14]
+
+# Колонки Excel файла с датами (числовые даты Excel переводятся в ISO формат)
+GISP_DATE_USECOLS = [8, 9]
+
+# Две служебные строки над таблицей и строка заголовка
+GISP_HEADER_ROWS = 3
+
+# Колонки с большим количеством повторов хранятся со словарным кодированием
+DICTIONARY_COLUMNS = ['Предприятие', 'ИНН', 'ОКПД2', 'Изготовлена по']
+
+# Колонки с датами в формате ISO хранятся как date32 (число дней, 4 байта)
+DATE_COLUMNS = ['Дата внесения в реестр', 'Срок действия']
+DATE_FORMAT = '%Y-%m-%d'
+
+# Поля записи результата поиска и соответствующие им колонки снимка
+RESULT_FIELDS = {
+    'name': 'Наименование продукции',
+    'okpd2_code': 'ОКПД2',
+    'manufacturer': 'Предприятие',
+    'inn': 'ИНН',
+    'registry_number': 'Реестровый номер',
+    'registry_date': 'Дата внесения в реестр',
+    'valid_until': 'Срок действия',
+    'tn_ved': 'ТН ВЭД',
+    'standard': 'Изготовлена по',
+}
+
+STAGING_SCHEMA = pa.schema([(column, pa.string()) for column in GISP_COLUMNS])
+
+BATCH_SIZE = 64 * 1024
+
+
+def index_type_for(distinct: int) -> pa.DataType:
+    """Самый узкий тип номеров значений для словаря из distinct значений"""
+    if distinct <= np.iinfo(np.int8).max:
+        return pa.int8()
+    if distinct <= np.iinfo(np.int16).max:
+        return pa.int16()
+    return pa.int32()
+
+
+def is_iso_dates(column) -> bool:
+    """Все значения колонки восстанавливаются из даты ISO без изменений"""
+    dates = pc.strptime(column, format=DATE_FORMAT, unit='s', error_is_null=True).cast(pa.date32())
+    return dates.null_count == column.null_count and \
+        pc.all(pc.equal(dates.cast(pa.string()), column)).as_py() is not False
+
+
+class ColumnEncoder:
+    """Кодирование строковой колонки снимка по батчам.
+
+    Первый проход (observe) собирает словарь значений в порядке первого
+    появления и проверяет, что даты записаны в формате ISO; второй
+    (encode) кодирует каждый батч общим словарем. В памяти держатся
+    только словарь и текущий батч, а не вся колонка.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.dictionary = pa.array([], type=pa.string())
+        self.dates = name in DATE_COLUMNS
+        self._index_type = None
+
+    @property
+    def encoded(self) -> bool:
+        return self.name in DICTIONARY_COLUMNS or self.name in DATE_COLUMNS
+
+    def observe(self, values: pa.Array):
+        if not self.encoded:
+            return
+        if self.dates and not is_iso_dates(values):
+            logger.info(f"Column {self.name} has values that are not ISO dates, stored as dictionary")
+            self.dates = False
+        # Словарь нужен и колонке дат: она кодируется им, если даты не в ISO
+        self.dictionary = pc.unique(pa.concat_arrays([self.dictionary, pc.unique(values)])).drop_null()
+
+    @property
+    def type(self) -> pa.DataType:
+        if self.dates:
+            return pa.date32()
+        if self.encoded:
+            return pa.dictionary(index_type_for(len(self.dictionary)), pa.string())
+        return pa.string()
+
+    def encode(self, values: pa.Array) -> pa.Array:
+        if self.dates:
+            return pc.strptime(values, format=DATE_FORMAT, unit='s').cast(pa.date32())
+        if not self.encoded:
+            return values
+        # Пустые значения не входят в словарь и остаются пустыми номерами
+        indices = pc.index_in(values, value_set=self.dictionary).cast(self.type.index_type)
+        return pa.DictionaryArray.from_arrays(indices, self.dictionary)
+
+
+class SnapshotWriter:
+    """Пишет снимок реестра ГИСП в формате Arrow IPC частями.
+
+    columns - строковые колонки снимка; по умолчанию GISP_COLUMNS.
+    """
+
+    def __init__(self, path: str, columns: Optional[List[str]] = None):
+        self.path = path
+        self.columns = columns or GISP_COLUMNS
+        self.schema = pa.schema([(column, pa.string()) for column in self.columns])
+        self.staging_path = f"{path}.staging"
+        self.total_rows = 0
+        self._sink = None
+        self._writer = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._sink = pa.OSFile(self.staging_path, 'wb')
+        self._writer = pa.ipc.new_file(self._sink, self.schema)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._close_staging()
+        if exc_type is None:
+            self._finalize()
+        elif os.path.exists(self.staging_path):
+            os.remove(self.staging_path)
+        return False
+
+    def write_frame(self, frame: pd.DataFrame):
+        """Добавляет в снимок чанк данных с колонками снимка"""
+        frame = frame[self.columns].astype('string')
+        batch = pa.RecordBatch.from_pandas(frame, schema=self.schema, preserve_index=False)
+        self._writer.write_batch(batch)
+        self.total_rows += batch.num_rows
+
+    def write_columns(self, columns: List[List[Optional[str]]]):
+        """Добавляет в снимок батч строковых значений, разложенных по колонкам снимка"""
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(values, type=pa.string()) for values in columns],
+            schema=self.schema
+        )
+        self._writer.write_batch(batch)
+        self.total_rows += batch.num_rows
+
+    def write_table(self, table: pa.Table):
+        """Добавляет в снимок таблицу Arrow с колонками снимка (словари раскодируются)"""
+        table = table.select(self.columns).cast(self.schema)
+        self._writer.write_table(table, max_chunksize=BATCH_SIZE)
+        self.total_rows += table.num_rows
+
+    def _close_staging(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def _staging_batches(self, reader):
+        """Батчи промежуточного файла, склеенные до BATCH_SIZE строк"""
+        pending = []
+        rows = 0
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            pending.append(batch)
+            rows += batch.num_rows
+            if rows >= BATCH_SIZE:
+                yield pa.Table.from_batches(pending, self.schema).combine_chunks().to_batches()[0]
+                pending = []
+                rows = 0
+        if pending:
+            yield pa.Table.from_batches(pending, self.schema).combine_chunks().to_batches()[0]
+
+    def _finalize(self):
+        """Кодирует повторяющиеся колонки словарем, даты - числом дней и
+        атомарно публикует снимок.
+
+        Промежуточный файл читается через memory map дважды: сначала
+        собираются словари колонок, затем батчи кодируются по одному, так
+        что память не растет с размером реестра.
+        """
+        tmp_path = f"{self.path}.tmp"
+        encoders = [ColumnEncoder(column) for column in self.columns]
+        with pa.memory_map(self.staging_path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                for encoder, values in zip(encoders, batch.columns):
+                    encoder.observe(values)
+            schema = pa.schema([(encoder.name, encoder.type) for encoder in encoders])
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, schema) as writer:
+                    for batch in self._staging_batches(reader):
+                        writer.write_batch(pa.RecordBatch.from_arrays(
+                            [encoder.encode(values) for encoder, values in zip(encoders, batch.columns)],
+                            schema=schema
+                        ))
+        os.replace(tmp_path, self.path)
+        os.remove(self.staging_path)
+        logger.info(f"Snapshot written to {self.path}, rows: {self.total_rows}")
+
+
+def column_nbytes(column: pa.ChunkedArray) -> int:
+    """Объем буферов колонки. Батчи снимка ссылаются на один словарь,
+    поэтому буферы считаются по адресу один раз."""
+    buffers = {}
+    for chunk in column.chunks:
+        arrays = [chunk, chunk.dictionary] if pa.types.is_dictionary(chunk.type) else [chunk]
+        for array in arrays:
+            for buffer in array.buffers():
+                if buffer is not None:
+                    buffers[buffer.address] = buffer.size
+    return sum(buffers.values())
+
+
+def as_strings(column):
+    """Значения колонки снимка строками (словари и даты раскодируются)"""
+    if pa.types.is_string(column.type):
+        return column
+    return column.cast(pa.string())
+
+
+class GispSnapshot:
+    """Снимок реестра ГИСП, открытый через memory map без копирования данных"""
+
+    def __init__(self, path: str, source, table: pa.Table):
+        self.path = path
+        self._source = source
+        self.table = table
+        self._batches = table.to_batches()
+        self._batch_offsets = np.cumsum([0] + [batch.num_rows for batch in self._batches])
+
+    @classmethod
+    def open(cls, path: str) -> 'GispSnapshot':
+        source = pa.memory_map(path, 'r')
+        table = pa.ipc.open_file(source).read_all()
+        logger.info(f"Snapshot opened: {path}, rows: {table.num_rows}")
+        return cls(path, source, table)
+
+    @property
+    def num_rows(self) -> int:
+        return self.table.num_rows
+
+    def identity(self) -> dict:
+        """Идентификатор снимка, с которым сверяются построенные по нему индексы"""
+        stat = os.stat(self.path)
+        return {'rows': self.num_rows, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def column(self, name: str) -> pa.ChunkedArray:
+        return self.table[name]
+
+    @property
+    def nbytes(self) -> int:
+        """Объем данных снимка (открыт через memory map, в памяти - страницы файла)"""
+        return sum(column_nbytes(column) for column in self.table.columns)
+
+    def string_column(self, name: str) -> pa.ChunkedArray:
+        """Возвращает колонку как строки, раскодируя словарь и даты при необходимости"""
+        return as_strings(self.table[name])
+
+    def take(self, positions) -> pa.Table:
+        """Выбирает строки по номерам (номер строки - ее позиция в снимке).
+
+        take по ChunkedArray в Arrow склеивает все чанки колонки, поэтому
+        номера раскладываются по батчам и выбираются из каждого батча отдельно.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        order = None
+        if len(positions) > 1 and np.any(positions[1:] < positions[:-1]):
+            order = np.argsort(positions, kind='stable')
+            positions = positions[order]
+        batch_ids = np.searchsorted(self._batch_offsets, positions, side='right') - 1
+        bounds = np.searchsorted(batch_ids, np.arange(len(self._batches) + 1), side='left')
+        taken = [
+            self._batches[batch_id].take(pa.array(positions[start:stop] - self._batch_offsets[batch_id]))
+            for batch_id, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:]))
+            if stop > start
+        ]
+        table = pa.Table.from_batches(taken, schema=self.table.schema)
+        if order is not None:
+            table = table.take(pa.array(np.argsort(order)))
+        return table
+
+    def records(self, positions, source: str) -> List[dict]:
+        """Собирает записи результата поиска для строк positions.
+
+        Значения извлекаются по колонкам только для выбранных строк, так что
+        стоимость зависит от числа найденных строк, а не от размера реестра.
+        """
+        if len(positions) == 0:
+            return []
+        taken = self.take(positions)
+        fields = list(RESULT_FIELDS) + ['source']
+        columns = [as_strings(taken[column]).to_pylist() for column in RESULT_FIELDS.values()]
+        columns.append([source] * taken.num_rows)
+        return [dict(zip(fields, values)) for values in zip(*columns)]
+
+    def close(self):
+        self.table = None
+        self._batches = []
+        if self._source is not None:
+            self._source.close()
+            self._source = None
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Методы, для которых ожидающие изменения одного сообщения объединяются
+EDIT_ENDPOINTS = {'editMessageText', 'editMessageReplyMarkup'}
+
+
+class TokenBucket:
+    """Ограничение частоты: rate запросов в секунду, допускается всплеск до capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, still_needed: Callable[[], bool] = lambda: True) -> bool:
+        """Ждет своей очереди и забирает токен.
+
+        Если к моменту отправки still_needed() ложно, токен не тратится и
+        возвращается False.
+        """
+        async with self._lock:
+            while True:
+                if not still_needed():
+                    return False
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity and not self._lock.locked()
+
+
+class MessageScheduler(BaseRateLimiter):
+    """Планировщик исходящих запросов бота к Telegram.
+
+    Подключается к Application через ApplicationBuilder.rate_limiter, так что
+    через него проходят все отправки и изменения сообщений. Соблюдаются
+    общий лимит и лимит на чат (для групп он строже). Если изменение
+    сообщения ждет очереди, а для того же сообщения пришло более новое,
+    старое не отправляется: уходит только последний текст. На ответ 429
+    запрос повторяется после retry_after, и на это время приостанавливаются
+    все отправки.
+    """
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, group_rate: float = 20 / 60,
+                 chat_burst: float = 3, max_retries: int = 3, max_idle_chats: int = 1000):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_idle_chats = max_idle_chats
+        self._chat_buckets = {}
+        self._edit_seq = {}
+        self._blocked_until = 0.0
+        self.sent = 0
+        self.edits_dropped = 0
+        self.retries = 0
+        self.queued = 0
+        self.wait_seconds = 0.0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._chat_buckets.clear()
+        self._edit_seq.clear()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.max_idle_chats:
+                # Забываем чаты, которые давно ничего не получали
+                for idle_chat in [chat for chat, b in self._chat_buckets.items() if b.idle]:
+                    del self._chat_buckets[idle_chat]
+            # У групп и каналов отрицательный id или @username
+            is_group = isinstance(chat_id, str) or int(chat_id) < 0
+            bucket = TokenBucket(self.group_rate if is_group else self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _wait_flood(self):
+        delay = self._blocked_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict, List[Dict]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Any],
+    ) -> Union[bool, Dict, List[Dict]]:
+        chat_id = data.get('chat_id')
+        edit_key = None
+        if endpoint in EDIT_ENDPOINTS and chat_id is not None and data.get('message_id') is not None:
+            edit_key = (endpoint, chat_id, data['message_id'])
+            seq = self._edit_seq.get(edit_key, 0) + 1
+            self._edit_seq[edit_key] = seq
+
+        def still_needed() -> bool:
+            return edit_key is None or self._edit_seq.get(edit_key) == seq
+
+        self.queued += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                wait_start = time.monotonic()
+                await self._wait_flood()
+                sendable = True
+                if chat_id is not None:
+                    sendable = await self._chat_bucket(chat_id).acquire(still_needed)
+                if sendable:
+                    sendable = await self.global_bucket.acquire(still_needed)
+                waited = time.monotonic() - wait_start
+                self.wait_seconds += waited
+                metrics.observe('telegram_wait_seconds', waited)
+                if not sendable:
+                    # Сообщение уже получило более новый текст
+                    self.edits_dropped += 1
+                    return True
+                try:
+                    with metrics.timer('telegram_request_seconds', endpoint=endpoint):
+                        result = await callback(*args, **kwargs)
+                    self.sent += 1
+                    return result
+                except RetryAfter as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retries += 1
+                    ra = e.retry_after
+                    retry_after = ra.total_seconds() if hasattr(ra, 'total_seconds') else ra
+                    logger.warning(f"Telegram flood limit on {endpoint}, retry in {retry_after}s")
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + float(retry_after))
+        finally:
+            self.queued -= 1
+            if edit_key is not None and self._edit_seq.get(edit_key) == seq:
+                del self._edit_seq[edit_key]
+
+    def stats(self) -> Dict:
+        return {
+            'sent': self.sent,
+            'edits_dropped': self.edits_dropped,
+            'retries': self.retries,
+            'queued': self.queued,
+            'wait_seconds': round(self.wait_seconds, 1),
+            'chats': len(self._chat_buckets),
+        }
@@ -0,0 +1,255 @@
+"""Метрики бота: счетчики, значения и гистограммы задержек по этапам.
+
+Этапы обработки оборачиваются в metrics.timer(...); время меряется по
+монотонным часам (time.perf_counter). У гистограммы хранятся
+накопительные счетчики по корзинам (для Prometheus) и последние
+RECENT_SAMPLES значений, по которым считаются p50/p95/p99 для /stats.
+Значения, которые дешевле прочитать, чем обновлять (размер индексов,
+RSS), регистрируются функциями и вычисляются при чтении метрик.
+"""
+import bisect
+import logging
+import os
+import resource
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек, секунды
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+# Сколько последних значений гистограммы хранится для процентилей
+RECENT_SAMPLES = 1024
+PERCENTILES = (50, 95, 99)
+
+# Описания метрик для Prometheus и /stats
+METRIC_HELP = {
+    'search_seconds': 'Время этапов поиска',
+    'search_source_total': 'Запросы к источникам поиска по результату',
+    'gisp_update_seconds': 'Время этапов обновления базы ГИСП',
+    'gisp_ingest_rows_per_second': 'Скорость разбора последнего файла ГИСП, строк/с',
+    'gisp_ingest_rows': 'Строк в последнем загруженном файле ГИСП',
+    'startup_seconds': 'Время этапов запуска',
+    'first_response_seconds': 'Время от запуска бота до первого ответа на поиск',
+    'update_seconds': 'Время обновлений данных по задачам',
+    'update_runs_total': 'Запуски обновлений данных по результату',
+    'eaeu_sync_seconds': 'Время этапов синхронизации зеркала ЕАЭС',
+    'report_seconds': 'Время формирования выгрузки',
+    'report_rows_total': 'Выгружено строк',
+    'page_render_seconds': 'Время сборки страницы результатов',
+    'telegram_request_seconds': 'Время запроса к Telegram',
+    'telegram_wait_seconds': 'Ожидание очереди отправки в Telegram',
+    'process_rss_bytes': 'Резидентная память процесса бота',
+    'gisp_rows': 'Строк в активном поколении ГИСП',
+    'gisp_index_bytes': 'Объем индексов активного поколения ГИСП',
+    'gisp_snapshot_bytes': 'Объем снимка активного поколения ГИСП',
+    'eaeu_mirror_rows': 'Строк в зеркале ЕАЭС',
+    'cache_bytes': 'Объем кэша',
+    'cache_hit_ratio': 'Доля попаданий в кэш',
+    'cursors': 'Открытых курсоров результатов',
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def rss_bytes() -> int:
+    """Текущая резидентная память процесса (пиковая, если /proc недоступен)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Histogram:
+    """Распределение значений: корзины за все время и последние значения"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def percentiles(self) -> Dict[int, float]:
+        """Процентили PERCENTILES по последним значениям (ближайший ранг)"""
+        values = sorted(self.recent)
+        if not values:
+            return {}
+        return {
+            percentile: values[min(len(values) - 1, max(0, -(-percentile * len(values) // 100) - 1))]
+            for percentile in PERCENTILES
+        }
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса. Методы потокобезопасны: этапы выполняются
+    и в цикле событий, и в пулах потоков."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # имя -> {метки -> значение}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        # (имя, метки) -> функция, возвращающая значение
+        self._gauge_funcs = {}
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> Labels:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[self._labels(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Записывает в гистограмму name время выполнения блока"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def gauge_func(self, name: str, func: Callable[[], float], **labels):
+        """Регистрирует значение, которое вычисляется при чтении метрик.
+
+        Повторная регистрация того же имени и меток заменяет функцию.
+        """
+        key = self._labels(labels)
+        with self._lock:
+            self._gauge_funcs[(name, key)] = func
+
+    def _read_gauges(self) -> Dict[str, Dict[Labels, float]]:
+        with self._lock:
+            gauges = {name: dict(series) for name, series in self._gauges.items()}
+            funcs = list(self._gauge_funcs.items())
+        for (name, key), func in funcs:
+            try:
+                value = func()
+            except Exception as e:
+                logger.debug(f"Gauge {name} is unavailable: {e}")
+                continue
+            if value is not None:
+                gauges.setdefault(name, {})[key] = float(value)
+        return gauges
+
+    def snapshot(self) -> Dict:
+        """Текущие значения: счетчики, значения и сводки гистограмм"""
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {
+                    key: {
+                        'count': histogram.count,
+                        'sum': histogram.sum,
+                        'percentiles': histogram.percentiles(),
+                    }
+                    for key, histogram in series.items()
+                }
+                for name, series in self._histograms.items()
+            }
+        return {'counters': counters, 'gauges': self._read_gauges(), 'histograms': histograms}
+
+    def render_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus"""
+        lines = []
+
+        def header(name: str, kind: str):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def series_name(name: str, labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+            pairs = list(labels) + ([extra] if extra else [])
+            if not pairs:
+                return name
+            escaped = ','.join(
+                '{}="{}"'.format(key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                for key, value in pairs
+            )
+            return f"{name}{{{escaped}}}"
+
+        snapshot = self.snapshot()
+        for name, series in sorted(snapshot['counters'].items()):
+            header(name, 'counter')
+            for labels, value in sorted(series.items()):
+                lines.append(f"{series_name(name, labels)} {value}")
+        for name, series in sorted(snapshot['gauges'].items()):
+            header(name, 'gauge')
+            for labels, value in sorted(series.items()):
+                lines.append(f"{series_name(name, labels)} {value}")
+        with self._lock:
+            histograms = {
+                name: {key: (list(h.buckets), list(h.counts), h.count, h.sum) for key, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+        for name, series in sorted(histograms.items()):
+            header(name, 'histogram')
+            for labels, (buckets, counts, count, total) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{series_name(name + '_bucket', labels, ('le', repr(float(bound))))} {cumulative}")
+                lines.append(f"{series_name(name + '_bucket', labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{series_name(name + '_sum', labels)} {total}")
+                lines.append(f"{series_name(name + '_count', labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# Реестр процесса
+metrics = MetricsRegistry()
+metrics.gauge_func('process_rss_bytes', rss_bytes)
+
+
+async def start_metrics_server(registry: MetricsRegistry, port: int, host: str = '127.0.0.1') -> web.AppRunner:
+    """Запускает HTTP сервер с метриками в формате Prometheus на /metrics.
+
+    По умолчанию слушает только локальный адрес: метрики не должны быть
+    доступны снаружи без отдельной настройки.
+    """
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render_prometheus().encode('utf-8'),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return runner
@@ -1,90 +1,159 @@
-import pandas as pd
-from io import BytesIO
 import logging
-from typing import List, Dict
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import xlsxwriter
 
 logger = logging.getLogger(__name__)
 
+# Поля записи результата и заголовки колонок отчета в порядке вывода
+REPORT_COLUMNS = {
+    'manufacturer': 'Предприятие',
+    'inn': 'ИНН',
+    'registry_number': 'Реестровый номер',
+    'registry_date': 'Дата внесения в реестр',
+    'valid_until': 'Срок действия',
+    'name': 'Наименование продукции',
+    'okpd2_code': 'ОКПД2',
+    'tn_ved': 'ТН ВЭД',
+    'standard': 'Изготовлена по',
+    'source': 'Источник',
+}
+SHEET_NAME = 'Результаты поиска'
+# Расширения файлов для сжатия CSV
+CSV_COMPRESSION_SUFFIXES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+# Telegram принимает от бота документы до 50 MB
+MAX_DOCUMENT_BYTES = 45 * 1024 * 1024
+
+
 class ReportGenerator:
-    def generate_excel_report(self, results: List[Dict]) -> BytesIO:
+    """Выгрузка результатов поиска в Excel и сжатый CSV.
+
+    Книга Excel пишется в файл построчно в режиме constant_memory: в памяти
+    держится только текущая строка листа и очередной батч записей.
+    Формат данных задается на колонку, ширина колонок считается по
+    батчам векторно.
+    """
+
+    def __init__(self, max_column_width: int = 60):
+        self.max_column_width = max_column_width
+
+    def generate_excel_report(self, batches: Iterable[List[Dict]], path: str) -> int:
+        """Пишет батчи записей результата в xlsx файл path и возвращает число строк"""
         try:
-            logger.info("Starting Excel report generation...")
-            df = pd.DataFrame(results)
-            
-            columns_map = {
-                'name': 'Наименование продукции',
-                'okpd2_code': 'ОКПД2',
-                'manufacturer': 'Предприятие',
-                'inn': 'ИНН',
-                'registry_number': 'Реестровый номер',
-                'registry_date': 'Дата внесения в реестр',
-                'valid_until': 'Срок действия',
-                'tn_ved': 'ТН ВЭД',
-                'standard': 'Изготовлена по',
-                'source': 'Источник'
-            }
-            
-            logger.info("Renaming columns...")
-            df = df.rename(columns=columns_map)
-            
-            column_order = [
-                'Предприятие', 'ИНН', 'Реестровый номер', 
-                'Дата внесения в реестр', 'Срок действия',
-                'Наименование продукции', 'ОКПД2', 'ТН ВЭД', 
-                'Изготовлена по', 'Источник'
-            ]
-            df = df[column_order]
-            
-            logger.info("Creating Excel file...")
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=False, sheet_name='Результаты поиска')
-                
-                worksheet = writer.sheets['Результаты поиска']
-                
-                # Форматирование заголовков
-                header_format = writer.book.add_format({
-                    'bold': True,
-                    'text_wrap': True,
-                    'valign': 'top',
-                    'align': 'center',
-                    'border': 1,
-                    'bg_color': '#D9E1F2'  # Светло-синий фон
-                })
-                
-                # Форматирование данных
-                data_format = writer.book.add_format({
-                    'text_wrap': True,
-                    'valign': 'top',
-                    'border': 1
-                })
-                
-                logger.info("Applying formatting...")
-                # Применяем форматирование к заголовкам
-                for col_num, value in enumerate(df.columns.values):
-                    worksheet.write(0, col_num, value, header_format)
-                    # Автоматическая настройка ширины столбцов
-                    max_length = max(
-                        df[value].astype(str).apply(len).max(),
-                        len(str(value))
-                    ) + 2
-                    worksheet.set_column(col_num, col_num, max_length)
-                
-                # Применяем форматирование к данным
-                for row in range(len(df)):
-                    for col in range(len(df.columns)):
-                        worksheet.write(row + 1, col, df.iloc[row, col], data_format)
-                
-                # Замораживаем верхнюю строку
-                worksheet.freeze_panes(1, 0)
-                
-                # Включаем автофильтр
-                worksheet.autofilter(0, 0, len(df), len(df.columns) - 1)
-            
-            output.seek(0)
-            logger.info("Excel report generated successfully")
-            return output
-        
+            logger.info(f"Starting Excel report generation into {path}...")
+            fields = list(REPORT_COLUMNS)
+            headers = list(REPORT_COLUMNS.values())
+            workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+            worksheet = workbook.add_worksheet(SHEET_NAME)
+
+            # Форматирование заголовков
+            header_format = workbook.add_format({
+                'bold': True,
+                'text_wrap': True,
+                'valign': 'top',
+                'align': 'center',
+                'border': 1,
+                'bg_color': '#D9E1F2'  # Светло-синий фон
+            })
+
+            # Форматирование данных задается колонкам до записи строк:
+            # в режиме constant_memory строка сбрасывается на диск сразу
+            data_format = workbook.add_format({
+                'text_wrap': True,
+                'valign': 'top',
+                'border': 1
+            })
+            worksheet.set_column(0, len(fields) - 1, None, data_format)
+
+            worksheet.write_row(0, 0, headers, header_format)
+            widths = np.array([len(header) for header in headers])
+            row = 1
+            for batch in batches:
+                if not batch:
+                    continue
+                columns = [[item.get(field) or '' for item in batch] for field in fields]
+                widths = np.maximum(widths, self._column_widths(columns))
+                for values in zip(*columns):
+                    worksheet.write_row(row, 0, values)
+                    row += 1
+
+            # Автоматическая настройка ширины столбцов
+            for col_num, width in enumerate(widths):
+                worksheet.set_column(col_num, col_num, min(int(width) + 2, self.max_column_width), data_format)
+
+            # Замораживаем верхнюю строку
+            worksheet.freeze_panes(1, 0)
+
+            # Включаем автофильтр
+            worksheet.autofilter(0, 0, max(row - 1, 1), len(fields) - 1)
+            workbook.close()
+            logger.info(f"Excel report generated successfully, rows: {row - 1}")
+            return row - 1
+
         except Exception as e:
-            logger.error(f"Error generating Excel report: {e}")
-            return None
\ No newline at end of file
+            logger.error(f"Error generating Excel report: {e}", exc_info=True)
+            raise
+
+    def generate_csv_export(self, tables: Iterable[pa.Table], base_path: str, compression: str = 'gzip',
+                            delimiter: str = ',', max_part_bytes: int = MAX_DOCUMENT_BYTES) -> List[str]:
+        """Пишет таблицы результата в сжатые CSV файлы и возвращает их пути.
+
+        Таблицы проходят по одной: перекодируются в CSV и сжимаются на
+        лету, так что в памяти держится только текущая таблица. Когда
+        сжатый файл достигает max_part_bytes, начинается следующая часть
+        со своим заголовком.
+        """
+        try:
+            suffix = ('.tsv' if delimiter == '\t' else '.csv') + CSV_COMPRESSION_SUFFIXES[compression]
+            logger.info(f"Starting {compression} CSV export into {base_path}*{suffix}...")
+            names = list(REPORT_COLUMNS.values())
+            paths = []
+            sink = stream = None
+            rows = 0
+            batch_bytes = 0
+            for table in tables:
+                if table.num_rows == 0:
+                    continue
+                table = table.select(list(REPORT_COLUMNS)).rename_columns(names)
+                # Размер части - по уже сжатым байтам в файле; если следующий
+                # батч по оценке не помещается, начинаем новую часть
+                if stream is not None and sink.tell() + batch_bytes >= max_part_bytes:
+                    stream.close()
+                    stream = None
+                if stream is None:
+                    paths.append(f"{base_path}_{len(paths) + 1}{suffix}")
+                    sink = pa.OSFile(paths[-1], 'wb')
+                    stream = pa.CompressedOutputStream(sink, compression)
+                    stream.write('\ufeff'.encode('utf-8'))
+                    include_header = True
+                else:
+                    include_header = False
+                written = sink.tell()
+                pa_csv.write_csv(table, stream, pa_csv.WriteOptions(
+                    include_header=include_header, delimiter=delimiter
+                ))
+                rows += table.num_rows
+                batch_bytes = max(batch_bytes, sink.tell() - written)
+            if stream is not None:
+                stream.close()
+            logger.info(f"CSV export finished: {rows} rows in {len(paths)} parts")
+            return paths
+
+        except Exception as e:
+            logger.error(f"Error generating CSV export: {e}", exc_info=True)
+            raise
+
+    @staticmethod
+    def _column_widths(columns: List[List]) -> np.ndarray:
+        """Максимальная длина значения в каждой колонке батча"""
+        return np.array([
+            pc.max(pc.utf8_length(pa.array(values, type=pa.string()))).as_py() or 0
+            for values in columns
+        ])
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_size(results: List[Dict]) -> int:
+    """Приблизительный объем списка результатов поиска в памяти, байт"""
+    size = sys.getsizeof(results)
+    for item in results:
+        size += sys.getsizeof(item)
+        for value in item.values():
+            size += sys.getsizeof(value)
+    return size
+
+
+def normalize_query(okpd2: Optional[str], name: Optional[str]) -> tuple:
+    """Ключ кэша: регистр и лишние пробелы в запросе не важны"""
+    return (
+        (okpd2 or '').strip().lower(),
+        ' '.join((name or '').lower().split()),
+    )
+
+
+class ResultCache:
+    """Кэш результатов запросов с ограничением по времени жизни, числу записей и объему.
+
+    Записи старше ttl секунд не выдаются. При превышении max_entries или
+    max_bytes вытесняются давно не использованные записи. Если несколько
+    запросов с одним ключом приходят одновременно, загрузка выполняется
+    один раз, остальные ждут ее результат. Ошибки загрузки не кэшируются.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024, ttl: float = 3600,
+                 size_of: Callable = estimate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_of = size_of
+        self._entries = OrderedDict()  # ключ -> (истекает, объем, значение)
+        self._inflight = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, size, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._remove(key)
+            self.expirations += 1
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value):
+        size = self.size_of(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable]):
+        """Значение из кэша или результат loader(), общий для одновременных запросов"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+        future = asyncio.ensure_future(loader())
+        self._inflight[key] = future
+        future.add_done_callback(lambda done: self._loaded(key, done))
+        # shield: отмена одного из ожидающих не отменяет загрузку для остальных
+        return await asyncio.shield(future)
+
+    def _loaded(self, key: Hashable, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self.put(key, future.result())
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
@@ -0,0 +1,161 @@
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pyarrow as pa
+
+from src.gisp_store import RESULT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+class ResultRows:
+    """Найденные строки одного источника.
+
+    Для источников со снимком (ГИСП, зеркало ЕАЭС) хранятся только номера
+    строк и ссылка на поколение, записи собираются по запросу. Результаты
+    API ЕАЭС приходят готовыми записями и хранятся как есть.
+
+    corrections не None, если строки найдены нечетким поиском: тогда это
+    исправленные опечатки запроса (слово запроса -> слово словаря).
+    """
+
+    def __init__(self, source: str, generation=None, positions: Optional[np.ndarray] = None,
+                 records: Optional[List[Dict]] = None, corrections: Optional[Dict[str, str]] = None):
+        self.source = source
+        self.corrections = corrections
+        self.generation = generation
+        if positions is not None:
+            # Номера строк снимка помещаются в int32
+            positions = np.asarray(positions, dtype=np.int32)
+        self.positions = positions
+        self.items = records
+
+    def __len__(self) -> int:
+        if self.positions is not None:
+            return len(self.positions)
+        return len(self.items or [])
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """Записи строк [start, stop)"""
+        if self.positions is not None:
+            return self.generation.snapshot.records(self.positions[start:stop], source=self.source)
+        return list((self.items or [])[start:stop])
+
+    def table(self, start: int = 0, stop: Optional[int] = None) -> pa.Table:
+        """Строки [start, stop) как таблица Arrow с полями записи результата (строки)"""
+        fields = list(RESULT_FIELDS) + ['source']
+        if self.positions is not None:
+            taken = self.generation.snapshot.take(self.positions[start:stop])
+            columns = [taken[column].cast(pa.string()) for column in RESULT_FIELDS.values()]
+            num_rows = taken.num_rows
+        else:
+            items = (self.items or [])[start:stop]
+            columns = [pa.array([item.get(field) for item in items], type=pa.string())
+                       for field in RESULT_FIELDS]
+            num_rows = len(items)
+        columns.append(pa.array([self.source] * num_rows, type=pa.string()))
+        return pa.Table.from_arrays(columns, names=fields)
+
+
+class ResultCursor:
+    """Результат поиска, который показывается постранично.
+
+    Страница собирается из частей разных источников по общей нумерации
+    строк, так что объем работы зависит только от размера страницы.
+    """
+
+    def __init__(self, cursor_id: str, user_id: int, parts: List[ResultRows], page_size: int,
+                 expires_at: float, source_status: Optional[Dict[str, str]] = None):
+        self.id = cursor_id
+        self.user_id = user_id
+        self.parts = [part for part in parts if len(part)]
+        self.page_size = page_size
+        self.expires_at = expires_at
+        self.source_status = source_status or {}
+        self.total = sum(len(part) for part in self.parts)
+
+    @property
+    def pages(self) -> int:
+        return max(-(-self.total // self.page_size), 1)
+
+    def page(self, number: int) -> List[Dict]:
+        """Записи страницы number (с нуля)"""
+        start = number * self.page_size
+        stop = start + self.page_size
+        records = []
+        offset = 0
+        for part in self.parts:
+            size = len(part)
+            if offset + size > start and offset < stop:
+                records.extend(part.records(max(start - offset, 0), min(stop - offset, size)))
+            offset += size
+            if offset >= stop:
+                break
+        return records
+
+    def iter_batches(self, batch_size: int = 5000) -> Iterator[List[Dict]]:
+        """Все записи курсора батчами по batch_size (для выгрузки)"""
+        for part in self.parts:
+            for start in range(0, len(part), batch_size):
+                yield part.records(start, start + batch_size)
+
+    def iter_tables(self, batch_size: int = 20000) -> Iterator[pa.Table]:
+        """Все строки курсора таблицами Arrow по batch_size строк (для выгрузки в CSV)"""
+        for part in self.parts:
+            for start in range(0, len(part), batch_size):
+                yield part.table(start, start + batch_size)
+
+    def nbytes(self) -> int:
+        """Объем номеров строк курсора, байт"""
+        return sum(part.positions.nbytes for part in self.parts if part.positions is not None)
+
+
+class CursorStore:
+    """Курсоры результатов поиска с ограниченным временем жизни.
+
+    Курсор истекает через ttl секунд после последнего обращения. При
+    превышении max_cursors вытесняются давно не использованные курсоры.
+    """
+
+    def __init__(self, ttl: float = 1800, max_cursors: int = 1000, page_size: int = 10):
+        self.ttl = ttl
+        self.max_cursors = max_cursors
+        self.page_size = page_size
+        self._cursors = OrderedDict()
+
+    def create(self, user_id: int, parts: List[ResultRows],
+               source_status: Optional[Dict[str, str]] = None) -> ResultCursor:
+        self._expire()
+        cursor_id = secrets.token_urlsafe(6)
+        cursor = ResultCursor(
+            cursor_id, user_id, parts, self.page_size, time.monotonic() + self.ttl, source_status
+        )
+        self._cursors[cursor_id] = cursor
+        while len(self._cursors) > self.max_cursors:
+            self._cursors.popitem(last=False)
+        logger.debug(f"Cursor {cursor_id} created: {cursor.total} rows, {cursor.nbytes()} bytes of row ids")
+        return cursor
+
+    def get(self, cursor_id: str) -> Optional[ResultCursor]:
+        cursor = self._cursors.get(cursor_id)
+        if cursor is None:
+            return None
+        if cursor.expires_at <= time.monotonic():
+            del self._cursors[cursor_id]
+            return None
+        cursor.expires_at = time.monotonic() + self.ttl
+        self._cursors.move_to_end(cursor_id)
+        return cursor
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [cursor_id for cursor_id, cursor in self._cursors.items() if cursor.expires_at <= now]
+        for cursor_id in expired:
+            del self._cursors[cursor_id]
+
+    def __len__(self) -> int:
+        return len(self._cursors)
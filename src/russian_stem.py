@@ -0,0 +1,133 @@
+"""Стемминг русских слов по алгоритму Snowball (Porter) для нечеткого поиска.
+
+Слова приводятся к основе отсечением окончаний, так что разные формы
+одного слова ("компьютеры", "компьютера") дают одну основу. Буква ё
+заменяется на е до стемминга.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),  # после а или я
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ('ся', 'сь')
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+    'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),  # после а или я
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен',
+     'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й',
+    'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+_RV_RE = re.compile(f'[{VOWELS}]')
+_R1_RE = re.compile(f'[{VOWELS}][^{VOWELS}]')
+
+
+def fold(word: str) -> str:
+    return word.replace('ё', 'е')
+
+
+def _by_length(endings):
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+_PERFECTIVE_GERUND = (_by_length(PERFECTIVE_GERUND[0]), _by_length(PERFECTIVE_GERUND[1]))
+_REFLEXIVE = _by_length(REFLEXIVE)
+_ADJECTIVE = _by_length(ADJECTIVE)
+_PARTICIPLE = (_by_length(PARTICIPLE[0]), _by_length(PARTICIPLE[1]))
+_VERB = (_by_length(VERB[0]), _by_length(VERB[1]))
+_NOUN = _by_length(NOUN)
+
+
+def _strip(word: str, start: int, endings) -> str:
+    """Отсекает самое длинное окончание из endings, лежащее в word[start:]"""
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= start:
+            return word[:-len(ending)]
+    return word
+
+
+def _strip_grouped(word: str, start: int, groups) -> str:
+    """Как _strip, но окончания первой группы должны идти после а или я"""
+    first, second = groups
+    best = None
+    for ending in first:
+        stem_length = len(word) - len(ending)
+        if word.endswith(ending) and stem_length - 1 >= start and word[stem_length - 1] in 'ая':
+            best = stem_length
+            break
+    for ending in second:
+        stem_length = len(word) - len(ending)
+        if word.endswith(ending) and stem_length >= start and (best is None or stem_length < best):
+            best = stem_length
+            break
+    return word if best is None else word[:best]
+
+
+def _strip_adjectival(word: str, start: int) -> str:
+    stripped = _strip(word, start, _ADJECTIVE)
+    if stripped == word:
+        return word
+    return _strip_grouped(stripped, start, _PARTICIPLE)
+
+
+def stem(word: str) -> str:
+    """Основа слова (слово в нижнем регистре)"""
+    word = fold(word)
+    match = _RV_RE.search(word)
+    if match is None:
+        return word
+    rv = match.end()
+    r1_match = _R1_RE.search(word)
+    r1 = r1_match.end() if r1_match else len(word)
+    r2_match = _R1_RE.search(word, r1)
+    r2 = r2_match.end() if r2_match else len(word)
+
+    # Шаг 1
+    stripped = _strip_grouped(word, rv, _PERFECTIVE_GERUND)
+    if stripped == word:
+        word = _strip(word, rv, _REFLEXIVE)
+        stripped = _strip_adjectival(word, rv)
+        if stripped == word:
+            stripped = _strip_grouped(word, rv, _VERB)
+        if stripped == word:
+            stripped = _strip(word, rv, _NOUN)
+    word = stripped
+
+    # Шаг 2
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3
+    for ending in DERIVATIONAL:
+        if word.endswith(ending) and len(word) - len(ending) >= r2:
+            word = word[:-len(ending)]
+            break
+
+    # Шаг 4
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        return word[:-1]
+    for ending in SUPERLATIVE:
+        if word.endswith(ending) and len(word) - len(ending) >= rv:
+            word = word[:-len(ending)]
+            if word.endswith('нн') and len(word) - 2 >= rv:
+                word = word[:-1]
+            return word
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
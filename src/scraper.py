@@ -1,74 +1,267 @@
-import requests
-import json
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import logging
-import pandas as pd
+import numpy as np
 import os
-from datetime import datetime, timedelta
-import schedule
+import sys
+from datetime import datetime
 import time
 import threading
 import asyncio
+import concurrent.futures
+
+from src.gisp_store import GispSnapshot
+from src.downloader import DownloadResult, FileDownloader
+from src.eaeu_client import EaeuClient
+from src.eaeu_mirror import EaeuMirror, MirrorItemsWriter, merge_mirror
+from src.circuit_breaker import CircuitBreaker
+from src.executor import BlockingExecutor
+from src.result_cache import ResultCache, normalize_query
+from src.result_cursor import ResultRows
+from src.generations import Generation, GenerationManager
+from src.metrics import metrics
+from src.gisp_search import match_positions
+from src.gisp_build import build_generation_indexes, build_indexes, indexes_match, ingest_registry, load_indexes
 
 logger = logging.getLogger(__name__)
 
+GISP_DOWNLOAD_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': '*/*',
+    'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Connection': 'keep-alive',
+    'Referer': 'https://gisp.gov.ru/',
+}
+
+SOURCE_LABELS = {
+    'eaeu': 'ЕАЭС',
+    'gisp': 'ГИСП',
+}
+SOURCE_OK = 'ok'
+SOURCE_TIMEOUT = 'timeout'
+SOURCE_ERROR = 'error'
+SOURCE_SKIPPED = 'skipped'
+# Данные источника еще открываются или загружаются; это не отказ источника
+SOURCE_NOT_READY = 'not_ready'
+# Сколько поиск ждет поколение ГИСП, которое открывается при запуске, секунд
+GENERATION_OPEN_WAIT = 1.0
+
+
+class SourceNotReady(Exception):
+    """Данные источника еще не готовы (открываются или загружаются при запуске)"""
+
+
+class SearchResults(list):
+    """Результаты поиска по всем источникам.
+
+    source_status - состояние каждого источника (SOURCE_*), чтобы можно
+    было показать, что часть результатов не получена.
+    """
+
+    def __init__(self, results=(), source_status: Optional[Dict[str, str]] = None):
+        super().__init__(results)
+        self.source_status = source_status or {}
+
+
+def positions_size(entry) -> int:
+    """Объем записи кэша номеров строк, байт.
+
+    Запись - номера строк или пара (номера строк, исправления запроса).
+    """
+    if isinstance(entry, tuple):
+        positions, corrections = entry
+        return positions_size(positions) + sys.getsizeof(corrections or {})
+    return entry.nbytes + sys.getsizeof(entry)
+
+
+def describe_corrections(results) -> str:
+    """Строка о нечетком поиске для сообщения пользователю"""
+    corrections = {}
+    fuzzy = False
+    for rows in results:
+        if getattr(rows, 'corrections', None) is not None:
+            fuzzy = True
+            corrections.update(rows.corrections)
+    if not fuzzy:
+        return ""
+    line = "🔤 Точных совпадений нет, показаны похожие наименования"
+    if corrections:
+        line += "\nИсправлено: " + ", ".join(f"{word} → {fixed}" for word, fixed in corrections.items())
+    return line
+
+
+def describe_unavailable_sources(results) -> str:
+    """Строки о недоступных источниках для сообщения пользователю"""
+    notes = {
+        SOURCE_TIMEOUT: "⏱ {} не ответил вовремя, результаты не получены",
+        SOURCE_ERROR: "⚠️ {}: ошибка при запросе, результаты не получены",
+        SOURCE_SKIPPED: "⛔ {} временно недоступен и пропущен",
+        SOURCE_NOT_READY: "⏳ База {} еще не готова (загружается), результаты не получены",
+    }
+    lines = []
+    for source, status in getattr(results, 'source_status', {}).items():
+        if status in notes:
+            lines.append(notes[status].format(SOURCE_LABELS.get(source, source)))
+    return "\n".join(lines)
+
+
 class ProductScraper:
     def __init__(self):
         logger.info("Initializing ProductScraper...")
         self.EAEU_API_URL = "https://goszakupki.eaeunion.org/spd/find"
-        self.GISP_EXCEL_URL = "https://gisp.gov.ru/documents/10546/11962150/reestr_pprf_719_27122023.xlsx"
-        self.GISP_FILE_PATH = "data/gisp_products.csv"
+        self.eaeu_client = EaeuClient(self.EAEU_API_URL, page_size=1000, fan_out=4)
+        # Результаты ЕАЭС по одинаковым запросам берутся из кэша
+        self.eaeu_cache = ResultCache(max_entries=256, max_bytes=64 * 1024 * 1024, ttl=3600)
+        # Локальное зеркало ЕАЭС; API используется, только пока зеркало не готово
+        self.EAEU_DATA_DIR = "data/eaeu"
+        self.eaeu_mirror = EaeuMirror(self.EAEU_DATA_DIR, keep=2)
+        self.eaeu_sync_hours = 6
+        self.last_eaeu_sync = None
+        # Сколько секунд ждать каждый источник в search_rows
+        self.source_deadlines = {'eaeu': 20.0, 'gisp': 5.0}
+        self.breakers = {
+            source: CircuitBreaker(source, failure_threshold=3, reset_timeout=120)
+            for source in SOURCE_LABELS
+        }
+        self.GISP_EXCEL_URL = "https://gisp.gov.ru/pp719v2/mptapp/view/dl/production_res_valid_only/"
+        self.GISP_DATA_DIR = "data/gisp"
+        self.gisp_update_days = 7
+        self.TEMP_GISP_FILE = "data/temp_gisp.xlsx"
+        self.generations = GenerationManager(self.GISP_DATA_DIR, keep=3)
+        self.downloader = FileDownloader("data/gisp_download.json")
+        # Пулы для блокирующих запросов, разбора Excel и построения индексов
+        self.executor = BlockingExecutor()
+        self.last_download = None
+        self.last_update_summary = None
         self.last_update = None
         self.file_update_status = None
-        self.chunk_size = 50000
-        self.df_cache = None
-        self.search_index = {}  # Добавляем индекс для быстрого поиска
+        self.chunk_size = 10000
+        # Активное поколение: снимок и индексы для быстрого поиска
+        self.generation = None
+        # Необязательный пул процессов для поиска ГИСП (SearchPool); без него - пул потоков
+        self.search_pool = None
+        # Номера найденных строк ГИСП по (поколению, запросу). Кэш не очищается
+        # при смене поколения: он не потокобезопасен, а поколение меняется в
+        # пуле потоков; записи прежнего поколения больше не запрашиваются и
+        # вытесняются по давности использования
+        self.gisp_cache = ResultCache(max_entries=1024, max_bytes=32 * 1024 * 1024, ttl=24 * 3600,
+                                      size_of=positions_size)
         
-        os.makedirs(os.path.dirname(self.GISP_FILE_PATH), exist_ok=True)
-        self.start_background_updates()
+        # Открытие, активация и откат поколения выполняются одним потоком
+        self.generation_lock = threading.Lock()
+        # Реестр ГИСП скачивается при запуске, потому что базы на диске нет
+        self.gisp_loading = False
         
-        if not os.path.exists(self.GISP_FILE_PATH):
-            logger.info("GISP file not found, downloading...")
-            self.download_gisp_file()
+        os.makedirs(os.path.dirname(self.TEMP_GISP_FILE), exist_ok=True)
+        # Базы открываются в warm_start(), а недостающий реестр скачивается
+        # обновлением уже после запуска бота: конструктор не читает данных
         logger.info("ProductScraper initialized successfully")
 
+    def warm_start(self):
+        """Открывает сохраненные поколения ГИСП и зеркала ЕАЭС и прогревает их файлы.
+
+        Снимки и индексы открываются через memory map, поэтому открытие
+        занимает миллисекунды; затем файлы читаются целиком, чтобы первые
+        запросы не ждали чтения страниц с диска.
+        """
+        try:
+            with metrics.timer('startup_seconds', stage='eaeu_open'):
+                mirror_generation = self.eaeu_mirror.open()
+        except Exception as e:
+            logger.error(f"Failed to open EAEU mirror: {e}", exc_info=True)
+            mirror_generation = None
+        try:
+            with metrics.timer('startup_seconds', stage='gisp_open'):
+                generation = self._open_current_generation()
+        except Exception as e:
+            logger.error(f"Failed to open GISP generation: {e}", exc_info=True)
+            generation = None
+        with metrics.timer('startup_seconds', stage='prefetch'):
+            prefetched = 0
+            if generation is not None:
+                prefetched += self.generations.prefetch(generation.id)
+            if mirror_generation is not None:
+                prefetched += self.eaeu_mirror.generations.prefetch(mirror_generation.id)
+        logger.info(f"Warm start finished, prefetched {prefetched / (1024 * 1024):.1f} MB")
+
+    async def update_registry(self, status_message=None) -> int:
+        """Обновляет реестр ГИСП и возвращает число строк в базе.
+
+        С status_message ход обновления выводится в сообщение, без него -
+        только в лог (обновление по расписанию).
+        """
+        # Пока базы нет совсем, поиск сообщает, что она загружается
+        self.gisp_loading = self.generations.current_id() is None
+        try:
+            if status_message is not None:
+                return await self.download_gisp_file_with_status(status_message)
+            return await self.executor.run_io(self.download_gisp_file)
+        finally:
+            self.gisp_loading = False
+
+    def gisp_data_time(self) -> Optional[datetime]:
+        """Время создания активного поколения ГИСП или None, если базы нет"""
+        generation_id = self.generations.current_id()
+        if generation_id is None:
+            return None
+        created_at = self.generations.manifest(generation_id).get('created_at')
+        if created_at:
+            return datetime.fromisoformat(created_at)
+        return datetime.fromtimestamp(os.path.getmtime(self.generations.snapshot_path(generation_id)))
+
+    def eaeu_data_time(self) -> Optional[datetime]:
+        """Время последней синхронизации зеркала ЕАЭС или None, если зеркала нет"""
+        synced_at = self.eaeu_mirror.manifest.get('synced_at')
+        return datetime.fromisoformat(synced_at) if synced_at else None
+
+    def _download_registry(self) -> DownloadResult:
+        """Скачивает файл реестра ГИСП потоково, пропуская неизменившийся файл"""
+        logger.info(f"Downloading GISP registry from {self.GISP_EXCEL_URL}")
+        # Без локального снимка условный запрос не имеет смысла
+        force = self.generations.current_id() is None
+        with metrics.timer('gisp_update_seconds', stage='download'):
+            return self.downloader.download(
+                self.GISP_EXCEL_URL, self.TEMP_GISP_FILE, headers=GISP_DOWNLOAD_HEADERS, force=force
+            )
+
+    def _finish_unchanged_download(self, download: DownloadResult):
+        """Завершает обновление, если реестр не изменился.
+
+        Файл мог скачаться заново и совпасть по контрольной сумме, а ETag и
+        Last-Modified на сервере - смениться: их нужно запомнить, иначе
+        каждое обновление будет скачивать реестр целиком без ответа 304.
+        """
+        self.downloader.mark_processed(self.GISP_EXCEL_URL, download)
+        if os.path.exists(self.TEMP_GISP_FILE):
+            os.remove(self.TEMP_GISP_FILE)
+        self.last_update = datetime.now()
+
     async def download_gisp_file_with_status(self, status_message):
-        temp_file = "data/temp_gisp.xlsx"
+        temp_file = self.TEMP_GISP_FILE
         try:
             # Этап 1: Скачивание файла
             logger.info("Starting GISP file download...")
             await status_message.edit_text("⏳ Скачивание файла ГИСП...")
             
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': '*/*',
-                'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Referer': 'https://gisp.gov.ru/',
-            }
-
-            self.GISP_EXCEL_URL = "https://gisp.gov.ru/pp719v2/mptapp/view/dl/production_res_valid_only/"
-            
             try:
-                response = requests.get(self.GISP_EXCEL_URL, headers=headers, verify=True, timeout=60)
-                response.raise_for_status()
-                
-                # Сохраняем Excel файл
-                with open(temp_file, 'wb') as f:
-                    f.write(response.content)
+                download = await self.executor.run_io(self._download_registry)
+                self.last_download = download
                 
-                if not os.path.exists(temp_file) or os.path.getsize(temp_file) == 0:
+                if not download.not_modified and (
+                        not os.path.exists(temp_file) or os.path.getsize(temp_file) == 0):
                     raise Exception("Failed to download file or file is empty")
                 
-                logger.info(f"Excel file downloaded successfully, size: {os.path.getsize(temp_file)} bytes")
-                
             except Exception as e:
                 logger.error(f"Download failed: {str(e)}")
                 raise Exception(f"Failed to download file: {str(e)}")
+            
+            if download.not_modified:
+                await self.executor.run_io(self._finish_unchanged_download, download)
+                await status_message.edit_text("✅ Реестр ГИСП не изменился, обновление не требуется")
+                generation = self.generation or await self.executor.run_io(self._open_current_generation)
+                return generation.snapshot.num_rows if generation is not None else 0
 
             # Этап 2: Обработка файла
-            # Оптимизированная обработка Excel
+            # Потоковая обработка Excel в отдельном процессе
             await status_message.edit_text("⏳ Обработка файла Excel...")
             try:
                 logger.info(f"Starting Excel processing, file size: {os.path.getsize(temp_file)} bytes")
@@ -77,137 +270,64 @@ class ProductScraper:
                 if os.path.getsize(temp_file) < 100:
                     raise Exception("Скачанный файл слишком маленький, возможно это не Excel")
                 
-                # Оптимизированные настройки pandas
-                pd.options.mode.chained_assignment = None
-                chunk_size = 5000  # Уменьшаем размер чанка еще больше
-                
-                # Пробуем прочитать первые строки для проверки структуры
-                try:
-                    test_df = pd.read_excel(
-                        temp_file,
-                        nrows=5,
-                        skiprows=2,
-                        engine='openpyxl'
-                    )
-                    logger.info(f"Excel test read successful, columns: {list(test_df.columns)}")
-                    
-                    # Оцениваем общее количество строк для отображения прогресса
-                    file_size = os.path.getsize(temp_file)
-                    estimated_rows = int((file_size / (1024 * 1024)) * 5000)
-                    logger.info(f"Estimated total rows: ~{estimated_rows} (based on file size {file_size/1024/1024:.2f} MB)")
-                    
-                except Exception as e:
-                    logger.error(f"Excel test read failed: {str(e)}", exc_info=True)
-                    raise Exception(f"Не удалось прочитать Excel файл: {str(e)}")
-                
-                # Читаем только необходимые колонки с оптимизированными типами данных
-                try:
-                    df_iterator = pd.read_excel(
-                        temp_file,
-                        usecols=[0, 1, 6, 8, 9, 11, 12, 13, 14],
-                        skiprows=2,
-                        names=[
-                            'Предприятие', 'ИНН', 'Реестровый номер', 
-                            'Дата внесения в реестр', 'Срок действия',
-                            'Наименование продукции', 'ОКПД2', 'ТН ВЭД', 'Изготовлена по'
-                        ],
-                        engine='openpyxl',
-                        dtype={
-                            'ИНН': str,
-                            'Реестровый номер': str,
-                            'ОКПД2': str,
-                            'ТН ВЭД': str,
-                            'Предприятие': str,
-                            'Наименование продукции': str,
-                            'Изготовлена по': str
-                        },
-                        chunksize=chunk_size
-                    )
-                except Exception as e:
-                    logger.error(f"Excel iterator creation failed: {str(e)}", exc_info=True)
-                    # Пробуем альтернативный подход без указания конкретных колонок
-                    df_iterator = pd.read_excel(
-                        temp_file,
-                        skiprows=2,
-                        engine='openpyxl',
-                        dtype=str,
-                        chunksize=chunk_size
-                    )
-                    logger.info("Using alternative Excel reading approach")
-
-                # Оптимизированная обработка чанков
-                first_chunk = True
-                total_rows = 0
                 start_time = time.time()
-                last_update_time = time.time()
+                ingest_started = time.perf_counter()
+                generation_id = self.generations.create()
+                # Запуск процесса-менеджера тоже занимает время
+                progress = await self.executor.run_io(self.executor.shared_dict)
+                ingest = asyncio.wrap_future(self.executor.submit_cpu(
+                    ingest_registry, temp_file, self.generations.snapshot_path(generation_id),
+                    self.chunk_size, progress
+                ))
                 
-                with open(self.GISP_FILE_PATH, 'w', encoding='utf-8-sig', newline='') as f:
-                    for i, chunk in enumerate(df_iterator):
-                        # Очищаем память перед обработкой нового чанка
-                        import gc
-                        gc.collect()
-                        
-                        # Обрабатываем чанк
-                        chunk = chunk.dropna(how='all')
-                        
-                        # Логируем информацию о первом чанке
-                        if i == 0:
-                            logger.info(f"First chunk columns: {list(chunk.columns)}")
-                            logger.info(f"First chunk shape: {chunk.shape}")
-                        
-                        # Создаем индексы только для текущего чанка
-                        if first_chunk:
-                            chunk.to_csv(f, index=False)
-                            first_chunk = False
-                        else:
-                            chunk.to_csv(f, index=False, header=False)
-                        
-                        total_rows += len(chunk)
+                while not ingest.done():
+                    # Обновляем статус каждые 3 секунды
+                    await asyncio.wait({ingest}, timeout=3)
+                    if ingest.done():
+                        break
+                    total_rows = progress.get('rows', 0)
+                    expected_rows = progress.get('expected')
+                    elapsed_time = time.time() - start_time
+                    rows_per_second = total_rows / elapsed_time if elapsed_time > 0 else 0
+                    
+                    # Оценка оставшегося времени по реальному числу строк листа
+                    if rows_per_second > 0 and expected_rows and expected_rows > total_rows:
+                        remaining_time = (expected_rows - total_rows) / rows_per_second
+                        remaining_minutes = int(remaining_time / 60)
+                        remaining_seconds = int(remaining_time % 60)
                         
-                        # Обновляем статус каждые 3 секунды или каждые 10000 строк
-                        current_time = time.time()
-                        if current_time - last_update_time > 3 or total_rows % 10000 == 0:
-                            elapsed_time = current_time - start_time
-                            rows_per_second = total_rows / elapsed_time if elapsed_time > 0 else 0
-                            
-                            # Оценка оставшегося времени
-                            if rows_per_second > 0 and estimated_rows > total_rows:
-                                remaining_rows = estimated_rows - total_rows
-                                remaining_time = remaining_rows / rows_per_second
-                                remaining_minutes = int(remaining_time / 60)
-                                remaining_seconds = int(remaining_time % 60)
-                                
-                                progress = min(100, int((total_rows / estimated_rows) * 100))
-                                
-                                await status_message.edit_text(
-                                    f"⏳ Обработка Excel файла...\n"
-                                    f"📊 Прогресс: {progress}%\n"
-                                    f"📝 Обработано строк: {total_rows:,} из ~{estimated_rows:,}\n"
-                                    f"⏱️ Скорость: {rows_per_second:.1f} строк/сек\n"
-                                    f"🕒 Осталось примерно: {remaining_minutes}м {remaining_seconds}с"
-                                )
-                            else:
-                                await status_message.edit_text(
-                                    f"⏳ Обработка Excel файла...\n"
-                                    f"📝 Обработано строк: {total_rows:,}\n"
-                                    f"⏱️ Скорость: {rows_per_second:.1f} строк/сек"
-                                )
-                                
-                            last_update_time = current_time
+                        progress_percent = min(100, int((total_rows / expected_rows) * 100))
                         
-                        # Очищаем память
-                        del chunk
-                        gc.collect()
-
-                logger.info(f"CSV file saved successfully, total rows: {total_rows}")
+                        await status_message.edit_text(
+                            f"⏳ Обработка Excel файла...\n"
+                            f"📊 Прогресс: {progress_percent}%\n"
+                            f"📝 Обработано строк: {total_rows:,} из {expected_rows:,}\n"
+                            f"⏱️ Скорость: {rows_per_second:.1f} строк/сек\n"
+                            f"🕒 Осталось примерно: {remaining_minutes}м {remaining_seconds}с"
+                        )
+                    else:
+                        await status_message.edit_text(
+                            f"⏳ Обработка Excel файла...\n"
+                            f"📝 Обработано строк: {total_rows:,}\n"
+                            f"⏱️ Скорость: {rows_per_second:.1f} строк/сек"
+                        )
                 
-                # Проверяем, что CSV файл не пустой
-                if os.path.getsize(self.GISP_FILE_PATH) == 0:
-                    raise Exception("CSV файл создан, но имеет нулевой размер")
+                total_rows = ingest.result()
+                self._record_ingest(total_rows, time.perf_counter() - ingest_started)
+                logger.info(f"Snapshot saved successfully, total rows: {total_rows}")
                 
-                # Обновляем индексы частями
-                await status_message.edit_text("⏳ Создание индексов поиска...")
-                self._update_search_index_by_chunks()
+                # Проверяем, что снимок не пустой
+                if os.path.getsize(self.generations.snapshot_path(generation_id)) == 0:
+                    raise Exception("Снимок ГИСП создан, но имеет нулевой размер")
+                
+                # Собираем индексы нового поколения и публикуем его
+                await status_message.edit_text("⏳ Обновление индексов поиска...")
+                with metrics.timer('gisp_update_seconds', stage='index_build'):
+                    summary = await self.executor.run_cpu(
+                        build_generation_indexes, *self._index_build_args(generation_id)
+                    )
+                with metrics.timer('gisp_update_seconds', stage='activate'):
+                    await self.executor.run_io(self._activate_generation, generation_id, summary, download)
                 
                 # Удаляем временный файл
                 if os.path.exists(temp_file):
@@ -215,21 +335,9 @@ class ProductScraper:
                     logger.info("Temporary Excel file removed")
                 
                 await status_message.edit_text("✅ Файл ГИСП успешно обновлен!")
+                self.downloader.mark_processed(self.GISP_EXCEL_URL, download)
                 self.last_update = datetime.now()
                 
-                # Загружаем небольшую часть данных в кэш
-                self.df_cache = pd.read_csv(
-                    self.GISP_FILE_PATH, 
-                    encoding='utf-8-sig',
-                    dtype={
-                        'ИНН': str,
-                        'Реестровый номер': str,
-                        'ОКПД2': str,
-                        'ТН ВЭД': str
-                    },
-                    nrows=1000
-                )
-                
                 return total_rows
                 
             except Exception as e:
@@ -240,86 +348,111 @@ class ProductScraper:
         except Exception as e:
             logger.error(f"GISP file download failed: {str(e)}", exc_info=True)
             await status_message.edit_text(f"❌ Ошибка при загрузке файла: {str(e)}")
-            return 0
+            raise
 
-    def search_eaeu(self, okpd2: Optional[str] = None, name: Optional[str] = None) -> List[Dict]:
-        try:
-            logger.info(f"Starting EAEU search with okpd2={okpd2}, name={name}")
-            params = {
-                "collection": "db1.v_goodscollection_prod_public",
-                "limit": 1000,
-                "skip": 0,
-                "sort": {"publishdate": -1}
-            }
-
-            query_filter = {}
-            if okpd2:
-                query_filter["okpd2.code"] = {"$regex": f"^{okpd2}", "$options": "i"}
-            if name:
-                query_filter["name"] = {"$regex": name, "$options": "i"}
+    async def _eaeu_rows(self, okpd2: Optional[str], name: Optional[str]) -> ResultRows:
+        """Строки ЕАЭС: номера строк зеркала или записи API; ошибки пробрасываются"""
+        okpd2_key, name_key = normalize_query(okpd2, name)
+        generation = self.eaeu_mirror.generation
+        if generation is not None and self.eaeu_mirror.is_fresh():
+            try:
+                with metrics.timer('search_seconds', stage='eaeu_mirror'):
+                    positions, corrections = await self.executor.run_io(
+                        self._match_positions, generation, okpd2_key, name_key
+                    )
+                return ResultRows('ЕАЭС', generation, positions, corrections=corrections)
+            except Exception as e:
+                logger.warning(f"EAEU mirror search failed, falling back to API: {e}")
+        # Одновременные одинаковые запросы выполняются один раз;
+        # records() отдает копию, так что изменения не попадут в кэш
+        results = await self.eaeu_cache.get_or_load(
+            (okpd2_key, name_key), lambda: self._fetch_eaeu(okpd2_key, name_key)
+        )
+        return ResultRows('ЕАЭС', records=results)
 
-            if query_filter:
-                params["filter"] = query_filter
+    async def _fetch_eaeu(self, okpd2: str, name: str) -> List[Dict]:
+        """Запрашивает все страницы результата в API ЕАЭС; ошибки пробрасываются"""
+        query_filter = {}
+        if okpd2:
+            query_filter["okpd2.code"] = {"$regex": f"^{okpd2}", "$options": "i"}
+        if name:
+            query_filter["name"] = {"$regex": name, "$options": "i"}
 
-            response = requests.post(self.EAEU_API_URL, json=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            results = []
-            for item in data.get('items', []):
-                result = {
-                    'name': item.get('name', ''),
-                    'okpd2_code': item.get('okpd2', {}).get('code', ''),
-                    'manufacturer': item.get('manufacturer', {}).get('name', ''),
-                    'inn': '',
-                    'registry_number': '',
-                    'registry_date': '',
-                    'valid_until': '',
-                    'tn_ved': '',
-                    'standard': '',
-                    'source': 'ЕАЭС'
-                }
-                results.append(result)
-            
-            logger.info(f"EAEU search completed, found {len(results)} results")
-            return results
+        # Все страницы результата, остальные после первой - параллельно
+        with metrics.timer('search_seconds', stage='eaeu_api'):
+            items = await self.eaeu_client.find(query_filter)
+        
+        results = []
+        for item in items:
+            result = {
+                'name': item.get('name', ''),
+                'okpd2_code': item.get('okpd2', {}).get('code', ''),
+                'manufacturer': item.get('manufacturer', {}).get('name', ''),
+                'inn': '',
+                'registry_number': '',
+                'registry_date': '',
+                'valid_until': '',
+                'tn_ved': '',
+                'standard': '',
+                'source': 'ЕАЭС'
+            }
+            results.append(result)
+        
+        return results
 
-        except Exception as e:
-            logger.error(f"EAEU API search error: {e}")
-            return []
+    async def search_rows(self, okpd2: Optional[str] = None, name: Optional[str] = None,
+                          status_message=None) -> SearchResults:
+        """Ищет в ЕАЭС и ГИСП одновременно и возвращает строки источников (ResultRows).
 
-    async def search_all(self, okpd2: Optional[str] = None, name: Optional[str] = None, status_message=None) -> List[Dict]:
+        Каждый источник ограничен своим сроком из source_deadlines; то, что
+        пришло вовремя, возвращается, а состояние источников записывается
+        в source_status результата. Записи собираются позже, по страницам.
+        """
+        search_started = time.perf_counter()
         try:
             logger.info(f"Starting combined search with okpd2={okpd2}, name={name}")
             
             if status_message:
-                await status_message.edit_text(
-                    "🔍 Поиск в ЕАЭС...\n"
-                    "⏳ Прогресс: 0%"
-                )
-            eaeu_results = self.search_eaeu(okpd2, name)
-            
-            if status_message:
-                await status_message.edit_text(
-                    "🔍 Поиск в ГИСП...\n"
-                    "⏳ Прогресс: 50%"
-                )
-            gisp_results = await self.search_gisp(okpd2, name, status_message)
-            
-            total_results = eaeu_results + gisp_results
+                await status_message.edit_text("🔍 Поиск в ЕАЭС и ГИСП...")
+            sources = {
+                'eaeu': lambda: self._eaeu_rows(okpd2, name),
+                'gisp': lambda: self._gisp_rows(okpd2, name),
+            }
+            outcomes = await asyncio.gather(*(
+                self._query_source(source, search) for source, search in sources.items()
+            ))
+            found = dict(zip(sources, outcomes))
+            
+            total_rows = SearchResults(
+                [rows for rows, _ in outcomes if len(rows)],
+                {source: status for source, (_, status) in found.items()}
+            )
+            total_count = sum(len(rows) for rows in total_rows)
             
             if status_message:
+                lines = [
+                    "✅ Поиск завершен",
+                    f"📊 Всего найдено: {total_count}",
+                ]
+                for source, (rows, status) in found.items():
+                    if status == SOURCE_OK:
+                        lines.append(f"{SOURCE_LABELS[source]}: {len(rows)}")
+                fuzzy = describe_corrections(total_rows)
+                if fuzzy:
+                    lines.append(fuzzy)
+                unavailable = describe_unavailable_sources(total_rows)
+                if unavailable:
+                    lines.append(unavailable)
                 await status_message.edit_text(
-                    f"✅ Поиск завершен\n"
-                    f"📊 Всего найдено: {len(total_results)}\n"
-                    f"ЕАЭС: {len(eaeu_results)}\n"
-                    f"ГИСП: {len(gisp_results)}\n\n"
-                    f"Используйте /start для нового поиска"
+                    "\n".join(lines) + "\n\nИспользуйте /start для нового поиска"
                 )
             
-            logger.info(f"Combined search completed, total results: {len(total_results)}")
-            return total_results
+            metrics.observe('search_seconds', time.perf_counter() - search_started, stage='total')
+            logger.info(
+                f"Combined search completed, total results: {total_count}, "
+                f"sources: {total_rows.source_status}"
+            )
+            return total_rows
             
         except Exception as e:
             logger.error(f"Combined search error: {e}")
@@ -328,218 +461,275 @@ class ProductScraper:
                     f"❌ Ошибка при поиске: {str(e)}\n\n"
                     f"Используйте /start для нового поиска"
                 )
-            return []
-
-    def _update_search_index_by_chunks(self):
-        """Создает индексы для быстрого поиска, обрабатывая файл частями"""
-        logger.info("Updating search indexes by chunks...")
-        self.search_index = {
-            'okpd2': {},
-            'name': set()
-        }
-        
-        # Используем небольшой размер чанка для экономии памяти
-        chunk_size = 5000
-        total_processed = 0
-        
+            return SearchResults()
+
+    async def _query_source(self, source: str, search) -> tuple:
+        """Выполняет поиск в источнике с учетом срока и размыкателя.
+
+        Возвращает пару (результаты, состояние источника).
+        """
+        results, status = await self._call_source(source, search)
+        metrics.inc('search_source_total', source=source, status=status)
+        return results, status
+
+    async def _call_source(self, source: str, search) -> tuple:
+        breaker = self.breakers[source]
+        if not breaker.allow_request():
+            logger.info(f"Source {source} skipped, circuit is {breaker.state}")
+            return [], SOURCE_SKIPPED
+        deadline = self.source_deadlines[source]
         try:
-            for chunk in pd.read_csv(
-                self.GISP_FILE_PATH, 
-                encoding='utf-8-sig',
-                dtype={
-                    'ИНН': str,
-                    'Реестровый номер': str,
-                    'ОКПД2': str,
-                    'ТН ВЭД': str
-                },
-                chunksize=chunk_size
-            ):
-                # Индекс для ОКПД2
-                for idx, code in enumerate(chunk['ОКПД2']):
-                    if pd.notna(code):
-                        code = str(code).lower()
-                        # Ограничиваем длину префиксов для экономии памяти
-                        max_prefix_len = min(len(code), 5)  # Еще меньше префиксов
-                        for i in range(max_prefix_len):
-                            prefix = code[:i+1]
-                            if prefix not in self.search_index['okpd2']:
-                                self.search_index['okpd2'][prefix] = set()
-                            # Используем глобальный индекс
-                            self.search_index['okpd2'][prefix].add(total_processed + idx)
-                
-                # Индекс для наименований (только уникальные значения)
-                self.search_index['name'].update(
-                    set(chunk['Наименование продукции'].str.lower().dropna())
-                )
-                
-                total_processed += len(chunk)
-                
-                # Принудительная очистка памяти
-                import gc
-                del chunk
-                gc.collect()
-            
-            logger.info(f"Search indexes updated successfully, processed {total_processed} rows")
-            
+            with metrics.timer('search_seconds', stage=source):
+                results = await asyncio.wait_for(search(), timeout=deadline)
+        except asyncio.CancelledError:
+            # Отмена поиска ничего не говорит о состоянии источника, но пробный
+            # запрос нужно освободить, иначе источник пропускается до перезапуска
+            breaker.release_probe()
+            raise
+        except SourceNotReady as e:
+            # Пока база открывается при запуске, размыкатель не должен считать
+            # это отказом: иначе источник пропускался бы и после загрузки
+            logger.info(f"Source {source} is not ready: {e}")
+            breaker.release_probe()
+            return [], SOURCE_NOT_READY
+        except asyncio.TimeoutError:
+            logger.warning(f"Source {source} did not answer within {deadline}s")
+            breaker.record_failure()
+            return [], SOURCE_TIMEOUT
         except Exception as e:
-            logger.error(f"Error updating search indexes: {e}", exc_info=True)
-            # Создаем пустые индексы в случае ошибки
-            self.search_index = {'okpd2': {}, 'name': set()}
-        
-        # Удаляем этот код, так как переменная df не определена
-        # Индекс для ОКПД2
-        # for idx, code in enumerate(df['ОКПД2']):
-        #     if pd.notna(code):
-        #         code = str(code).lower()
-        #         for i in range(len(code)):
-        #             prefix = code[:i+1]
-        #             if prefix not in self.search_index['okpd2']:
-        #                 self.search_index['okpd2'][prefix] = set()
-        #             self.search_index['okpd2'][prefix].add(idx)
-        
-        # # Индекс для наименований
-        # self.search_index['name'] = set(df['Наименование продукции'].str.lower().dropna())
-        # logger.info("Search indexes updated successfully")
+            logger.error(f"Source {source} search error: {e}")
+            breaker.record_failure()
+            return [], SOURCE_ERROR
+        breaker.record_success()
+        return results, SOURCE_OK
+
+    async def sync_eaeu_mirror(self) -> Dict:
+        """Загружает в зеркало ЕАЭС записи, опубликованные после прошлой синхронизации.
 
-    async def search_gisp(self, okpd2: Optional[str] = None, name: Optional[str] = None, status_message=None) -> List[Dict]:
+        Для выгрузки создается отдельный клиент без ограничения числа
+        записей. Страницы записываются в промежуточный файл по мере
+        получения, поэтому вся выгрузка в памяти не держится; слияние с
+        прежним снимком и перенос индексов идут в пуле процессов.
+        """
+        mirror = self.eaeu_mirror
+        query_filter = mirror.sync_filter()
+        logger.info(f"Syncing EAEU mirror, filter: {query_filter}")
+        start_time = time.time()
+        client = EaeuClient(self.EAEU_API_URL, page_size=1000, fan_out=4, max_items=None)
+        items_writer = MirrorItemsWriter(mirror.items_path)
+        await self.executor.run_io(items_writer.open)
         try:
-            if status_message:
-                await status_message.edit_text("🔍 Начинаем поиск в ГИСП...")
+            with metrics.timer('eaeu_sync_seconds', stage='fetch'):
+                async for page in client.pages(query_filter):
+                    await self.executor.run_io(items_writer.write_items, page)
+            await self.executor.run_io(items_writer.close)
+        except BaseException:
+            await self.executor.run_io(items_writer.discard)
+            raise
+        finally:
+            await client.close()
+        fetch_seconds = round(time.time() - start_time, 3)
 
-            # Используем кэш, если он есть
-            if self.df_cache is None:
-                if status_message:
-                    await status_message.edit_text("📖 Загрузка базы данных...")
-                
-                self.df_cache = pd.read_csv(
-                    self.GISP_FILE_PATH,
-                    encoding='utf-8-sig',
-                    dtype={
-                        'ИНН': str,
-                        'Реестровый номер': str,
-                        'ОКПД2': str,
-                        'ТН ВЭД': str
-                    }
-                )
-                # Заменяем вызов несуществующего метода
-                self._update_search_index_by_chunks()
+        try:
+            if items_writer.rows == 0:
+                await self.executor.run_io(mirror.mark_synced)
+                summary = {'total_rows': mirror.manifest.get('rows', 0), 'new_items': 0,
+                           'fetch_seconds': fetch_seconds}
+            else:
+                generation_id = mirror.generations.create()
+                with metrics.timer('eaeu_sync_seconds', stage='merge'):
+                    summary = await self.executor.run_cpu(merge_mirror, *mirror.merge_args(generation_id))
+                summary['fetch_seconds'] = fetch_seconds
+                with metrics.timer('eaeu_sync_seconds', stage='activate'):
+                    await self.executor.run_io(
+                        mirror.activate, generation_id, summary, items_writer.last_publishdate
+                    )
+        finally:
+            await self.executor.run_io(items_writer.discard)
+        self.last_eaeu_sync = datetime.now()
+        logger.info(f"EAEU mirror synced: {summary}")
+        return summary
 
-            df = self.df_cache
-            total_rows = len(df)
+    @property
+    def snapshot(self) -> Optional[GispSnapshot]:
+        return self.generation.snapshot if self.generation is not None else None
 
-            if status_message:
-                await status_message.edit_text("🔍 Применение фильтров...")
+    @property
+    def search_index(self) -> Dict:
+        return self.generation.search_index if self.generation is not None else {}
 
-            # Используем индексы для быстрого поиска
-            if okpd2 and name:
-                okpd2_lower = okpd2.lower()
-                name_lower = name.lower()
-                
-                # Поиск по ОКПД2
-                potential_indices = self.search_index['okpd2'].get(okpd2_lower, set())
-                mask = df.index.isin(potential_indices)
-                
-                # Дополнительная фильтрация по наименованию
-                name_mask = df['Наименование продукции'].str.lower().str.contains(name_lower, na=False)
-                mask = mask & name_mask
-                
-            elif okpd2:
-                okpd2_lower = okpd2.lower()
-                potential_indices = self.search_index['okpd2'].get(okpd2_lower, set())
-                mask = df.index.isin(potential_indices)
-                
-            elif name:
-                name_lower = name.lower()
-                mask = df['Наименование продукции'].str.lower().str.contains(name_lower, na=False)
-            else:
-                return []
+    def _open_current_generation(self, timeout: float = -1) -> Optional[Generation]:
+        """Открывает активное поколение с диска, если оно есть.
 
-            # Получаем результаты
-            results = df[mask].to_dict('records')
+        Если поколение уже открывает другой поток (при запуске индексы
+        могут пересобираться), ждет не дольше timeout секунд.
+        """
+        if not self.generation_lock.acquire(timeout=timeout):
+            raise SourceNotReady("База ГИСП открывается, повторите поиск позже")
+        try:
+            if self.generation is not None:
+                return self.generation
+            generation_id = self.generations.current_id()
+            if generation_id is None:
+                return None
+            self.generation = self._load_generation(generation_id)
+            return self.generation
+        finally:
+            self.generation_lock.release()
 
-            if status_message:
-                await status_message.edit_text("📊 Форматирование результатов...")
-            
-            # Преобразуем результаты в нужный формат
-            formatted_results = [{
-                'name': row['Наименование продукции'],
-                'okpd2_code': row['ОКПД2'],
-                'manufacturer': row['Предприятие'],
-                'inn': row['ИНН'],
-                'registry_number': row['Реестровый номер'],
-                'registry_date': row['Дата внесения в реестр'],
-                'valid_until': row['Срок действия'],
-                'tn_ved': row['ТН ВЭД'],
-                'standard': row['Изготовлена по'],
-                'source': 'ГИСП'
-            } for row in results]
+    def _load_generation(self, generation_id: str) -> Generation:
+        """Открывает снимок поколения через memory map и загружает его индексы"""
+        snapshot = GispSnapshot.open(self.generations.snapshot_path(generation_id))
+        search_index = self._update_search_index_by_chunks(
+            snapshot, self.generations.index_dir(generation_id), rebuild=False
+        )
+        return Generation(generation_id, snapshot, search_index, self.generations.manifest(generation_id))
 
-            if status_message:
-                found_count = len(formatted_results)
-                await status_message.edit_text(
-                    f"✅ Поиск завершен\n"
-                    f"📊 Найдено результатов: {found_count}\n"
-                    f"💾 Всего записей в базе: {total_rows}"
-                )
+    def _index_build_args(self, generation_id: str) -> tuple:
+        """Аргументы build_generation_indexes: новое поколение и активное, если оно есть"""
+        args = (self.generations.snapshot_path(generation_id), self.generations.index_dir(generation_id))
+        current_id = self.generation.id if self.generation is not None else self.generations.current_id()
+        if current_id is None:
+            return args
+        return args + (self.generations.snapshot_path(current_id), self.generations.index_dir(current_id))
 
-            logger.info(f"GISP search completed, found {len(formatted_results)} results")
-            return formatted_results
+    def _publish_generation(self, generation_id: str, download: Optional[DownloadResult] = None) -> Dict:
+        """Собирает индексы нового поколения в пуле процессов и делает его активным"""
+        with metrics.timer('gisp_update_seconds', stage='index_build'):
+            summary = self.executor.submit_cpu(
+                build_generation_indexes, *self._index_build_args(generation_id)
+            ).result()
+        with metrics.timer('gisp_update_seconds', stage='activate'):
+            return self._activate_generation(generation_id, summary, download)
 
-        except Exception as e:
-            logger.error(f"GISP search error: {e}")
-            if status_message:
-                await status_message.edit_text(f"❌ Ошибка при поиске: {str(e)}")
-            return []
+    @staticmethod
+    def _record_ingest(total_rows: int, seconds: float):
+        """Метрики разбора файла ГИСП (разбор идет в пуле процессов, поэтому время меряется здесь)"""
+        metrics.observe('gisp_update_seconds', seconds, stage='ingest')
+        metrics.set('gisp_ingest_rows', total_rows)
+        if seconds > 0:
+            metrics.set('gisp_ingest_rows_per_second', round(total_rows / seconds, 1))
 
-    def start_background_updates(self):
-        """Запускает фоновое обновление файла ГИСП"""
+    def _activate_generation(self, generation_id: str, summary: Dict,
+                             download: Optional[DownloadResult] = None) -> Dict:
+        """Проверяет собранное поколение и переключает на него поиск.
+
+        Индексы активного поколения не меняются, а поиск переключается на
+        новое поколение заменой одной ссылки. Если активно уже более новое
+        поколение (его собрало параллельное обновление), оно остается активным.
+        """
+        snapshot = GispSnapshot.open(self.generations.snapshot_path(generation_id))
+        index_dir = self.generations.index_dir(generation_id)
+        if not indexes_match(snapshot, index_dir):
+            raise Exception("Индексы поиска ГИСП не соответствуют снимку")
+        search_index = load_indexes(snapshot, index_dir)
+        self._validate_generation(snapshot, search_index)
+        manifest = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'rows': snapshot.num_rows,
+            'sha256': download.sha256 if download is not None else '',
+            'update': summary,
+        }
+        with self.generation_lock:
+            # id поколений упорядочены по времени создания
+            if self.generation is not None and self.generation.id > generation_id:
+                logger.warning(f"GISP generation {generation_id} is older than active "
+                               f"{self.generation.id}, not activating it")
+                return summary
+            self.generations.publish(generation_id, manifest)
+            # Единственное изменение, которое видит поиск
+            self.generation = Generation(generation_id, snapshot, search_index,
+                                         self.generations.manifest(generation_id))
+        self.last_update_summary = summary
+        logger.info(f"GISP generation {generation_id} is active: {summary}")
+        return summary
+
+    @staticmethod
+    def _validate_generation(snapshot: GispSnapshot, search_index: Dict):
+        """Проверяет собранное поколение перед публикацией"""
+        if snapshot.num_rows == 0:
+            raise Exception("Снимок ГИСП не содержит ни одной строки")
+        okpd2_index = search_index.get('okpd2')
+        name_index = search_index.get('name')
+        if okpd2_index is None or name_index is None:
+            raise Exception("Индексы поиска ГИСП не построены")
+        if name_index.num_rows != snapshot.num_rows:
+            raise Exception("Индекс наименований не соответствует снимку")
+        if len(okpd2_index.rows) and int(okpd2_index.rows.max()) >= snapshot.num_rows:
+            raise Exception("Индекс ОКПД2 не соответствует снимку")
+
+    def rollback_generation(self, generation_id: Optional[str] = None) -> Generation:
+        """Переключает поиск на сохраненное поколение (по умолчанию - на предыдущее)"""
+        generation_id = generation_id or self.generations.previous_id()
+        if generation_id is None:
+            raise Exception("Нет предыдущего поколения для отката")
+        generation = self._load_generation(generation_id)
+        with self.generation_lock:
+            self.generations.activate(generation_id)
+            self.generation = generation
+        logger.info(f"Rolled back to GISP generation {generation_id}")
+        return generation
+
+    def _update_search_index_by_chunks(self, snapshot: GispSnapshot, index_dir: str,
+                                       rebuild: bool = True) -> Dict:
+        """Загружает сохраненные индексы снимка или строит их заново"""
+        logger.info("Updating search indexes...")
         try:
-            def update_job():
-                logger.info("Running scheduled GISP update...")
-                self.download_gisp_file()
-                
-            # Обновляем файл каждые 7 дней
-            schedule.every(7).days.do(update_job)
-            
-            # Запускаем планировщик в отдельном потоке
-            def run_scheduler():
-                while True:
-                    try:
-                        schedule.run_pending()
-                        time.sleep(3600)  # Проверяем раз в час
-                    except Exception as e:
-                        logger.error(f"Scheduler error: {e}")
-                        time.sleep(3600)  # В случае ошибки ждем час и пробуем снова
+            if not rebuild and indexes_match(snapshot, index_dir):
+                logger.info("Loading persisted search indexes...")
+                search_index = load_indexes(snapshot, index_dir)
+            else:
+                search_index = build_indexes(snapshot, index_dir)
             
-            scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-            scheduler_thread.start()
-            logger.info("Background updates scheduled")
+            logger.info(f"Search indexes updated successfully, rows: {snapshot.num_rows}")
             
         except Exception as e:
-            logger.error(f"Failed to start background updates: {e}")
+            logger.error(f"Error updating search indexes: {e}", exc_info=True)
+            # Работаем без индексов в случае ошибки
+            search_index = {'okpd2': None, 'name': None}
+        return search_index
+
+    async def _gisp_rows(self, okpd2: Optional[str], name: Optional[str]) -> ResultRows:
+        """Номера строк ГИСП в активном поколении; ошибки пробрасываются"""
+        generation = self.generation
+        if generation is None:
+            generation = await self.executor.run_io(self._open_current_generation, GENERATION_OPEN_WAIT)
+            if generation is None:
+                raise SourceNotReady("База ГИСП загружается" if self.gisp_loading else "База ГИСП еще не загружена")
+        positions, corrections = await self._gisp_match(generation, okpd2, name)
+        return ResultRows('ГИСП', generation, positions, corrections=corrections)
 
-    def download_gisp_file(self):
-        """Скачивает файл ГИСП без отображения статуса"""
+    async def _gisp_match(self, generation: Generation, okpd2: Optional[str],
+                          name: Optional[str]) -> Tuple[np.ndarray, Optional[Dict[str, str]]]:
+        """Результат _match_positions через кэш, ключ - (поколение, нормализованный запрос)"""
+        okpd2_key, name_key = normalize_query(okpd2, name)
+
+        async def load() -> tuple:
+            with metrics.timer('search_seconds', stage='gisp_index'):
+                if self.search_pool is not None:
+                    return await self.search_pool.match(generation, okpd2_key, name_key)
+                return await self.executor.run_io(self._match_positions, generation, okpd2_key, name_key)
+
+        return await self.gisp_cache.get_or_load((generation.id, okpd2_key, name_key), load)
+
+    def _match_positions(self, generation: Generation, okpd2: Optional[str] = None,
+                         name: Optional[str] = None) -> Tuple[np.ndarray, Optional[Dict[str, str]]]:
+        """Номера строк по запросу и исправления запроса (см. gisp_search.match_positions)"""
+        return match_positions(generation, okpd2, name)
+
+    def download_gisp_file(self) -> int:
+        """Скачивает файл ГИСП без отображения статуса и возвращает число строк в базе"""
         try:
             logger.info("Starting GISP file download (no status)...")
-            temp_file = "data/temp_gisp.xlsx"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': '*/*',
-                'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Referer': 'https://gisp.gov.ru/',
-            }
-            
-            self.GISP_EXCEL_URL = "https://gisp.gov.ru/pp719v2/mptapp/view/dl/production_res_valid_only/"
-            
-            response = requests.get(self.GISP_EXCEL_URL, headers=headers, verify=True, timeout=60)
-            response.raise_for_status()
+            temp_file = self.TEMP_GISP_FILE
             
-            with open(temp_file, 'wb') as f:
-                f.write(response.content)
+            download = self._download_registry()
+            self.last_download = download
+            if download.not_modified:
+                logger.info("GISP registry not modified, update skipped")
+                self._finish_unchanged_download(download)
+                generation = self.generation or self._open_current_generation()
+                return generation.snapshot.num_rows if generation is not None else 0
             
             # Проверяем, что файл действительно Excel
             if os.path.getsize(temp_file) < 100:
@@ -547,161 +737,51 @@ class ProductScraper:
             
             logger.info("Processing GISP file...")
             
-            # Пробуем прочитать первые строки для проверки структуры
-            try:
-                test_df = pd.read_excel(
-                    temp_file,
-                    nrows=5,
-                    skiprows=2,
-                    engine='openpyxl'
-                )
-                logger.info(f"Excel test read successful, columns: {list(test_df.columns)}")
-                
-                # Оцениваем общее количество строк для отображения прогресса
-                file_size = os.path.getsize(temp_file)
-                estimated_rows = int((file_size / (1024 * 1024)) * 5000)
-                logger.info(f"Estimated total rows: ~{estimated_rows} (based on file size {file_size/1024/1024:.2f} MB)")
-                
-            except Exception as e:
-                logger.error(f"Excel test read failed: {str(e)}", exc_info=True)
-                raise Exception(f"Не удалось прочитать Excel файл: {str(e)}")
-            
-            # Оптимизированная обработка без статуса
-            chunk_size = 5000
-            first_chunk = True
-            total_rows = 0
-            last_progress_time = time.time()
             start_time = time.time()
+            ingest_started = time.perf_counter()
+            generation_id = self.generations.create()
+            progress = self.executor.shared_dict()
+            # Разбор идет в пуле процессов, чтобы не занимать GIL процесса бота
+            ingest = self.executor.submit_cpu(
+                ingest_registry, temp_file, self.generations.snapshot_path(generation_id),
+                self.chunk_size, progress
+            )
             
-            with open(self.GISP_FILE_PATH, 'w', encoding='utf-8-sig', newline='') as f:
-                try:
-                    for chunk in pd.read_excel(
-                        temp_file,
-                        usecols=[0, 1, 6, 8, 9, 11, 12, 13, 14],
-                        skiprows=2,
-                        names=[
-                            'Предприятие', 'ИНН', 'Реестровый номер', 
-                            'Дата внесения в реестр', 'Срок действия',
-                            'Наименование продукции', 'ОКПД2', 'ТН ВЭД', 'Изготовлена по'
-                        ],
-                        engine='openpyxl',
-                        dtype={
-                            'ИНН': str,
-                            'Реестровый номер': str,
-                            'ОКПД2': str,
-                            'ТН ВЭД': str
-                        },
-                        chunksize=chunk_size
-                    ):
-                        # Очистка памяти
-                        import gc
-                        gc.collect()
-                        
-                        # Обработка чанка
-                        chunk = chunk.dropna(how='all')
-                        
-                        # Логируем информацию о первом чанке
-                        if first_chunk:
-                            logger.info(f"First chunk columns: {list(chunk.columns)}")
-                            logger.info(f"First chunk shape: {chunk.shape}")
-                        
-                        # Запись в CSV
-                        if first_chunk:
-                            chunk.to_csv(f, index=False)
-                            first_chunk = False
-                        else:
-                            chunk.to_csv(f, index=False, header=False)
-                        
-                        total_rows += len(chunk)
-                        
-                        # Отображаем прогресс каждые 5 секунд
-                        current_time = time.time()
-                        if current_time - last_progress_time > 5:
-                            elapsed_time = current_time - start_time
-                            rows_per_second = total_rows / elapsed_time if elapsed_time > 0 else 0
-                            
-                            # Оценка оставшегося времени
-                            if rows_per_second > 0 and estimated_rows > total_rows:
-                                remaining_rows = estimated_rows - total_rows
-                                remaining_time = remaining_rows / rows_per_second
-                                remaining_minutes = int(remaining_time / 60)
-                                remaining_seconds = int(remaining_time % 60)
-                                
-                                progress = min(100, int((total_rows / estimated_rows) * 100))
-                                
-                                logger.info(
-                                    f"Progress: {progress}% - Processed {total_rows:,} rows "
-                                    f"({rows_per_second:.1f} rows/sec) - "
-                                    f"Est. remaining: {remaining_minutes}m {remaining_seconds}s"
-                                )
-                            else:
-                                logger.info(f"Processed {total_rows:,} rows ({rows_per_second:.1f} rows/sec)")
-                                
-                            last_progress_time = current_time
-                        
-                        # Очистка памяти
-                        del chunk
-                        gc.collect()
-                except Exception as e:
-                    logger.error(f"Excel processing failed: {str(e)}", exc_info=True)
-                    # Пробуем альтернативный подход без указания конкретных колонок
-                    f.seek(0)  # Возвращаемся в начало файла
-                    first_chunk = True
-                    total_rows = 0
-                    
-                    # Читаем весь файл и сохраняем частями
-                    df = pd.read_excel(
-                        temp_file,
-                        skiprows=2,
-                        engine='openpyxl',
-                        dtype=str
+            # Отображаем прогресс каждые 5 секунд
+            while not concurrent.futures.wait([ingest], timeout=5).done:
+                total_rows = progress.get('rows', 0)
+                expected_rows = progress.get('expected')
+                elapsed_time = time.time() - start_time
+                rows_per_second = total_rows / elapsed_time if elapsed_time > 0 else 0
+                
+                if expected_rows:
+                    progress_percent = min(100, int((total_rows / expected_rows) * 100))
+                    logger.info(
+                        f"Progress: {progress_percent}% - Processed {total_rows:,} of {expected_rows:,} rows "
+                        f"({rows_per_second:.1f} rows/sec)"
                     )
-                    
-                    total_rows = len(df)
-                    chunk_size = 5000
-                    
-                    for i in range(0, total_rows, chunk_size):
-                        chunk = df.iloc[i:i+chunk_size]
-                        mode = 'w' if i == 0 else 'a'
-                        chunk.to_csv(
-                            self.GISP_FILE_PATH,
-                            mode=mode,
-                            index=False,
-                            header=(i == 0),
-                            encoding='utf-8-sig'
-                        )
-                        
-                        # Очистка памяти
-                        del chunk
-                        gc.collect()
+                else:
+                    logger.info(f"Processed {total_rows:,} rows ({rows_per_second:.1f} rows/sec)")
+            total_rows = ingest.result()
+            self._record_ingest(total_rows, time.perf_counter() - ingest_started)
             
-            # Проверяем, что CSV файл не пустой
-            if os.path.getsize(self.GISP_FILE_PATH) == 0:
-                raise Exception("CSV файл создан, но имеет нулевой размер")
+            # Проверяем, что снимок не пустой
+            if os.path.getsize(self.generations.snapshot_path(generation_id)) == 0:
+                raise Exception("Снимок ГИСП создан, но имеет нулевой размер")
             
             # Удаляем временный файл
             if os.path.exists(temp_file):
                 os.remove(temp_file)
                 logger.info("Temporary Excel file removed")
             
-            # Обновляем индексы
-            self._update_search_index_by_chunks()
-            
-            # Загружаем небольшую часть данных в кэш
-            self.df_cache = pd.read_csv(
-                self.GISP_FILE_PATH, 
-                encoding='utf-8-sig',
-                dtype={
-                    'ИНН': str,
-                    'Реестровый номер': str,
-                    'ОКПД2': str,
-                    'ТН ВЭД': str
-                },
-                nrows=1000
-            )
+            # Собираем индексы нового поколения и публикуем его
+            self._publish_generation(generation_id, download)
             
+            self.downloader.mark_processed(self.GISP_EXCEL_URL, download)
             self.last_update = datetime.now()
             logger.info(f"GISP file updated successfully, total rows: {total_rows}")
+            return total_rows
             
         except Exception as e:
             logger.error(f"GISP file download failed: {e}", exc_info=True)
+            raise
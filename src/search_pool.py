@@ -0,0 +1,137 @@
+"""Пул процессов для проверки наименований в поколении ГИСП.
+
+Проверка подстрок держит GIL, поэтому потоки бота выполняют ее фактически
+по одному. Кандидатов по запросу один раз находит процесс бота (по
+индексам поколения); если их больше shard_rows, проверка делится на
+части по числу процессов пула, и каждый процесс получает только свою
+часть кандидатов. Снимок процесс пула открывает сам через memory map:
+данные не копируются, все процессы читают одни и те же страницы кэша ОС.
+Небольшие проверки, поиск только по ОКПД2 и нечеткий поиск выполняются в
+пуле потоков бота, как без SearchPool: передача в процесс стоит дороже.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.executor import BlockingExecutor
+from src.generations import Generation
+from src.gisp_search import fuzzy_positions, match_positions, query_candidates, verify_names
+from src.gisp_store import GispSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Сколько снимков держит открытыми процесс пула (активный и прежний при смене поколения)
+WORKER_GENERATIONS = 2
+# С какого числа кандидатов проверка передается в процессы пула
+SHARD_ROWS = 100000
+
+# Снимки, открытые в процессе пула: путь -> Generation без индексов
+_generations = OrderedDict()
+
+Match = Tuple[np.ndarray, Optional[Dict[str, str]]]
+
+
+def _open_generation(snapshot_path: str) -> Generation:
+    generation = _generations.get(snapshot_path)
+    if generation is not None:
+        _generations.move_to_end(snapshot_path)
+        return generation
+    # Для проверки наименований индексы не нужны
+    generation_id = os.path.basename(os.path.dirname(snapshot_path))
+    generation = _generations[snapshot_path] = Generation(generation_id, GispSnapshot.open(snapshot_path), {}, {})
+    while len(_generations) > WORKER_GENERATIONS:
+        _generations.popitem(last=False)
+    return generation
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _worker_verify(snapshot_path: str, name_lower: str, candidates: Optional[np.ndarray],
+                   start: int, stop: int) -> np.ndarray:
+    """Проверка части кандидатов; при полном просмотре candidates=None и
+    проверяются строки снимка с start по stop"""
+    if candidates is None:
+        candidates = np.arange(start, stop)
+    return verify_names(_open_generation(snapshot_path), name_lower, candidates).astype(np.int32)
+
+
+def _verify_or_fuzzy(generation: Generation, okpd2: Optional[str], name: str,
+                     candidates: Optional[np.ndarray]) -> Match:
+    """Проверка кандидатов в процессе бота; нечеткий поиск, если ничего не найдено"""
+    positions = verify_names(generation, name.lower(), candidates)
+    if len(positions) == 0:
+        return _fuzzy(generation, okpd2, name)
+    return positions.astype(np.int32), None
+
+
+def _fuzzy(generation: Generation, okpd2: Optional[str], name: str) -> Match:
+    positions, corrections = fuzzy_positions(generation, okpd2, name)
+    return np.asarray(positions, dtype=np.int32), corrections
+
+
+class SearchPool:
+    """Поиск номеров строк ГИСП с проверкой больших наборов кандидатов в
+    пуле процессов (см. описание модуля).
+
+    Результат тот же, что у gisp_search.match_positions.
+    """
+
+    def __init__(self, workers: int, executor: BlockingExecutor, shard_rows: int = SHARD_ROWS):
+        self.workers = max(workers, 1)
+        self.executor = executor
+        self.shard_rows = shard_rows
+        self._context = multiprocessing.get_context('spawn')
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                logger.info(f"Starting search process pool with {self.workers} workers")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context)
+            return self._pool
+
+    def start(self):
+        """Запускает процессы пула заранее, чтобы первые запросы не ждали их запуска (блокирует)"""
+        concurrent.futures.wait([self.pool.submit(_worker_ready) for _ in range(self.workers)])
+
+    async def _run(self, func, *args):
+        return await asyncio.wrap_future(self.pool.submit(func, *args))
+
+    async def match(self, generation: Generation, okpd2: Optional[str] = None,
+                    name: Optional[str] = None) -> Match:
+        """Номера строк поколения по запросу и исправления запроса"""
+        if not name:
+            return await self.executor.run_io(match_positions, generation, okpd2, name)
+        candidates = await self.executor.run_io(query_candidates, generation, okpd2, name)
+        total = generation.snapshot.num_rows if candidates is None else len(candidates)
+        if total <= self.shard_rows:
+            return await self.executor.run_io(_verify_or_fuzzy, generation, okpd2, name, candidates)
+        shards = max(1, min(self.workers, -(-total // self.shard_rows)))
+        bounds = [(total * shard // shards, total * (shard + 1) // shards) for shard in range(shards)]
+        parts = await asyncio.gather(*[
+            self._run(_worker_verify, generation.snapshot.path, name.lower(),
+                      None if candidates is None else candidates[start:stop], start, stop)
+            for start, stop in bounds
+        ])
+        positions = np.concatenate(parts)
+        if len(positions) == 0:
+            return await self.executor.run_io(_fuzzy, generation, okpd2, name)
+        return positions, None
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
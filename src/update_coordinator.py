@@ -0,0 +1,195 @@
+"""Обновления данных бота (реестр ГИСП, зеркало ЕАЭС) по расписанию и по команде.
+
+Запуски планируются в JobQueue бота (run_once на время следующего запуска)
+и выполняются в его цикле событий. Обновления идут по одному: повторный
+запрос той же задачи, пока она выполняется, присоединяется к текущему
+запуску и получает его результат. Состояние задач (время последнего
+успешного запуска, число неудач подряд, время следующего запуска)
+сохраняется в JSON файл, поэтому после перезапуска бота обновление не
+пропускается и не повторяется. Неудачный запуск повторяется с
+экспоненциальной задержкой со случайным разбросом.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+UpdateFunc = Callable[[], Awaitable]
+
+
+class UpdateTask:
+    """Периодическая задача обновления.
+
+    data_time возвращает время, на которое актуальны данные на диске, или
+    None, если данных нет - тогда задача запускается сразу.
+    """
+
+    def __init__(self, name: str, func: UpdateFunc, interval: timedelta,
+                 data_time: Optional[Callable[[], Optional[datetime]]] = None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.data_time = data_time
+
+
+class UpdateCoordinator:
+    """Единая точка запуска обновлений: расписание, single-flight и повторы"""
+
+    def __init__(self, state_path: str, retry_base: float = 60, retry_max: float = 6 * 3600,
+                 jitter: float = 0.2):
+        self.state_path = state_path
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.jitter = jitter
+        self.tasks = {}
+        self.job_queue = None
+        self._running = {}
+        # Обновления разных задач тоже не идут одновременно: на сервере с
+        # 1 GB памяти разбор реестра и слияние зеркала не помещаются вместе
+        self._lock = asyncio.Lock()
+        self.state = self._load_state()
+
+    def add(self, name: str, func: UpdateFunc, interval: timedelta,
+            data_time: Optional[Callable[[], Optional[datetime]]] = None):
+        self.tasks[name] = UpdateTask(name, func, interval, data_time)
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read update state {self.state_path}: {e}")
+            return {}
+
+    def _save_state(self):
+        """Записывает состояние атомарно: после сбоя остается прежняя или новая версия"""
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def retry_delay(self, failures: int) -> float:
+        """Задержка перед повтором после failures неудач подряд, секунд"""
+        delay = min(self.retry_base * 2 ** max(failures - 1, 0), self.retry_max)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def next_run(self, name: str) -> datetime:
+        """Время следующего запуска задачи по сохраненному состоянию"""
+        task = self.tasks[name]
+        now = datetime.now()
+        if task.data_time is not None:
+            data_time = task.data_time()
+            if data_time is None:
+                return now
+        else:
+            data_time = None
+        state = self.state.get(name, {})
+        if state.get('next_run'):
+            return datetime.fromisoformat(state['next_run'])
+        last_success = state.get('last_success')
+        if last_success:
+            return datetime.fromisoformat(last_success) + task.interval
+        if data_time is not None:
+            return data_time + task.interval
+        return now
+
+    def start(self, job_queue):
+        """Планирует задачи в JobQueue бота.
+
+        Запуск, прерванный остановкой процесса (в состоянии остался
+        running_since), считается неудачным и повторяется после задержки.
+        """
+        self.job_queue = job_queue
+        for name in self.tasks:
+            state = self.state.get(name, {})
+            if state.pop('running_since', None) is not None:
+                state['failures'] = state.get('failures', 0) + 1
+                state['last_error'] = 'Обновление прервано перезапуском бота'
+                state['next_run'] = (datetime.now() + timedelta(seconds=self.retry_delay(state['failures']))) \
+                    .isoformat(timespec='seconds')
+                self.state[name] = state
+                logger.warning(f"Update {name} was interrupted by restart, retry at {state['next_run']}")
+                self._save_state()
+            self._schedule(name, self.next_run(name))
+
+    def _schedule(self, name: str, when: datetime):
+        if self.job_queue is None:
+            return
+        for job in self.job_queue.get_jobs_by_name(name):
+            job.schedule_removal()
+        delay = max((when - datetime.now()).total_seconds(), 0)
+        self.job_queue.run_once(self._scheduled_run, delay, data=name, name=name)
+        logger.info(f"Update {name} scheduled at {when.isoformat(timespec='seconds')}")
+
+    async def _scheduled_run(self, context):
+        name = context.job.data
+        try:
+            await self.run(name, trigger='schedule')
+        except Exception as e:
+            # Ошибка записана и повтор запланирован в _execute
+            logger.debug(f"Scheduled update {name} failed: {e}")
+
+    def is_running(self, name: str) -> bool:
+        return name in self._running
+
+    async def run(self, name: str, func: Optional[UpdateFunc] = None, trigger: str = 'manual'):
+        """Запускает задачу name или присоединяется к уже идущему запуску.
+
+        func заменяет функцию задачи для этого запуска (например, ручное
+        обновление с выводом прогресса). Ошибка запуска пробрасывается
+        всем, кто его ждет.
+        """
+        running = self._running.get(name)
+        if running is None:
+            running = asyncio.ensure_future(self._execute(name, func or self.tasks[name].func, trigger))
+            self._running[name] = running
+            running.add_done_callback(lambda _: self._running.pop(name, None))
+        else:
+            logger.info(f"Update {name} is already running, {trigger} request attached")
+        # Отмена ожидающего (например, обработчика команды) не прерывает обновление
+        return await asyncio.shield(running)
+
+    async def _execute(self, name: str, func: UpdateFunc, trigger: str):
+        async with self._lock:
+            task = self.tasks[name]
+            state = self.state.setdefault(name, {})
+            started_at = datetime.now()
+            state['running_since'] = started_at.isoformat(timespec='seconds')
+            self._save_state()
+            logger.info(f"Update {name} started ({trigger})")
+            started = time.perf_counter()
+            status = 'error'
+            # Если запуск прервется (остановка бота), он повторится после задержки
+            next_run = datetime.now() + timedelta(seconds=self.retry_delay(state.get('failures', 0) + 1))
+            try:
+                result = await func()
+                status = 'ok'
+                state.update(last_success=datetime.now().isoformat(timespec='seconds'), failures=0, last_error=None)
+                next_run = datetime.now() + task.interval
+                return result
+            except Exception as e:
+                state['failures'] = state.get('failures', 0) + 1
+                state['last_error'] = str(e)[:500]
+                next_run = datetime.now() + timedelta(seconds=self.retry_delay(state['failures']))
+                logger.error(f"Update {name} failed ({state['failures']} in a row), retry at {next_run}: {e}")
+                raise
+            finally:
+                seconds = time.perf_counter() - started
+                metrics.observe('update_seconds', seconds, task=name)
+                metrics.inc('update_runs_total', task=name, status=status)
+                state.pop('running_since', None)
+                state['last_attempt'] = started_at.isoformat(timespec='seconds')
+                state['next_run'] = next_run.isoformat(timespec='seconds')
+                self._save_state()
+                self._schedule(name, next_run)
@@ -0,0 +1,226 @@
+import logging
+import re
+import zipfile
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+ROW_TAG = f'{{{MAIN_NS}}}row'
+CELL_TAG = f'{{{MAIN_NS}}}c'
+VALUE_TAG = f'{{{MAIN_NS}}}v'
+TEXT_TAG = f'{{{MAIN_NS}}}t'
+SHARED_ITEM_TAG = f'{{{MAIN_NS}}}si'
+DIMENSION_TAG = f'{{{MAIN_NS}}}dimension'
+
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+_CELL_REF_RE = re.compile(r'([A-Z]+)(\d+)')
+
+
+class SharedStrings:
+    """Компактная таблица общих строк: один буфер UTF-8 и массив смещений"""
+
+    def __init__(self):
+        self._data = bytearray()
+        self._offsets = array('q', [0])
+
+    def append(self, value: str):
+        self._data += value.encode('utf-8')
+        self._offsets.append(len(self._data))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self._data[self._offsets[index]:self._offsets[index + 1]].decode('utf-8')
+
+
+def column_index(letters: str) -> int:
+    """Переводит буквенное обозначение колонки Excel (A, B, ..., AA) в индекс с нуля"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - 64)
+    return index - 1
+
+
+def excel_serial_to_date(value: str) -> str:
+    """Переводит числовую дату Excel в строку ISO формата"""
+    try:
+        return (EXCEL_EPOCH + timedelta(days=float(value))).strftime('%Y-%m-%d')
+    except (ValueError, OverflowError):
+        return value
+
+
+class XlsxRowReader:
+    """Потоковое чтение строк первого листа xlsx файла без загрузки книги целиком"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._column_cache = {}
+        self._date_cache = {}
+        self._zip = zipfile.ZipFile(path)
+        self.sheet_path = self._first_sheet_path()
+        self.shared_strings = self._load_shared_strings()
+        self.last_row = self._read_dimension()
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _first_sheet_path(self) -> str:
+        """Находит путь к XML первого листа через workbook.xml и его связи"""
+        try:
+            workbook = etree.fromstring(self._zip.read('xl/workbook.xml'))
+            sheet = workbook.find(f'{{{MAIN_NS}}}sheets/{{{MAIN_NS}}}sheet')
+            rel_id = sheet.get(f'{{{REL_NS}}}id')
+            rels = etree.fromstring(self._zip.read('xl/_rels/workbook.xml.rels'))
+            for rel in rels.iter(f'{{{PACKAGE_REL_NS}}}Relationship'):
+                if rel.get('Id') == rel_id:
+                    target = rel.get('Target').lstrip('/')
+                    return target if target.startswith('xl/') else f'xl/{target}'
+        except (KeyError, AttributeError) as e:
+            logger.warning(f"Failed to resolve first sheet from workbook: {e}")
+        return 'xl/worksheets/sheet1.xml'
+
+    def _load_shared_strings(self) -> SharedStrings:
+        """Инкрементально разбирает таблицу общих строк"""
+        strings = SharedStrings()
+        if 'xl/sharedStrings.xml' not in self._zip.namelist():
+            return strings
+        with self._zip.open('xl/sharedStrings.xml') as f:
+            for _, item in etree.iterparse(f, tag=SHARED_ITEM_TAG):
+                strings.append(''.join(text.text or '' for text in item.iter(TEXT_TAG)))
+                item.clear()
+                while item.getprevious() is not None:
+                    del item.getparent()[0]
+        logger.info(f"Loaded {len(strings)} shared strings")
+        return strings
+
+    def _read_dimension(self) -> Optional[int]:
+        """Читает номер последней строки из тега dimension в начале листа"""
+        with self._zip.open(self.sheet_path) as f:
+            for _, elem in etree.iterparse(f, events=('start',)):
+                if elem.tag == DIMENSION_TAG:
+                    match = _CELL_REF_RE.search(elem.get('ref', '').split(':')[-1])
+                    return int(match.group(2)) if match else None
+                if elem.tag == ROW_TAG:
+                    return None
+        return None
+
+    def count_data_rows(self, skiprows: int) -> Optional[int]:
+        if self.last_row is None:
+            return None
+        return max(self.last_row - skiprows, 0)
+
+    def _cell_value(self, cell) -> Optional[str]:
+        cell_type = cell.get('t')
+        if cell_type == 'inlineStr':
+            return ''.join(text.text or '' for text in cell.iter(TEXT_TAG))
+        value = None
+        for child in cell:
+            if child.tag == VALUE_TAG:
+                value = child.text
+                break
+        if value is None:
+            return None
+        if cell_type == 's':
+            return self.shared_strings[int(value)]
+        if cell_type == 'b':
+            return 'TRUE' if value == '1' else 'FALSE'
+        return value
+
+    def _iter_cells(self, row) -> Iterator:
+        """Возвращает пары (индекс колонки, ячейка), учитывая ячейки без атрибута r"""
+        column = -1
+        for cell in row:
+            ref = cell.get('r')
+            column = self._ref_column(ref) if ref else column + 1
+            yield column, cell
+
+    def _ref_column(self, ref: str) -> int:
+        """Индекс колонки по адресу ячейки (B12 -> 1) с кэшем по буквенной части"""
+        letters = ref.rstrip('0123456789')
+        column = self._column_cache.get(letters)
+        if column is None:
+            column = self._column_cache[letters] = column_index(letters)
+        return column
+
+    def _iter_sheet_rows(self) -> Iterator:
+        """Возвращает пары (номер строки, элемент строки), освобождая разобранные строки"""
+        row_number = 0
+        with self._zip.open(self.sheet_path) as f:
+            for _, row in etree.iterparse(f, tag=ROW_TAG):
+                row_ref = row.get('r')
+                row_number = int(row_ref) if row_ref else row_number + 1
+                yield row_number, row
+                # Освобождаем уже разобранные строки, чтобы память не росла
+                row.clear()
+                while row.getprevious() is not None:
+                    del row.getparent()[0]
+
+    def _serial_to_date(self, value: str) -> str:
+        result = self._date_cache.get(value)
+        if result is None:
+            result = self._date_cache[value] = excel_serial_to_date(value)
+        return result
+
+    def iter_rows(self, usecols: Sequence[int], skiprows: int = 0,
+                  date_columns: Sequence[int] = ()) -> Iterator[List[Optional[str]]]:
+        """Возвращает значения колонок usecols для каждой непустой строки после skiprows"""
+        positions = {column: i for i, column in enumerate(usecols)}
+        date_positions = {positions[column] for column in date_columns}
+        width = len(usecols)
+        for row_number, row in self._iter_sheet_rows():
+            if row_number <= skiprows:
+                continue
+            values = [None] * width
+            for column, cell in self._iter_cells(row):
+                position = positions.get(column)
+                if position is None:
+                    continue
+                value = self._cell_value(cell)
+                if value is not None and position in date_positions and cell.get('t') in (None, 'n'):
+                    value = self._serial_to_date(value)
+                values[position] = value
+            if any(value is not None and value != '' for value in values):
+                yield values
+
+    def iter_batches(self, usecols: Sequence[int], skiprows: int = 0, batch_size: int = 10000,
+                     date_columns: Sequence[int] = ()) -> Iterator[List[List[Optional[str]]]]:
+        """Группирует строки в батчи по колонкам для записи в снимок"""
+        columns = [[] for _ in usecols]
+        for values in self.iter_rows(usecols, skiprows, date_columns):
+            for column, value in zip(columns, values):
+                column.append(value)
+            if len(columns[0]) >= batch_size:
+                yield columns
+                columns = [[] for _ in usecols]
+        if columns[0]:
+            yield columns
+
+    def read_row(self, row_number: int) -> Dict[int, str]:
+        """Читает одну строку листа (например, заголовок) для проверки структуры"""
+        for current_number, row in self._iter_sheet_rows():
+            if current_number == row_number:
+                return {
+                    column: value
+                    for column, value in ((column, self._cell_value(cell)) for column, cell in self._iter_cells(row))
+                    if value is not None
+                }
+            if current_number > row_number:
+                break
+        return {}
@@ -0,0 +1,71 @@
+"""Условные запросы FileDownloader при обновлении реестра ГИСП"""
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.downloader import DownloadResult
+from src.scraper import ProductScraper
+
+BODY = b'registry' * 100
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    """Отдает BODY с ETag сервера; на совпавший If-None-Match отвечает 304"""
+
+    etag = '"v2"'
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(BODY)))
+        self.send_header('ETag', self.etag)
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    RegistryHandler.requests = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), RegistryHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}/registry.xlsx'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_checksum_equal_download_stores_new_validators(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scraper = ProductScraper()
+    scraper.GISP_EXCEL_URL = server
+    # Этот файл уже обработан, но тогда у сервера был другой ETag
+    scraper.downloader.mark_processed(server, DownloadResult(
+        path=scraper.TEMP_GISP_FILE, not_modified=False, size=len(BODY),
+        sha256=hashlib.sha256(BODY).hexdigest(), etag='"v1"'
+    ))
+    # Поколения нет, поэтому первый запрос идет без условий и скачивает файл;
+    # его нужно сделать условным, как при существующей базе
+    monkeypatch.setattr(scraper.generations, 'current_id', lambda: 'existing')
+    monkeypatch.setattr(scraper, '_open_current_generation', lambda: None)
+    try:
+        scraper.download_gisp_file()
+        assert scraper.last_download.not_modified
+        assert RegistryHandler.requests[-1].get('If-None-Match') == '"v1"'
+        assert not os.path.exists(scraper.TEMP_GISP_FILE)
+
+        scraper.download_gisp_file()
+        assert RegistryHandler.requests[-1].get('If-None-Match') == '"v2"'
+        assert scraper.last_download.not_modified
+        assert scraper.last_download.sha256 == hashlib.sha256(BODY).hexdigest()
+    finally:
+        scraper.executor.shutdown()
@@ -0,0 +1,83 @@
+"""Синхронизация зеркала ЕАЭС: страницы пишутся на диск, индексы переносятся дельтой"""
+import asyncio
+import os
+import tempfile
+
+import numpy as np
+
+import src.scraper as scraper_module
+from src.generations import Generation
+from src.gisp_build import build_indexes
+from src.gisp_search import match_positions
+from src.scraper import ProductScraper
+
+PAGE_SIZE = 1000
+
+
+def item(i: int, name: str, day: int) -> dict:
+    return {
+        '_id': {'$oid': f'id{i}'},
+        'name': name,
+        'okpd2': {'code': f'26.{i % 50:02d}.11'},
+        'manufacturer': {'name': f'Завод {i % 30}'},
+        'publishdate': {'$date': f'2024-01-{day:02d}T00:00:00Z'},
+    }
+
+
+class FakeClient:
+    """Отдает очередную выгрузку страницами, как EaeuClient.pages"""
+
+    syncs = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def pages(self, query_filter=None):
+        items = self.syncs.pop(0)
+        for start in range(0, len(items), PAGE_SIZE):
+            yield items[start:start + PAGE_SIZE]
+
+    async def close(self):
+        pass
+
+
+def test_incremental_sync_matches_full_build(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scraper_module, 'EaeuClient', FakeClient)
+    FakeClient.syncs = [
+        [item(i, f'Насос модель {i}', 1 + i % 20) for i in range(5000)],
+        [item(5000 + i, f'Компрессор новый {i}', 25) for i in range(300)]
+        + [item(i, f'Вентилятор замена {i}', 26) for i in range(50)]
+        + [item(6000, 'Дубль первый', 27), item(6000, 'Дубль второй', 27)],
+        [],
+    ]
+    scraper = ProductScraper()
+    try:
+        assert asyncio.run(scraper.sync_eaeu_mirror())['mode'] == 'full'
+        summary = asyncio.run(scraper.sync_eaeu_mirror())
+        assert summary['mode'] == 'delta'
+        assert summary['new_items'] == 352
+        assert summary['replaced'] == 51
+
+        mirror = scraper.eaeu_mirror
+        generation = mirror.generation
+        assert generation.snapshot.num_rows == 5301
+        assert generation.manifest['last_publishdate'] == {'$date': '2024-01-27T00:00:00Z'}
+        assert not os.path.exists(mirror.items_path)
+
+        full = Generation('full', generation.snapshot, build_indexes(generation.snapshot, tempfile.mkdtemp(dir=tmp_path)), {})
+        for okpd2, name in [(None, 'насос'), (None, 'вентилятор замена 3'), ('26.1', 'компрессор'),
+                            (None, 'насо'), (None, 'дубль')]:
+            positions, corrections = match_positions(generation, okpd2, name)
+            expected_positions, expected_corrections = match_positions(full, okpd2, name)
+            assert np.array_equal(positions, expected_positions)
+            assert corrections == expected_corrections
+        # Замененные позиции отдают новое наименование
+        records = generation.snapshot.records(match_positions(generation, None, 'замена 3')[0], 'ЕАЭС')
+        assert records and all(record['name'].startswith('Вентилятор') for record in records)
+
+        # Пустая выгрузка не создает поколение
+        asyncio.run(scraper.sync_eaeu_mirror())
+        assert mirror.generation.id == generation.id
+    finally:
+        scraper.executor.shutdown()
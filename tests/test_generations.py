@@ -0,0 +1,40 @@
+"""Переключение поиска ГИСП между поколениями"""
+from benchmarks.synthetic import make_registry_frame
+from src.gisp_build import build_generation_indexes
+from src.gisp_store import SnapshotWriter
+from src.scraper import ProductScraper
+
+
+def build_generation(scraper: ProductScraper, rows: int) -> tuple:
+    generation_id = scraper.generations.create()
+    snapshot_path = scraper.generations.snapshot_path(generation_id)
+    with SnapshotWriter(snapshot_path) as writer:
+        writer.write_frame(make_registry_frame(rows))
+    return generation_id, build_generation_indexes(snapshot_path, scraper.generations.index_dir(generation_id))
+
+
+def test_older_generation_does_not_replace_newer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scraper = ProductScraper()
+    try:
+        older_id, older_summary = build_generation(scraper, 100)
+        newer_id, newer_summary = build_generation(scraper, 200)
+        assert older_id < newer_id
+
+        scraper._activate_generation(older_id, older_summary)
+        scraper._activate_generation(newer_id, newer_summary)
+        assert scraper.generation.id == newer_id
+
+        # Запоздавшая активация более старого поколения (например, из
+        # параллельного обновления) не заменяет новое
+        scraper._activate_generation(older_id, older_summary)
+        assert scraper.generation.id == newer_id
+        assert scraper.generation.snapshot.num_rows == 200
+        assert scraper.generations.current_id() == newer_id
+
+        # Откат явно переключает на более старое поколение
+        assert scraper.rollback_generation(older_id).id == older_id
+        assert scraper.generation.id == older_id
+        assert scraper.generations.current_id() == older_id
+    finally:
+        scraper.executor.shutdown()
@@ -0,0 +1,41 @@
+"""Перенос индексов наименований на новое поколение (apply_delta)"""
+from benchmarks.synthetic import make_registry_frame
+from src.gisp_build import build_generation_indexes, load_indexes
+from src.gisp_store import GispSnapshot, SnapshotWriter
+
+WORD = 'центрифуга'
+
+
+def write_snapshot(path: str, frame):
+    with SnapshotWriter(path) as writer:
+        writer.write_frame(frame)
+    return path
+
+
+def test_delta_drops_words_of_deleted_rows(tmp_path):
+    frame = make_registry_frame(200)
+    frame.loc[0, 'Наименование продукции'] = 'Центрифуга лабораторная'
+    old_snapshot = write_snapshot(str(tmp_path / 'old.arrow'), frame)
+    old_index_dir = str(tmp_path / 'old_index')
+    build_generation_indexes(old_snapshot, old_index_dir)
+    assert WORD in load_indexes(GispSnapshot.open(old_snapshot), old_index_dir)['name'].tokens()
+
+    # В новом поколении нет единственной строки со словом
+    new_snapshot = write_snapshot(str(tmp_path / 'new.arrow'), frame.iloc[1:])
+    new_index_dir = str(tmp_path / 'new_index')
+    summary = build_generation_indexes(new_snapshot, new_index_dir, old_snapshot, old_index_dir)
+    assert summary['mode'] == 'delta'
+
+    indexes = load_indexes(GispSnapshot.open(new_snapshot), new_index_dir)
+    name_index, fuzzy_index = indexes['name'], indexes['fuzzy']
+    assert WORD not in name_index.tokens()
+    assert 'лабораторная' not in name_index.tokens()
+    assert len(name_index.candidates(WORD)) == 0
+    # Ни словоформа, ни опечатка не исправляются на слово без строк
+    for query in (WORD, 'центрифуги', 'цетрифуга'):
+        rows, corrections = fuzzy_index.lookup(query)
+        assert len(rows) == 0
+        assert WORD not in corrections.values()
+    # Остальные слова по-прежнему находятся
+    word = frame.iloc[1]['Наименование продукции'].split()[0].lower()
+    assert len(name_index.candidates(word)) > 0
@@ -0,0 +1,47 @@
+"""SearchPool возвращает то же, что gisp_search.match_positions"""
+import asyncio
+
+import numpy as np
+
+from benchmarks.synthetic import make_registry_frame
+from src.executor import BlockingExecutor
+from src.generations import Generation
+from src.gisp_build import build_generation_indexes, load_indexes
+from src.gisp_search import match_positions
+from src.gisp_store import GispSnapshot, SnapshotWriter
+from src.search_pool import SearchPool
+
+QUERIES = [
+    (None, 'о'),            # полный просмотр частями
+    ('27', 'модель'),       # кандидаты среди строк с кодом ОКПД2 частями
+    ('28', 'насос'),        # мало кандидатов, проверка в потоке
+    (None, 'насосы'),       # нечеткий поиск
+    ('27', None),           # только ОКПД2
+]
+
+
+def test_pool_matches_thread_search(tmp_path):
+    snapshot_path = str(tmp_path / 'gisp.arrow')
+    with SnapshotWriter(snapshot_path) as writer:
+        writer.write_frame(make_registry_frame(3000))
+    index_dir = str(tmp_path / 'index')
+    build_generation_indexes(snapshot_path, index_dir)
+    snapshot = GispSnapshot.open(snapshot_path)
+    generation = Generation('test', snapshot, load_indexes(snapshot, index_dir), {})
+
+    executor = BlockingExecutor()
+    pool = SearchPool(2, executor, shard_rows=100)
+
+    async def run():
+        return [await pool.match(generation, okpd2, name) for okpd2, name in QUERIES]
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        pool.shutdown(wait=True)
+        executor.shutdown()
+    for (okpd2, name), (positions, corrections) in zip(QUERIES, results):
+        expected_positions, expected_corrections = match_positions(generation, okpd2, name)
+        assert np.array_equal(positions, expected_positions), (okpd2, name)
+        assert positions.dtype == np.int32
+        assert corrections == expected_corrections